@@ -0,0 +1,104 @@
+"""
+檢查 search 的 successive halving 是否找回完整網格的 Pareto 前緣 (完全離線, 使用 synthetic.make_ohlcv)。
+
+用法 (在專案根目錄執行):
+    python benchmarks/check_search.py                      # 預設 seed 0-4, 3000 根 K 棒
+    python benchmarks/check_search.py --seeds 0 1 2 3 4 5 6 7 8 9 --bars 5000
+
+make_ohlcv 是純隨機漫步, 任何參數都沒有持續的優勢, 完整網格的前緣只是雜訊,
+部分歷史的排名與完整歷史幾乎無關 (任何提早淘汰的方法都找不回來)。
+這裡在價格上疊加均值回歸的偏離 (AR(1)), RSI 參數的好壞在整段歷史中較一致, 才符合 halving 的前提。
+
+對每個 seed 分別以完整網格 (optimizer.evaluate) 與 search(sampler='grid') 評估同一個 RSI 參數網格,
+比較兩者的 Pareto 前緣 (Total Return 與 Max Drawdown, 只計有交易的組合)。
+下列情況視為失敗並以 exit code 1 結束:
+    - 完整網格排名第一的組合被淘汰
+    - search 回報的前緣中有不在完整網格前緣上的組合
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from stock_analyse_toolbox import optimizer, search, strategies
+from stock_analyse_toolbox.synthetic import make_ohlcv
+
+PARAM_GRID = {'period': range(5, 31), 'oversold': [20, 25, 30, 35], 'overbought': [65, 70]}
+OBJECTIVES = ['Total Return', 'Max Drawdown']
+PARAMS = list(PARAM_GRID)
+# 均值回歸偏離: dev_t = MEAN_REVERSION * dev_{t-1} + N(0, DEVIATION_VOLATILITY)
+MEAN_REVERSION = 0.85
+DEVIATION_VOLATILITY = 0.03
+
+
+def _keys(table):
+    return set(map(tuple, table[PARAMS].to_numpy().tolist()))
+
+
+def make_data(bars, seed):
+    """make_ohlcv 的隨機漫步乘上 exp(dev) 的均值回歸偏離 (同一根 K 棒的 OHLC 乘上相同倍數)"""
+    data = make_ohlcv(bars, seed=seed)
+    noise = np.random.default_rng([seed, 1]).normal(0, DEVIATION_VOLATILITY, bars)
+    # AR(1) 即 adjust=False 的 EWM: y_t = r * y_{t-1} + (1 - r) * x_t
+    deviation = pd.Series(noise).ewm(alpha=1 - MEAN_REVERSION, adjust=False).mean() / (1 - MEAN_REVERSION)
+    scale = np.exp(deviation.to_numpy())
+    for column in ['Open', 'High', 'Low', 'Close']:
+        data[column] = data[column] * scale
+    return data
+
+
+def full_grid_front(data):
+    """完整網格中有交易的組合, 依 Pareto 前緣排序 (欄位同 search 的結果)"""
+    combos = optimizer.expand_grid(strategies.rsi_strategy, PARAM_GRID)
+    stats = optimizer.evaluate(data, strategies.rsi_strategy, combos, 100000, 0.001425, 1024)
+    table = pd.concat([pd.DataFrame(combos), pd.DataFrame(stats)], axis=1)
+    table = table[table['Total Trades'] > 0].reset_index(drop=True)
+    order, front = search.pareto_rank(table[OBJECTIVES].to_numpy(), [True, True])
+    table['Pareto Front'] = front
+    return table.iloc[order].reset_index(drop=True)
+
+
+def check(seed, bars):
+    data = make_data(bars, seed)
+    full = full_grid_front(data)
+    found = search.search(data, strategies.rsi_strategy, PARAM_GRID, objectives=OBJECTIVES)
+
+    front = _keys(full[full['Pareto Front'] == 0])
+    reported = _keys(found[(found['Pareto Front'] == 0) & (found['Total Trades'] > 0)])
+    best = tuple(full[PARAMS].iloc[0])
+    result = {
+        'seed': seed,
+        'best': best,
+        'best_found': best in _keys(found),
+        'recovered': len(front & _keys(found)),
+        'front_size': len(front),
+        'spurious': sorted(reported - front),
+        'fraction': found.attrs['evaluations']['fraction_of_full_grid'],
+    }
+    result['ok'] = result['best_found'] and not result['spurious']
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2, 3, 4])
+    parser.add_argument('--bars', type=int, default=3000)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for seed in args.seeds:
+        r = check(seed, args.bars)
+        print(f"seed {r['seed']}: best {r['best']} {'kept' if r['best_found'] else 'PRUNED'}, "
+              f"recovered {r['recovered']}/{r['front_size']} of the full-grid front, "
+              f"{r['fraction']:.0%} of full-grid bar evaluations"
+              + (f", not on the full-grid front: {r['spurious']}" if r['spurious'] else ''))
+        failed |= not r['ok']
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
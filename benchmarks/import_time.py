@@ -0,0 +1,88 @@
+"""
+stock_analyse_toolbox 的載入時間基準測試。
+
+每個情境在全新的 Python 子程序中執行 (沒有任何已載入的模組)，記錄載入時間，
+並檢查載入了哪些繪圖套件。只做回測的情境載入了任何繪圖套件時以 exit code 1 結束。
+
+用法 (在專案根目錄執行):
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 10 --output import_time.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLOTTING_MODULES = ('matplotlib', 'mplfinance', 'ta')
+
+# 情境名稱 -> (要執行的程式碼, 是否允許載入繪圖套件)
+SCENARIOS = {
+    'import package': ('import stock_analyse_toolbox as sat', False),
+    'backtest only': (
+        'import stock_analyse_toolbox as sat\n'
+        'sat.back_tester.Backtester\n'
+        'sat.strategies.rsi_strategy\n'
+        'sat.optimizer\n'
+        'sat.parallel',
+        False,
+    ),
+    'plot_ohlc ready': (
+        'import stock_analyse_toolbox as sat\n'
+        'sat.k_line_plot.plot_ohlc\n'
+        'import mplfinance, matplotlib.pyplot',
+        True,
+    ),
+}
+
+_RUNNER = """
+import json, sys, time
+start = time.perf_counter()
+exec(compile({code!r}, '<scenario>', 'exec'))
+seconds = time.perf_counter() - start
+loaded = sorted(name for name in {plotting!r} if name in sys.modules)
+print(json.dumps({{'seconds': seconds, 'loaded': loaded}}))
+"""
+
+
+def measure(code, repeat):
+    """回傳 (最佳秒數, 載入的繪圖套件)"""
+    runner = _RUNNER.format(code=code, plotting=PLOTTING_MODULES)
+    times = []
+    loaded = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', runner], cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        times.append(result['seconds'])
+        loaded = result['loaded']
+    return min(times), loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='每個情境的子程序次數 (取最佳)')
+    parser.add_argument('--output', help='結果 JSON 路徑')
+    args = parser.parse_args(argv)
+
+    results = []
+    failed = False
+    for name, (code, allow_plotting) in SCENARIOS.items():
+        seconds, loaded = measure(code, args.repeat)
+        ok = allow_plotting or not loaded
+        failed |= not ok
+        results.append({'name': name, 'seconds': seconds, 'plotting_modules': loaded, 'ok': ok})
+        print(f"{name:<18} {seconds:8.3f} s  plotting modules: {', '.join(loaded) or '-':<24}"
+              f"{'' if ok else 'UNEXPECTED'}", flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f"Saved import-time results to {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
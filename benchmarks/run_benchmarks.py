@@ -0,0 +1,257 @@
+"""
+stock_analyse_toolbox 的效能基準測試 (完全離線, 使用 synthetic.make_ohlcv 產生的模擬資料)。
+
+用法 (在專案根目錄執行):
+    python benchmarks/run_benchmarks.py                          # 預設大小, 結果寫入 benchmarks/results/
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --only rsi_strategy plot_ohlc
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 0.2
+
+每個項目記錄最佳執行時間 (秒) 與 tracemalloc 量測的記憶體峰值 (MB)。
+指定 --baseline 時, 任何項目比基準慢 (或峰值記憶體多) 超過 threshold 比例即以 exit code 1 結束。
+
+基準結果與機器有關, 不放在版本庫中 (benchmarks/results/ 與 benchmarks/baseline.json 都已被 .gitignore 排除)。
+比較前先在同一台機器上, 以作為基準的版本 (例如 main) 建立一次, 再切回修改後的版本比較:
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --output benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --baseline benchmarks/baseline.json
+plot_ohlc / pipeline 會寫入 output/<ticker>/, run() 在暫存資料夾中執行這些項目, 結束後刪除。
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import pandas as pd
+
+import stock_analyse_toolbox as sat
+from stock_analyse_toolbox.synthetic import make_ohlcv
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+STRATEGY_PARAMS = {'period': 21, 'oversold': 45, 'overbought': 55}
+
+
+# --- 各項目: setup(data) 回傳要量測的無參數函式; max_bars 以上的大小略過 ---
+
+def _rsi_strategy(data):
+    return lambda: sat.strategies.rsi_strategy(data, **STRATEGY_PARAMS)
+
+
+def _kd_strategy(data):
+    return lambda: sat.strategies.kd_strategy(data)
+
+
+def _moving_average_strategy(data):
+    return lambda: sat.strategies.moving_average_strategy(data)
+
+
+def _kernel(name, *args):
+    return lambda data: lambda: getattr(sat.kernels, name)(data['Close'].to_numpy(), *args)
+
+
+def _pandas_rolling(method, window):
+    # 與 kernels 對照的 pandas 滾動視窗 (同樣的視窗長度)
+    return lambda data: lambda: getattr(data['Close'].rolling(window), method)()
+
+
+def _backtester_run(engine):
+    def setup(data):
+        bt = sat.back_tester.Backtester(data, engine=engine)
+        return lambda: bt.run(sat.strategies.rsi_strategy, **STRATEGY_PARAMS)
+    return setup
+
+
+def _run_stats(dtype):
+    def setup(data):
+        bt = sat.back_tester.Backtester(data, copy=False)
+        return lambda: bt.run_stats(sat.strategies.rsi_strategy, dtype=dtype, **STRATEGY_PARAMS)
+    return setup
+
+
+def _get_summary_stats(data):
+    bt = sat.back_tester.Backtester(data, engine='vectorized')
+    bt.run(sat.strategies.rsi_strategy, **STRATEGY_PARAMS)
+    return bt.get_summary_stats
+
+
+def _result_cache_hit(data):
+    cache = sat.result_cache.ResultCache(tempfile.mkdtemp())
+    bt = sat.back_tester.Backtester(data, engine='vectorized')
+    cache.run(bt, sat.strategies.rsi_strategy, **STRATEGY_PARAMS)
+    return lambda: cache.run(bt, sat.strategies.rsi_strategy, **STRATEGY_PARAMS)
+
+
+def _robustness(data):
+    bt = sat.back_tester.Backtester(data, engine='vectorized')
+    bt.run(sat.strategies.rsi_strategy, **STRATEGY_PARAMS)
+    return lambda: sat.robustness.analyze(bt, n_scenarios=10_000, seed=0)
+
+
+def _plot_ohlc(data):
+    result = sat.back_tester.Backtester(data, engine='vectorized').run(
+        sat.strategies.rsi_strategy, **STRATEGY_PARAMS)
+    return lambda: sat.k_line_plot.plot_ohlc(result.copy(), ticker='BENCH', xaxis_freq='day',
+                                             save_suffix='_bench', strategy_indicators=['RSI'],
+                                             **STRATEGY_PARAMS)
+
+
+def _pipeline(data):
+    """與 main.py 相同的流程: 從本機資料庫讀取 → RSI 策略回測 → K 線圖 → 摘要"""
+    store = sat.data_store.OHLCVStore(os.path.join(tempfile.mkdtemp(), 'data'))
+    store.append('BENCH', data)
+
+    def run():
+        loaded = store.load('BENCH')
+        bt = sat.back_tester.Backtester(loaded, initial_cash=100000, transaction_fee=0.001425)
+        result = bt.run(sat.strategies.rsi_strategy, **STRATEGY_PARAMS)
+        sat.k_line_plot.plot_ohlc(result, ticker='BENCH', xaxis_freq='day',
+                                  save_suffix='_rsi_strategy_chart', strategy_indicators=['RSI'],
+                                  **STRATEGY_PARAMS)
+        return bt.summary()
+    return run
+
+
+BENCHMARKS = {
+    'rsi_strategy': (_rsi_strategy, 10_000_000),
+    'kd_strategy': (_kd_strategy, 10_000_000),
+    'moving_average_strategy': (_moving_average_strategy, 10_000_000),
+    'kernels.sma(200)': (_kernel('sma', 200), 10_000_000),
+    'pandas.rolling(200).mean': (_pandas_rolling('mean', 200), 10_000_000),
+    'kernels.bollinger(200)': (_kernel('bollinger', 200), 10_000_000),
+    'pandas.rolling(200).std': (_pandas_rolling('std', 200), 10_000_000),
+    'kernels.rolling_max(200)': (_kernel('rolling_max', 200), 10_000_000),
+    'pandas.rolling(200).max': (_pandas_rolling('max', 200), 10_000_000),
+    'Backtester.run[vectorized]': (_backtester_run('vectorized'), 10_000_000),
+    'Backtester.run[loop]': (_backtester_run('loop'), 100_000),
+    'Backtester.run_stats': (_run_stats(np.float64), 10_000_000),
+    'Backtester.run_stats[float32]': (_run_stats(np.float32), 10_000_000),
+    'get_summary_stats': (_get_summary_stats, 10_000_000),
+    'ResultCache.run[hit]': (_result_cache_hit, 1_000_000),
+    'robustness.analyze[10k]': (_robustness, 10_000),
+    'plot_ohlc': (_plot_ohlc, 1_000_000),
+    'pipeline': (_pipeline, 100_000),
+}
+
+
+def _call(func):
+    # 每次都從空的指標快取開始, 量到的是實際計算的成本
+    sat.indicators.default_cache.clear()
+    func()
+
+
+def measure(func, repeat):
+    """回傳 (最佳秒數, 記憶體峰值 MB)；記憶體另外執行一次量測, 不影響計時"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        _call(func)
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        _call(func)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), peak / 1e6
+
+
+def run(names, sizes, repeat, seed):
+    # plot_ohlc 會寫入目前資料夾下的 output/<ticker>/, 在暫存資料夾中執行以免汙染呼叫端的資料夾
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            return _run(names, sizes, repeat, seed)
+        finally:
+            os.chdir(cwd)
+
+
+def _run(names, sizes, repeat, seed):
+    results = []
+    for size in sizes:
+        data = make_ohlcv(size, seed=seed)
+        for name in names:
+            setup, max_bars = BENCHMARKS[name]
+            if size > max_bars:
+                continue
+            seconds, peak_mb = measure(setup(data), repeat if size < 1_000_000 else 1)
+            results.append({'name': name, 'bars': size, 'seconds': seconds, 'peak_mb': peak_mb})
+            print(f"{name:<28} {size:>10,} bars  {seconds:10.4f} s  {peak_mb:10.1f} MB", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """回傳超過門檻的退步項目列表"""
+    base = {(r['name'], r['bars']): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        b = base.get((r['name'], r['bars']))
+        if b is None:
+            continue
+        for key in ('seconds', 'peak_mb'):
+            if b[key] > 0 and r[key] > b[key] * (1 + threshold):
+                regressions.append(dict(name=r['name'], bars=r['bars'], metric=key,
+                                        baseline=b[key], current=r[key], ratio=r[key] / b[key]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3, help='小於 1M 根時每項重複次數 (取最佳)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='結果 JSON 路徑 (預設 benchmarks/results/<時間>.json)')
+    parser.add_argument('--baseline', help='要比較的基準結果 JSON')
+    parser.add_argument('--threshold', type=float, default=0.25, help='允許的退步比例 (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    results = run(args.only, sorted(args.sizes), args.repeat, args.seed)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark results to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['name']} ({r['bars']:,} bars) {r['metric']}: "
+                  f"{r['baseline']:.4g} -> {r['current']:.4g} (x{r['ratio']:.2f})")
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,12 @@
 
-import yfinance as yf
 import matplotlib.pyplot as plt
 import pandas as pd
 import stock_analyse_toolbox as sat
 
 Ticker = 'NVDA'
-data = yf.download(Ticker, start='2021-07-04', end='2025-11-5', interval="1d")
+# 從本機資料庫讀取, 只有本機缺少的日期區間才會透過 yfinance 下載
+store = sat.data_store.OHLCVStore('data')
+data = store.load(Ticker, start='2021-07-04', end='2025-11-5', interval="1d", update=True)
 if data.empty:
     raise ValueError(f"No data downloaded for {Ticker}")
 
@@ -1,4 +1,45 @@
-from stock_analyse_toolbox import back_tester
-from stock_analyse_toolbox import  k_line_plot
-from stock_analyse_toolbox import  indicator_plot
-from stock_analyse_toolbox import  strategies
\ No newline at end of file
+"""
+子模組在第一次以屬性存取時才載入 (例如 sat.back_tester)，
+只做回測的程式不會載入 matplotlib / mplfinance 等繪圖套件。
+"""
+import importlib
+
+_SUBMODULES = (
+    'back_tester',
+    'kernels',
+    'indicators',
+    'k_line_plot',
+    'indicator_plot',
+    'strategies',
+    'optimizer',
+    'parallel',
+    'data_store',
+    'streaming',
+    'chunked',
+    'batch_render',
+    'downsample',
+    'synthetic',
+    'profiling',
+    'trade_log',
+    'metrics',
+    'robustness',
+    'result_cache',
+    'expressions',
+    'search',
+    'service',
+    'ingest',
+    'pyramid',
+)
+
+__all__ = list(_SUBMODULES)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        # import_module 會把子模組設為套件屬性, 之後的存取不再經過 __getattr__
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES))
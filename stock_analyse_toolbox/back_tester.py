@@ -2,35 +2,454 @@
 import pandas as pd
 import numpy as np # 需要 numpy
 
+from stock_analyse_toolbox import metrics, profiling
+from stock_analyse_toolbox.trade_log import TradeLog
+
+ENGINES = ('loop', 'vectorized')
+
+
+def _last_event_index(mask):
+    """
+    回傳每個位置「最近一次 mask 為 True」的索引 (沿 axis 0)，之前都沒有則為 -1。
+    支援 1-D 或 2-D (bars × N) 陣列。
+    """
+    n = mask.shape[0]
+    positions = np.arange(n).reshape((n,) + (1,) * (mask.ndim - 1))
+    idx = np.where(mask, positions, -1)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return idx
+
+
+def _held_state(signal, initial=False):
+    """
+    將 1/-1/0 的狀態訊號轉成「每根 K 棒收盤後是否持倉」。
+    等同迴圈版: 空手遇到 1 買入、持倉遇到 -1 賣出、其他值不動作，
+    也就是「最近一個非 0 訊號是否為 1」；還沒有非 0 訊號時為 initial (上一段結束時的持倉)。
+    """
+    signal = np.asarray(signal)
+    last = _last_event_index((signal == 1) | (signal == -1))
+    last_signal = np.take_along_axis(signal, np.maximum(last, 0), axis=0)
+    return np.where(last >= 0, last_signal == 1, initial)
+
+
+def _as_float(values):
+    """轉成浮點陣列; 已經是 float32 / float64 時不複製 (float32 用於省記憶體的 run_stats)"""
+    values = np.asarray(values)
+    if values.dtype not in (np.float32, np.float64):
+        values = values.astype(float)
+    return values
+
+
+def _simulate(close, signal, initial_cash, transaction_fee):
+    """
+    向量化的全進全出回測核心 (與 Backtester 迴圈版的計算方式相同)。
+
+    close 與 signal 可為 1-D，或 2-D (bars × N，每一欄是一組獨立的回測)；
+    close 為 1-D 而 signal 為 2-D 時，所有欄位共用同一條價格。
+
+    Returns:
+        portfolio (np.ndarray): 每根 K 棒收盤後的投資組合淨值
+        held (np.ndarray): 每根 K 棒收盤後是否持倉 (bool)
+        entry_price (np.ndarray): 目前 (或最近一次) 部位的買入價，尚未買過為 nan
+    """
+    portfolio, held, entry_price, _ = _simulate_chunk(close, signal, initial_cash, transaction_fee)
+    return portfolio, held, entry_price
+
+
+def _simulate_chunk(close, signal, initial_cash, transaction_fee, carry=None):
+    """
+    _simulate 的分段版本: carry 為上一段最後一根 K 棒的 (是否持倉, 買入價, 現金累積成長倍數)，
+    依序處理各段並傳入上一段回傳的 carry，結果與整段一次計算完全相同。
+
+    Returns:
+        portfolio, held, entry_price: 同 _simulate
+        carry (tuple): 這一段最後一根 K 棒的狀態, 交給下一段使用
+    """
+    signal = np.asarray(signal)
+    if carry is None:
+        carry = (False, np.nan, 1.0)
+    carry_held, carry_entry, carry_growth = (np.broadcast_to(v, signal.shape[1:]) for v in carry)
+
+    held = _held_state(signal, carry_held)
+    close = _as_float(close)
+    carry_entry = carry_entry.astype(close.dtype)
+    if close.ndim < held.ndim:
+        close = close[:, None]
+    close = np.broadcast_to(close, held.shape)
+    keep = 1 - transaction_fee
+
+    prev_held = np.empty_like(held)
+    prev_held[:1] = carry_held
+    prev_held[1:] = held[:-1]
+    entries = held & ~prev_held
+    exits = prev_held & ~held
+
+    # 每根 K 棒對應的買入價 (最近一次買入那根的收盤價)
+    last_entry = _last_event_index(entries)
+    entry_price = np.take_along_axis(close, np.maximum(last_entry, 0), axis=0)
+    entry_price = np.where(last_entry >= 0, entry_price, carry_entry)
+
+    # 每次賣出時現金的成長倍數: 買入、賣出各扣一次手續費
+    # (接在上一段的累積倍數之後 cumprod, 與整段一次計算的乘法順序相同)
+    growth = np.ones((held.shape[0] + 1,) + held.shape[1:], dtype=close.dtype)
+    growth[0] = carry_growth
+    growth[1:][exits] = keep * keep * close[exits] / entry_price[exits]
+    growth = np.cumprod(growth, axis=0)[1:]
+    cash = initial_cash * growth
+
+    with np.errstate(invalid='ignore'):
+        holding_value = cash * keep * close / entry_price
+    portfolio = np.where(held, holding_value, cash)
+    return portfolio, held, entry_price, (held[-1], entry_price[-1], growth[-1])
+
+
+def _trades_from_held(close, held):
+    """
+    由 1-D 的持倉狀態還原逐筆交易紀錄 (TradeLog, 與迴圈版 self.trades 相同)，
+    期末仍持倉時以最後一根收盤價強制平倉。
+    """
+    close = np.asarray(close, dtype=float)
+    prev_held = np.zeros_like(held)
+    prev_held[1:] = held[:-1]
+    entry_idx = np.flatnonzero(held & ~prev_held)
+    exit_idx = np.flatnonzero(prev_held & ~held)
+    if len(exit_idx) < len(entry_idx):
+        exit_idx = np.append(exit_idx, len(close) - 1)
+
+    return TradeLog.from_arrays(entry_idx, exit_idx, close[entry_idx], close[exit_idx])
+
+
+def summary_stats(portfolio, close, trades, periods_per_year=None, performance=None):
+    """
+    由淨值序列、收盤價與逐筆交易紀錄計算摘要統計 (Backtester.get_summary_stats 的計算本體)。
+
+    Args:
+        portfolio (array-like): 每根 K 棒的投資組合淨值.
+        close (array-like): 每根 K 棒的收盤價.
+        trades (TradeLog): 逐筆交易紀錄.
+        periods_per_year (float, optional): 每年的 K 棒數, 用於年化 Sharpe / Sortino / CAGR / Turnover.
+                                            預設由 portfolio 的 DatetimeIndex 推算, 沒有時為 252.
+        performance (dict, optional): 已經算好的延伸指標 (metrics.METRIC_KEYS),
+                                      分段回測時由呼叫端逐段累積後傳入.
+    """
+    if periods_per_year is None:
+        periods_per_year = metrics.periods_per_year(getattr(portfolio, 'index', None))
+    portfolio = np.asarray(portfolio, dtype=float)
+    close = np.asarray(close)
+
+    # 投資組合淨值
+    final_value = portfolio[-1]
+    total_return = final_value / portfolio[0] - 1
+    
+    # 買入並持有 (Buy and Hold) 基準
+    buy_and_hold_return = close[-1] / close[0] - 1
+
+    stats = {
+        "Final Value": final_value,
+        "Total Return": total_return,
+        "Buy and Hold Return": buy_and_hold_return,
+        "Total Trades": 0,
+        "Win Rate": 0,
+        "Average PnL": 0,
+        "Max Profit": 0,
+        "Max Loss": 0
+    }
+
+    # 逐筆交易統計 (直接在 pnl_pct 欄位上向量化計算)
+    pnl_pcts = trades['pnl_pct']
+    total_trades = len(pnl_pcts)
+    if total_trades > 0:
+        stats["Total Trades"] = total_trades
+        stats["Win Rate"] = np.count_nonzero(pnl_pcts > 0) / total_trades
+        stats["Average PnL"] = pnl_pcts.mean()
+        stats["Max Profit"] = pnl_pcts.max()
+        stats["Max Loss"] = pnl_pcts.min()
+
+    # 由淨值序列計算的延伸指標
+    if performance is None:
+        performance = metrics.performance_stats(portfolio, trades['entry_idx'], trades['exit_idx'],
+                                                periods_per_year)
+    stats.update(performance)
+    return stats
+
+
+def batch_summary_stats(close, signals, initial_cash=100000, transaction_fee=0.001425,
+                        periods_per_year=metrics.DEFAULT_PERIODS_PER_YEAR):
+    """
+    一次計算多組訊號的摘要統計 (批次版的 Backtester.get_summary_stats)。
+
+    Args:
+        close (array-like): 收盤價, shape (bars,).
+        signals (array-like): 狀態訊號矩陣, shape (bars, N)，每一欄是一組參數.
+        initial_cash (float, optional): 初始資金.
+        transaction_fee (float, optional): 手續費率.
+        periods_per_year (float, optional): 每年的 K 棒數 (可用 metrics.periods_per_year(data.index) 推算).
+
+    Returns:
+        dict: 與 get_summary_stats 相同的 key，每個 value 是長度 N 的 np.ndarray.
+    """
+    close = np.asarray(close, dtype=float)
+    signals = np.asarray(signals)
+    if signals.ndim == 1:
+        signals = signals[:, None]
+
+    portfolio, held, entry_price = _simulate(close, signals, initial_cash, transaction_fee)
+    close_2d = np.broadcast_to(close[:, None], held.shape)
+
+    prev_held = np.zeros_like(held)
+    prev_held[1:] = held[:-1]
+    entries = held & ~prev_held
+    exits = prev_held & ~held
+
+    # 逐筆交易報酬: 賣出那根的收盤價 vs 買入價; 期末仍持倉的以最後一根強制平倉
+    with np.errstate(invalid='ignore'):
+        pnl = np.where(exits, (close_2d - entry_price) / entry_price, np.nan)
+        forced_pnl = np.where(held[-1], (close[-1] - entry_price[-1]) / entry_price[-1], np.nan)
+    pnl = np.vstack([pnl, forced_pnl])
+    is_trade = ~np.isnan(pnl)
+
+    total_trades = is_trade.sum(axis=0)
+    has_trades = total_trades > 0
+    safe_trades = np.maximum(total_trades, 1)
+    win_trades = (np.where(is_trade, pnl, 0) > 0).sum(axis=0)
+
+    # 延伸指標: 成交金額為買入與賣出 (含期末強制平倉) 當根的淨值
+    returns = metrics.ReturnStats().update(portfolio)
+    traded_value = (np.where(entries, portfolio, 0).sum(axis=0) + np.where(exits, portfolio, 0).sum(axis=0)
+                    + np.where(held[-1], portfolio[-1], 0))
+    performance = returns.result(periods_per_year)
+    performance.update(metrics.activity_stats(held[:-1].sum(axis=0), traded_value, len(close),
+                                              returns.value_sum / len(close), periods_per_year))
+
+    return {
+        "Final Value": portfolio[-1],
+        "Total Return": portfolio[-1] / portfolio[0] - 1,
+        "Buy and Hold Return": np.full(held.shape[1], close[-1] / close[0] - 1),
+        "Total Trades": total_trades,
+        "Win Rate": np.where(has_trades, win_trades / safe_trades, 0),
+        "Average PnL": np.where(has_trades, np.where(is_trade, pnl, 0).sum(axis=0) / safe_trades, 0),
+        "Max Profit": np.where(has_trades, np.where(is_trade, pnl, -np.inf).max(axis=0), 0),
+        "Max Loss": np.where(has_trades, np.where(is_trade, pnl, np.inf).min(axis=0), 0),
+        **performance,
+    }
+
+
+def _segment_trades(close, held, entry_price, prev_held, offset, open_entry):
+    """
+    這一段內完成 (賣出) 的交易 (TradeLog, 位置為整段歷史中的絕對位置)。
+
+    Args:
+        offset (int): 這一段第一根 K 棒的絕對位置.
+        open_entry (int): 上一段結束時仍持倉的買入位置 (prev_held 為 True 時使用).
+
+    Returns:
+        (TradeLog, int): 完成的交易, 以及這一段結束時仍持倉的買入位置.
+    """
+    was_held = np.empty_like(held)
+    was_held[:1] = prev_held
+    was_held[1:] = held[:-1]
+    entries = offset + np.flatnonzero(held & ~was_held)
+    exits = was_held & ~held
+
+    # 依時間順序, 第 k 次賣出對應第 k 次買入 (上一段留下的部位排在最前面)
+    if prev_held:
+        entries = np.insert(entries, 0, open_entry)
+    exit_idx = offset + np.flatnonzero(exits)
+    if len(entries) > len(exit_idx):
+        open_entry = entries[-1]
+    trades = TradeLog.from_arrays(entries[:len(exit_idx)], exit_idx, entry_price[exits], close[exits])
+    return trades, open_entry
+
+
+def _pop_indicators(signals):
+    """
+    取出策略附在訊號上的指標 (signals.attrs['indicators'], 例如 {'RSI': Series})。
+    取出後從 attrs 移除, 之後對訊號的運算不會再連帶複製這些指標。
+    """
+    attrs = getattr(signals, 'attrs', None)
+    if not attrs:
+        return {}
+    return attrs.pop('indicators', {})
+
+
+class _SegmentedRun:
+    """
+    依序餵入一段段的 (close, signal)，跨段保留部位 / 現金狀態並累積交易紀錄與延伸指標，
+    每段只需要該段長度的暫存記憶體。ChunkedBacktester 與 Backtester.run_stats 共用，
+    結果與 Backtester(engine='vectorized') 一次計算整段相同。
+    """
+
+    def __init__(self, initial_cash, transaction_fee):
+        self.initial_cash = initial_cash
+        self.transaction_fee = transaction_fee
+        self.trades = TradeLog()
+        self.returns = metrics.ReturnStats()
+        self.n_bars = 0
+        self.carry = None
+        self.first_close = self.last_close = None
+        self._open_entry = 0
+        self._held_bars = 0
+        self._traded_value = 0.0
+
+    def update(self, close, signal):
+        """處理下一段, 回傳這一段每根 K 棒的淨值"""
+        prev_held = False if self.carry is None else self.carry[0]
+        portfolio, held, entry_price, self.carry = _simulate_chunk(
+            close, signal, self.initial_cash, self.transaction_fee, self.carry)
+        trades, self._open_entry = _segment_trades(close, held, entry_price, prev_held,
+                                                   self.n_bars, self._open_entry)
+        self.trades.extend(trades)
+
+        # 延伸指標逐段累積 (回撤 / 報酬率 / 持倉時間 / 成交金額)
+        was_held = np.empty_like(held)
+        was_held[:1] = prev_held
+        was_held[1:] = held[:-1]
+        self.returns.update(portfolio)
+        self._held_bars += np.count_nonzero(held)
+        self._traded_value += portfolio[held != was_held].sum()
+
+        if self.first_close is None:
+            self.first_close = close[0]
+        self.last_close = close[-1]
+        self.n_bars += len(close)
+        return portfolio
+
+    def finish(self, periods_per_year=metrics.DEFAULT_PERIODS_PER_YEAR):
+        """期末仍持倉時以最後一根收盤價強制平倉，回傳 summary_stats (只能呼叫一次)"""
+        held, buy_price, _ = self.carry
+        held = bool(held)
+        last_value = float(self.returns.last_value)
+        if held and buy_price > 0:
+            self.trades.append(self._open_entry, self.n_bars - 1, buy_price, self.last_close)
+
+        # 最後一根之後沒有持倉期間; 強制平倉的賣出金額為最後一根的淨值
+        performance = self.returns.result(periods_per_year)
+        performance.update(metrics.activity_stats(
+            self._held_bars - held, self._traded_value + (last_value if held else 0.0),
+            self.n_bars, self.returns.value_sum / self.n_bars, periods_per_year))
+        return summary_stats([float(self.returns.first_value), last_value],
+                             [self.first_close, self.last_close], self.trades, performance=performance)
+
+
 class Backtester:
-    def __init__(self, data, initial_cash=100000, transaction_fee=0.001425):
-        self.data = data.copy()
-        if isinstance(self.data.columns, pd.MultiIndex):
-            self.data.columns = [col[0] for col in self.data.columns]
+    def __init__(self, data, initial_cash=100000, transaction_fee=0.001425, engine='loop', profiler=None,
+                 copy=True):
+        """
+        Args:
+            data (pd.DataFrame): OHLCV 資料 (yfinance 的 MultiIndex 欄位會被攤平).
+            initial_cash (float, optional): 初始資金.
+            transaction_fee (float, optional): 每次買入 / 賣出的手續費率.
+            engine (str, optional): 回測引擎.
+                                    'loop': 逐根 K 棒的 Python 迴圈 (預設)
+                                    'vectorized': 以 NumPy 陣列運算一次算完, 結果與 'loop' 相同
+            profiler (profiling.Profiler, optional): 指定時, run / get_summary_stats 各階段的
+                                                     時間與記憶體峰值會記錄到這個 Profiler.
+            copy (bool, optional): 是否複製 data. False 時只建立共用資料的淺層複本 (不複製數值),
+                                   適合只呼叫 run_stats 的大量回測; 之後不可再原地修改 data.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {ENGINES}, got {engine!r}")
+        self.profiler = profiler
+        with profiling.use(profiler), profiling.stage('Backtester.init'):
+            self.data = data.copy(deep=copy)
+            if isinstance(self.data.columns, pd.MultiIndex):
+                self.data.columns = [col[0] for col in self.data.columns]
+        # copy=False 時 data 與呼叫端共用數值, 內容可能在外部被修改 (ResultCache 不會記住它的雜湊)
+        self.owns_data = copy
+        self._close_cache = {}
         self.initial_cash = initial_cash
         self.transaction_fee = transaction_fee
+        self.engine = engine
         
-        # 儲存所有交易紀錄
-        self.trades = [] 
+        # 儲存所有交易紀錄 (TradeLog, 欄式儲存)
+        self.trades = TradeLog()
         self.buy_price = 0.0
         
         # 儲存結果
         self.results_data = None
 
     def run(self, strategy_func, **kwargs):
-        # 複製一份資料，避免汙染
-        run_data = self.data.copy()
-        
-        signals = strategy_func(run_data, **kwargs)
-        run_data['Signal'] = signals
+        with profiling.use(self.profiler), profiling.stage('Backtester.run'):
+            # 複製一份資料，避免汙染
+            with profiling.stage('copy'):
+                run_data = self.data.copy()
+
+            with profiling.stage('strategy'):
+                signals = strategy_func(run_data, **kwargs)
+                # 策略計算的指標 (RSI, %K ...) 一併放進結果, 供繪圖使用
+                for name, values in _pop_indicators(signals).items():
+                    run_data[name] = values
+                run_data['Signal'] = signals
+
+            if self.engine == 'vectorized':
+                return self._run_vectorized(run_data)
+            with profiling.stage('loop'):
+                return self._run_loop(run_data)
+
+    def run_stats(self, strategy_func, return_equity=False, dtype=np.float64, block_size=65536, **kwargs):
+        """
+        精簡模式: 只回傳摘要統計, 適合大量參數組合的掃描。
+
+        不複製資料、不建立每次回測的 DataFrame: Close 與訊號以唯讀的 NumPy view 讀取,
+        模擬與統計以 block_size 分段計算 (暫存記憶體與資料長度無關)。
+        不會更新 results_data / trades; 統計數值與 run() + get_summary_stats() 相同 (延伸指標可能有浮點捨入差異)。
+
+        Args:
+            strategy_func (callable): 策略函式 (不可修改傳入的 data).
+            return_equity (bool, optional): 是否一併回傳每根 K 棒的淨值陣列.
+            dtype (np.dtype, optional): 模擬使用的浮點型別 (np.float32 精度較低). 只影響 return_equity
+                                        回傳的淨值陣列大小; data 仍是 float64, float32 時另外轉換一份 Close,
+                                        記憶體峰值不會降低.
+            block_size (int, optional): 分段計算的 K 棒數.
+            **kwargs: 策略參數.
+
+        Returns:
+            dict: 與 get_summary_stats 相同; return_equity=True 時為 (dict, np.ndarray).
+        """
+        with profiling.use(self.profiler), profiling.stage('Backtester.run_stats'):
+            with profiling.stage('strategy'):
+                signals = strategy_func(self.data, **kwargs)
+                _pop_indicators(signals)
+                signal = np.asarray(signals)
+            close = self._close(dtype)
+
+            with profiling.stage('simulate'):
+                run = _SegmentedRun(self.initial_cash, self.transaction_fee)
+                equity = np.empty(len(close), dtype=dtype) if return_equity else None
+                for lo in range(0, len(close), block_size):
+                    portfolio = run.update(close[lo:lo + block_size], signal[lo:lo + block_size])
+                    if equity is not None:
+                        equity[lo:lo + block_size] = portfolio
+
+            with profiling.stage('stats'):
+                stats = run.finish(metrics.periods_per_year(self.data.index))
+        if return_equity:
+            return stats, equity
+        return stats
+
+    def _close(self, dtype):
+        """Close 欄位的唯讀 NumPy 陣列 (float64 時不複製, 其他型別只轉換一次)"""
+        dtype = np.dtype(dtype)
+        if dtype not in self._close_cache:
+            close = self.data['Close'].to_numpy(dtype=dtype)
+            if close.flags.writeable:
+                close = close.view()
+                close.flags.writeable = False
+            self._close_cache[dtype] = close
+        return self._close_cache[dtype]
 
+    def _run_loop(self, run_data):
+        """
+        迴圈引擎: 逐根 K 棒模擬買賣。
+        """
         position = 0
         cash = self.initial_cash
         portfolio = []
         
         #重設交易紀錄
-        self.trades = []
+        self.trades = TradeLog()
         self.buy_price = 0.0
+        entry_idx = 0
 
         for i in range(len(run_data)):
             price = run_data['Close'].iloc[i]
@@ -40,8 +459,9 @@ class Backtester:
                 position = (cash / price) * (1 - self.transaction_fee)
                 cash = 0
                 
-                #記錄買入價格
+                #記錄買入價格與位置
                 self.buy_price = price 
+                entry_idx = i
                 
             elif signal == -1 and position > 0:  # Sell
                 cash = (position * price) * (1 - self.transaction_fee)
@@ -49,13 +469,7 @@ class Backtester:
                 
                 # 記錄一筆完整交易
                 if self.buy_price > 0:
-                    sell_price = price
-                    trade_pnl_pct = (sell_price - self.buy_price) / self.buy_price
-                    self.trades.append({
-                        'buy_price': self.buy_price,
-                        'sell_price': sell_price,
-                        'pnl_pct': trade_pnl_pct
-                    })
+                    self.trades.append(entry_idx, i, self.buy_price, price)
                     self.buy_price = 0.0 # 重設買入價
 
             total_value = cash + position * price
@@ -64,12 +478,7 @@ class Backtester:
         #處理期末仍持倉的情況 (強制平倉)
         if position > 0 and self.buy_price > 0:
             last_price = run_data['Close'].iloc[-1]
-            trade_pnl_pct = (last_price - self.buy_price) / self.buy_price
-            self.trades.append({
-                'buy_price': self.buy_price,
-                'sell_price': last_price,
-                'pnl_pct': trade_pnl_pct
-            })
+            self.trades.append(entry_idx, len(run_data) - 1, self.buy_price, last_price)
             self.buy_price = 0.0
 
         run_data['Portfolio'] = portfolio
@@ -78,46 +487,34 @@ class Backtester:
         self.results_data = run_data 
         return self.results_data
 
+    def _run_vectorized(self, run_data):
+        """
+        向量化引擎: 由 Signal 陣列直接推出持倉、現金、淨值與交易紀錄，
+        不逐根 K 棒迴圈。結果 (含手續費與期末強制平倉) 與迴圈版相同。
+        """
+        close = run_data['Close'].to_numpy(dtype=float)
+        signal = run_data['Signal'].to_numpy()
+
+        with profiling.stage('simulate'):
+            portfolio, held, _ = _simulate(close, signal, self.initial_cash, self.transaction_fee)
+
+        with profiling.stage('trades'):
+            self.trades = _trades_from_held(close, held)
+        self.buy_price = 0.0
+
+        run_data['Portfolio'] = portfolio
+        self.results_data = run_data
+        return self.results_data
+
     def get_summary_stats(self):
         """
         計算並回傳包含「原始數值」的字典，用於參數優化。
         """
         if self.results_data is None:
             raise Exception("請先執行 run() 才能取得摘要。")
-            
-        # 投資組合淨值
-        final_value = self.results_data['Portfolio'].iloc[-1]
-        total_return = final_value / self.results_data['Portfolio'].iloc[0] - 1
-        
-        # 買入並持有 (Buy and Hold) 基準
-        buy_and_hold_return = self.results_data['Close'].iloc[-1] / self.results_data['Close'].iloc[0] - 1
-
-        stats = {
-            "Final Value": final_value,
-            "Total Return": total_return,
-            "Buy and Hold Return": buy_and_hold_return,
-            "Total Trades": 0,
-            "Win Rate": 0,
-            "Average PnL": 0,
-            "Max Profit": 0,
-            "Max Loss": 0
-        }
 
-        if not self.trades:
-            return stats
-
-        # 逐筆交易統計
-        pnl_pcts = [t['pnl_pct'] for t in self.trades]
-        total_trades = len(self.trades)
-        win_trades = sum(1 for pnl in pnl_pcts if pnl > 0)
-        
-        stats["Total Trades"] = total_trades
-        stats["Win Rate"] = (win_trades / total_trades) if total_trades > 0 else 0
-        stats["Average PnL"] = np.mean(pnl_pcts) if total_trades > 0 else 0
-        stats["Max Profit"] = max(pnl_pcts) if total_trades > 0 else 0
-        stats["Max Loss"] = min(pnl_pcts) if total_trades > 0 else 0
-        
-        return stats
+        with profiling.use(self.profiler), profiling.stage('Backtester.get_summary_stats'):
+            return summary_stats(self.results_data['Portfolio'], self.results_data['Close'], self.trades)
 
     def summary(self):
         """
@@ -139,5 +536,161 @@ class Backtester:
             "Average PnL per Trade": f"{stats['Average PnL']:.4f}",
             "Max Profit per Trade": f"{stats['Max Profit']:.4f}",
             "Max Loss per Trade": f"{stats['Max Loss']:.4f}",
+            "--- Risk Stats ---": "---",
+            "Max Drawdown": f"{stats['Max Drawdown']:.2%}",
+            "Max Drawdown Duration (bars)": int(stats['Max Drawdown Duration']),
+            "Sharpe Ratio": f"{stats['Sharpe Ratio']:.2f}",
+            "Sortino Ratio": f"{stats['Sortino Ratio']:.2f}",
+            "CAGR": f"{stats['CAGR']:.2%}",
+            "Exposure": f"{stats['Exposure']:.2%}",
+            "Turnover (per year)": f"{stats['Turnover']:.2f}",
+        }
+        return formatted_summary
+
+class PortfolioBacktester:
+    """
+    多檔股票的投資組合回測: 一次對 (bars × tickers) 的價格與訊號矩陣做向量化計算，不逐檔迴圈。
+
+    每檔股票依 allocation 分到一份初始資金，各自以與 Backtester 相同的規則全進全出
+    (Signal 1 = 持有, -1 = 空手)，投資組合淨值為所有子帳戶相加。
+    """
+
+    def __init__(self, close, initial_cash=100000, transaction_fee=0.001425, allocation='equal'):
+        """
+        Args:
+            close (pd.DataFrame): 收盤價矩陣, index 為日期, 每欄一檔股票.
+                                  也可直接傳入 yfinance 多檔下載的結果 (會取出 'Close').
+            initial_cash (float, optional): 整個投資組合的初始資金.
+            transaction_fee (float, optional): 手續費率.
+            allocation (str | dict | array-like, optional): 資金分配規則.
+                                  'equal': 等權重 (預設)
+                                  dict / array: 各檔權重 (總和不可超過 1, 剩餘部分保留現金)
+        """
+        if isinstance(close.columns, pd.MultiIndex) and 'Close' in close.columns.get_level_values(0):
+            close = close['Close']
+        self.close = close.astype(float)
+        self.tickers = list(self.close.columns)
+        self.initial_cash = initial_cash
+        self.transaction_fee = transaction_fee
+        self.weights = self._weights(allocation)
+
+        self.trades = None
+        self.asset_values = None
+        self.results_data = None
+        self._held = None
+
+    def _weights(self, allocation):
+        n = len(self.tickers)
+        if isinstance(allocation, str):
+            if allocation != 'equal':
+                raise ValueError(f"Unknown allocation rule: {allocation!r}")
+            return np.full(n, 1 / n)
+        if isinstance(allocation, dict):
+            allocation = [allocation.get(ticker, 0) for ticker in self.tickers]
+        weights = np.asarray(allocation, dtype=float)
+        if weights.shape != (n,) or (weights < 0).any() or weights.sum() > 1 + 1e-9:
+            raise ValueError("allocation weights must be non-negative, one per ticker, and sum to at most 1")
+        return weights
+
+    def run(self, signals):
+        """
+        Args:
+            signals (pd.DataFrame | np.ndarray): 與 close 對齊的狀態訊號矩陣 (1 / -1 / 0).
+
+        Returns:
+            pd.DataFrame: 'Portfolio' (總淨值) 與 'Cash' (未分配的現金).
+                          各檔子帳戶淨值存於 self.asset_values, 逐筆交易存於 self.trades.
+        """
+        if isinstance(signals, pd.DataFrame):
+            signals = signals.reindex(index=self.close.index, columns=self.tickers)
+        signals = np.nan_to_num(np.asarray(signals, dtype=float))
+        if signals.shape != self.close.shape:
+            raise ValueError(f"signals shape {signals.shape} does not match close shape {self.close.shape}")
+
+        # 尚未上市 / 停牌 (價格為 NaN) 的 K 棒不動作, 持倉以最後價格估值
+        raw_close = self.close.to_numpy()
+        signals = np.where(np.isnan(raw_close), 0, signals)
+        close = self.close.ffill().to_numpy()
+
+        sleeve_cash = self.initial_cash * self.weights
+        values, held, _ = _simulate(np.nan_to_num(close), signals, sleeve_cash, self.transaction_fee)
+        unallocated = self.initial_cash - sleeve_cash.sum()
+
+        self.asset_values = pd.DataFrame(values, index=self.close.index, columns=self.tickers)
+        self._held = held
+        self.trades = self._trades(close, held)
+        self.results_data = pd.DataFrame({
+            'Portfolio': values.sum(axis=1) + unallocated,
+            'Cash': unallocated,
+        }, index=self.close.index)
+        return self.results_data
+
+    def _trades(self, close, held):
+        """由持倉矩陣一次還原所有股票的逐筆交易 (期末仍持倉者以最後一根收盤價平倉)"""
+        prev_held = np.zeros_like(held)
+        prev_held[1:] = held[:-1]
+        entries = held & ~prev_held
+        exits = prev_held & ~held
+        exits[-1] |= held[-1]
+
+        # 依 (股票, 時間) 排序後, 每檔的第 k 次買入對應第 k 次賣出
+        entry_col, entry_row = np.nonzero(entries.T)
+        exit_col, exit_row = np.nonzero(exits.T)
+        buy_prices = close[entry_row, entry_col]
+        sell_prices = close[exit_row, exit_col]
+        forced = (exit_row == len(held) - 1) & held[-1, exit_col]
+
+        return pd.DataFrame({
+            'ticker': np.asarray(self.tickers, dtype=object)[entry_col],
+            'entry_date': self.close.index[entry_row],
+            'exit_date': self.close.index[exit_row],
+            'buy_price': buy_prices,
+            'sell_price': sell_prices,
+            'pnl_pct': (sell_prices - buy_prices) / buy_prices,
+            'forced_close': forced,
+        })
+
+    def get_summary_stats(self):
+        """
+        投資組合層級的摘要統計 (key 與 Backtester.get_summary_stats 相同)。
+        """
+        if self.results_data is None:
+            raise Exception("請先執行 run() 才能取得摘要。")
+
+        portfolio = self.results_data['Portfolio']
+        final_value = portfolio.iloc[-1]
+
+        # 依相同權重買入並持有 (從各檔第一個有效價格買到最後一個有效價格)
+        first_price = self.close.bfill().iloc[0].to_numpy()
+        last_price = self.close.ffill().iloc[-1].to_numpy()
+        buy_and_hold_return = np.nansum(self.weights * (last_price / first_price - 1))
+
+        pnl_pcts = self.trades['pnl_pct'].to_numpy()
+        total_trades = len(pnl_pcts)
+
+        # 延伸指標: 曝險比例為已投入部位佔總淨值的平均比例, 成交金額為各子帳戶買賣當根的淨值
+        periods_per_year = metrics.periods_per_year(self.close.index)
+        values = self.asset_values.to_numpy()
+        held = self._held
+        prev_held = np.zeros_like(held)
+        prev_held[1:] = held[:-1]
+        exits = prev_held & ~held
+        exits[-1] |= held[-1]
+        traded_value = values[held & ~prev_held].sum() + values[exits].sum()
+        invested = np.where(held, values, 0).sum(axis=1)[:-1] / portfolio.to_numpy()[:-1]
+
+        returns = metrics.ReturnStats().update(portfolio.to_numpy())
+        performance = returns.result(periods_per_year)
+        performance.update(metrics.activity_stats(invested.sum(), traded_value, len(portfolio),
+                                                  returns.value_sum / len(portfolio), periods_per_year))
+        return {
+            "Final Value": final_value,
+            "Total Return": final_value / portfolio.iloc[0] - 1,
+            "Buy and Hold Return": buy_and_hold_return,
+            "Total Trades": total_trades,
+            "Win Rate": (pnl_pcts > 0).mean() if total_trades > 0 else 0,
+            "Average PnL": pnl_pcts.mean() if total_trades > 0 else 0,
+            "Max Profit": pnl_pcts.max() if total_trades > 0 else 0,
+            "Max Loss": pnl_pcts.min() if total_trades > 0 else 0,
+            **performance,
         }
-        return formatted_summary
\ No newline at end of file
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from stock_analyse_toolbox import indicator_plot, indicators, k_line_plot
+
+CHARTS = ('ohlc', 'indicators')
+
+# plot_indicators 支援的子圖 (plot_ohlc 會忽略其中的 OBV)
+_INDICATOR_PLOT_SUPPORTED = ('RSI', 'MACD', 'OBV', 'KD')
+
+# 記錄每張圖上次繪製時的輸入指紋, 存在 output/<ticker>/ 之下
+_CACHE_NAME = '.render_cache.json'
+
+
+def _init_worker():
+    """worker 使用非互動式的 Agg backend (不開視窗, 也不需要顯示環境)"""
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+
+def _flatten(data):
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy()
+        data.columns = data.columns.get_level_values(0)
+    return data
+
+
+def data_fingerprint(data):
+    """整份 DataFrame (欄名、index 與數值) 的指紋"""
+    columns = [col for col in data.columns if pd.api.types.is_numeric_dtype(data[col])]
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([str(col) for col in columns]).encode())
+    h.update(indicators.fingerprint(*(data[col] for col in columns)).encode())
+    return h.hexdigest()
+
+
+def _chart_fingerprint(data_key, chart, indicator_list, params):
+    payload = json.dumps([data_key, chart, list(indicator_list), params], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _chart_path(chart, ticker, params):
+    folder = os.path.join('output', ticker)
+    if chart == 'ohlc':
+        return os.path.join(folder, f"{ticker}{params.get('save_suffix', '_ohlc')}.png")
+    return os.path.join(folder, f'{ticker}_indicators.png')
+
+
+def _read_cache(ticker):
+    path = os.path.join('output', ticker, _CACHE_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(ticker, cache):
+    folder = os.path.join('output', ticker)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, _CACHE_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _render_group(data, tasks):
+    """
+    在 worker 中依序繪製同一份資料的多張圖: 資料只傳送一次,
+    SMA / EMA / BB 等指標也透過該 worker 的 indicators 快取共用。
+    """
+    import matplotlib.pyplot as plt
+
+    results = []
+    for task in tasks:
+        result = dict(task, status='rendered', error=None)
+        params = dict(task['params'])
+        try:
+            if task['chart'] == 'ohlc':
+                k_line_plot.plot_ohlc(data.copy(), ticker=task['ticker'],
+                                      strategy_indicators=list(task['indicators']), **params)
+            else:
+                indicator_plot.plot_indicators(data.copy(), ticker=task['ticker'],
+                                               indicators_to_plot=list(task['indicators']),
+                                               xaxis_freq=params.get('xaxis_freq', 'auto'))
+        except Exception:
+            result['status'] = 'failed'
+            result['error'] = traceback.format_exc()
+        finally:
+            plt.close('all')
+        results.append(result)
+    return results
+
+
+def render_charts(jobs, charts=CHARTS, max_workers=None, force=False):
+    """
+    以 process pool 與非互動式 backend 批次繪製 K 線圖 (plot_ohlc) 與技術指標圖 (plot_indicators)。
+
+    輸出位置與單獨呼叫時相同 (output/<ticker>/)。每張圖的輸入指紋 (資料內容、指標與參數)
+    記錄在 output/<ticker>/.render_cache.json，指紋未變且圖檔仍存在時直接略過。
+
+    Args:
+        jobs (list): [(data, ticker, indicators, params), ...].
+                     indicators 例如 ['RSI', 'MACD']; params 為傳給 plot_ohlc 的參數
+                     (save_suffix, xaxis_freq, period, overbought, oversold ...).
+        charts (tuple, optional): 每個工作要畫的圖, 'ohlc' 及 / 或 'indicators'.
+        max_workers (int, optional): worker 數量, 預設為 CPU 核心數.
+        force (bool, optional): True 時忽略指紋, 全部重畫.
+
+    Returns:
+        list[dict]: 每張圖一筆, 依 jobs 的順序: job_id, ticker, chart, path,
+                    status ('rendered' / 'skipped' / 'failed'), error (失敗時的 traceback).
+    """
+    unknown = set(charts) - set(CHARTS)
+    if unknown:
+        raise ValueError(f"charts must be chosen from {CHARTS}, got {sorted(unknown)}")
+    max_workers = max_workers or os.cpu_count() or 1
+
+    caches = {}
+    frames = {}  # 資料指紋 -> data
+    tasks = []
+    for job_id, (data, ticker, indicator_list, params) in enumerate(jobs):
+        data = _flatten(data)
+        params = dict(params or {})
+        data_key = data_fingerprint(data)
+        frames.setdefault(data_key, data)
+        caches.setdefault(ticker, _read_cache(ticker))
+
+        for chart in charts:
+            chart_indicators = list(indicator_list)
+            if chart == 'indicators':
+                chart_indicators = [ind for ind in chart_indicators if ind in _INDICATOR_PLOT_SUPPORTED]
+                if not chart_indicators:
+                    continue
+            tasks.append({
+                'job_id': job_id, 'ticker': ticker, 'chart': chart,
+                'path': _chart_path(chart, ticker, params), 'data_key': data_key,
+                'indicators': chart_indicators, 'params': params,
+                'fingerprint': _chart_fingerprint(data_key, chart, chart_indicators, params),
+            })
+
+    # 同一個檔案只保留最後一個工作 (依序繪製時前面的圖也會被覆蓋)
+    final = {task['path']: task for task in tasks}
+    groups = {}  # 資料指紋 -> [task, ...]
+    results = []
+    for task in tasks:
+        cached = caches[task['ticker']].get(os.path.basename(task['path']))
+        unchanged = cached == task['fingerprint'] and os.path.exists(task['path'])
+        if final[task['path']] is not task or (unchanged and not force):
+            results.append(dict(task, status='skipped', error=None))
+        else:
+            groups.setdefault(task['data_key'], []).append(task)
+
+    if groups:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(_render_group, frames[key], group): group for key, group in groups.items()}
+            for future in as_completed(futures):
+                try:
+                    results.extend(future.result())
+                except Exception:
+                    # worker 本身異常終止 (例如 BrokenProcessPool)
+                    error = traceback.format_exc()
+                    results.extend(dict(task, status='failed', error=error) for task in futures[future])
+
+    # 只有主程序寫入指紋記錄, 避免多個 worker 同時寫同一個檔案
+    for result in results:
+        if result['status'] == 'rendered':
+            caches[result['ticker']][os.path.basename(result['path'])] = result['fingerprint']
+        elif result['status'] == 'failed':
+            caches[result['ticker']].pop(os.path.basename(result['path']), None)
+    for ticker in {result['ticker'] for result in results if result['status'] != 'skipped'}:
+        _write_cache(ticker, caches[ticker])
+
+    results.sort(key=lambda r: (r['job_id'], CHARTS.index(r['chart'])))
+    return [
+        {key: r[key] for key in ('job_id', 'ticker', 'chart', 'path', 'status', 'error')}
+        for r in results
+    ]
@@ -0,0 +1,156 @@
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from stock_analyse_toolbox import kernels, metrics
+from stock_analyse_toolbox.back_tester import _SegmentedRun
+from stock_analyse_toolbox.strategies import events_to_state
+from stock_analyse_toolbox.trade_log import TradeLog
+
+
+class RSIChunkStrategy:
+    """rsi_strategy 的分段版本: 跨段保留 RSI 的 EWM 狀態、前一根 RSI 與目前的持有狀態"""
+
+    def __init__(self, period=14, overbought=70, oversold=30):
+        self.overbought = overbought
+        self.oversold = oversold
+        self._rsi = kernels.ChunkedRSI(period)
+        self.block_size = self._rsi.block_size
+        self._prev_rsi = np.nan
+        self._state = 0
+
+    def __call__(self, chunk):
+        rsi = self._rsi.update(chunk['Close'].to_numpy(dtype=float))
+        rsi_prev = np.concatenate([[self._prev_rsi], rsi[:-1]])
+
+        buy_condition = (rsi_prev <= self.oversold) & (rsi > self.oversold)
+        sell_condition = (rsi_prev >= self.overbought) & (rsi < self.overbought)
+        signals = events_to_state(buy_condition, sell_condition, self._state)
+
+        self._prev_rsi = rsi[-1]
+        self._state = signals[-1]
+        return signals
+
+
+class KDChunkStrategy:
+    """kd_strategy 的分段版本: 跨段保留滾動視窗的尾端資料、前一根 %K / %D 與目前的持有狀態"""
+
+    block_size = 1
+
+    def __init__(self, period=14, smooth_window=3, oversold=20, overbought=80):
+        self._stoch = kernels.ChunkedStochastic(period, smooth_window)
+        self._prev_k = np.nan
+        self._prev_d = np.nan
+        self._state = 0
+
+    def __call__(self, chunk):
+        k, d = self._stoch.update(chunk['High'], chunk['Low'], chunk['Close'])
+        k_prev = np.concatenate([[self._prev_k], k[:-1]])
+        d_prev = np.concatenate([[self._prev_d], d[:-1]])
+
+        buy_condition = (k_prev <= d_prev) & (k > d)
+        sell_condition = (k_prev >= d_prev) & (k < d)
+        signals = events_to_state(buy_condition, sell_condition, self._state)
+
+        self._prev_k, self._prev_d = k[-1], d[-1]
+        self._state = signals[-1]
+        return signals
+
+
+CHUNK_STRATEGIES = {
+    'rsi': RSIChunkStrategy,
+    'kd': KDChunkStrategy,
+}
+
+
+class ChunkedBacktester:
+    """
+    分段 (out-of-core) 回測: 從 OHLCVStore 逐段讀取 K 棒，跨段保留指標暖機狀態與部位 / 現金狀態，
+    並將每根 K 棒的 Signal 與 Portfolio 邊算邊寫入磁碟 (.npy)。
+
+    記憶體用量只取決於 chunk_size，與歷史資料長度無關；
+    結果與 Backtester(engine='vectorized') 在記憶體中一次回測完全相同。
+    """
+
+    def __init__(self, store, initial_cash=100000, transaction_fee=0.001425, chunk_size=1_000_000):
+        """
+        Args:
+            store (OHLCVStore): 資料來源.
+            initial_cash (float, optional): 初始資金.
+            transaction_fee (float, optional): 手續費率.
+            chunk_size (int, optional): 每段的 K 棒數 (會向上取整到策略指標要求的區塊長度倍數).
+        """
+        self.store = store
+        self.initial_cash = initial_cash
+        self.transaction_fee = transaction_fee
+        self.chunk_size = chunk_size
+
+        self.trades = TradeLog()
+        self.paths = None
+        self._summary = None
+
+    def run(self, ticker, strategy='rsi', start=None, end=None, interval='1d', output_dir='output', **params):
+        """
+        Args:
+            ticker (str): 股票代碼.
+            strategy (str): 'rsi' (對應 rsi_strategy) 或 'kd' (對應 kd_strategy).
+            start, end, interval: 同 OHLCVStore.load.
+            output_dir (str, optional): 結果輸出的資料夾, 檔案存於 output_dir/ticker/.
+            **params: 策略參數, 與 batch 版策略函式相同.
+
+        Returns:
+            dict: {'Signal': 路徑, 'Portfolio': 路徑}, 可用 results() 以 memory-map 讀回.
+        """
+        if strategy not in CHUNK_STRATEGIES:
+            raise ValueError(f"strategy must be one of {tuple(CHUNK_STRATEGIES)}, got {strategy!r}")
+        strategy_obj = CHUNK_STRATEGIES[strategy](**params)
+        block = strategy_obj.block_size
+        chunk_size = -(-self.chunk_size // block) * block
+
+        n = self.store.count(ticker, start, end, interval)
+        if n == 0:
+            raise ValueError(f"No stored bars for {ticker} ({interval}) in the requested range")
+
+        save_dir = os.path.join(output_dir, ticker)
+        os.makedirs(save_dir, exist_ok=True)
+        self.paths = {
+            'Signal': os.path.join(save_dir, f'{ticker}_{interval}_{strategy}_signal.npy'),
+            'Portfolio': os.path.join(save_dir, f'{ticker}_{interval}_{strategy}_portfolio.npy'),
+        }
+        signal_out = open_memmap(self.paths['Signal'], mode='w+', dtype=np.int8, shape=(n,))
+        portfolio_out = open_memmap(self.paths['Portfolio'], mode='w+', dtype=np.float64, shape=(n,))
+
+        run = _SegmentedRun(self.initial_cash, self.transaction_fee)
+        self.trades = run.trades
+        first_time = last_time = None
+        for chunk in self.store.iter_chunks(ticker, chunk_size, start, end, interval):
+            close = chunk['Close'].to_numpy(dtype=float)
+            signals = strategy_obj(chunk)
+            position = run.n_bars
+            portfolio = run.update(close, signals)
+
+            signal_out[position:position + len(close)] = signals
+            portfolio_out[position:position + len(close)] = portfolio
+            if first_time is None:
+                first_time = chunk.index[0]
+            last_time = chunk.index[-1]
+
+        # 處理期末仍持倉的情況 (強制平倉) 並計算摘要
+        self._summary = run.finish(metrics.span_periods_per_year(first_time, last_time, n))
+
+        signal_out.flush()
+        portfolio_out.flush()
+        del signal_out, portfolio_out
+        return self.paths
+
+    def results(self):
+        """以 memory-map 讀回 Signal / Portfolio (不會整個載入記憶體)"""
+        if self.paths is None:
+            raise Exception("請先執行 run() 才能取得結果。")
+        return {name: np.load(path, mmap_mode='r') for name, path in self.paths.items()}
+
+    def get_summary_stats(self):
+        if self._summary is None:
+            raise Exception("請先執行 run() 才能取得摘要。")
+        return dict(self._summary)
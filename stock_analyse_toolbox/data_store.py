@@ -0,0 +1,306 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# 與 yfinance 下載後攤平的欄位順序相同
+COLUMNS = ['Close', 'High', 'Low', 'Open', 'Volume']
+
+# 重寫檔案時預留的空間 (K 棒數): 之後接在最後面的新資料直接寫入, 不需要重寫整個檔案
+_SPARE_RATIO = 0.25
+_MIN_SPARE = 1024
+
+
+def normalize(data):
+    """
+    攤平 yfinance 的 MultiIndex 欄位 (與 Backtester.__init__ 相同, 取第一層),
+    只保留 OHLCV 欄位並依時間排序、去除重複的 K 棒.
+    """
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy(deep=False)
+        data.columns = [col[0] for col in data.columns]
+    if data.empty:
+        return pd.DataFrame(columns=COLUMNS, dtype=float)
+    data = data[COLUMNS].astype(float)
+    data.index = pd.DatetimeIndex(data.index)
+    return data[~data.index.duplicated(keep='last')].sort_index()
+
+
+def yfinance_fetcher(ticker, start, end, interval):
+    """預設的資料來源: 透過 yfinance 下載 (只有在需要補資料時才 import)"""
+    import yfinance as yf
+    return yf.download(ticker, start=start, end=end, interval=interval)
+
+
+class OHLCVStore:
+    """
+    本機的 OHLCV 資料庫: 每個 (ticker, interval) 一個可 memory-map 的欄式 .npy 檔。
+
+    檔案內容是 shape (6, capacity) 的 float64 陣列，第 0 列是日期 (int64 ns, 以 bit 形式存放)，
+    其餘依序為 COLUMNS；每個欄位在檔案中是連續的，讀取時只會載入需要的區間。
+    各檔的時區、實際的 K 棒數 (bars, 其後為預留空間) 與已涵蓋的日期區間記錄在 root/manifest.json;
+    manifest 在資料寫入後才更新, 新增資料時寫到一半中斷, 讀到的仍是原本的 K 棒:
+    接在最後面的新資料寫入 bars 之後的預留空間 (manifest 更新前不會被讀到),
+    會取代既有 K 棒的寫入則先寫到暫存檔再以 os.replace 置換。
+    """
+
+    def __init__(self, root='data', fetcher=None):
+        """
+        Args:
+            root (str, optional): 資料夾路徑.
+            fetcher (callable, optional): 補資料用的函式 fetcher(ticker, start, end, interval) -> DataFrame,
+                                          預設為 yfinance_fetcher. 測試時可換成本機的 stub.
+        """
+        self.root = root
+        self.fetcher = fetcher or yfinance_fetcher
+        os.makedirs(root, exist_ok=True)
+        self._manifest_path = os.path.join(root, 'manifest.json')
+
+    # --- 檔案 / manifest ---
+
+    def path(self, ticker, interval='1d'):
+        return os.path.join(self.root, f'{ticker}_{interval}.npy')
+
+    def _read_manifest(self):
+        if not os.path.exists(self._manifest_path):
+            return {}
+        with open(self._manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        tmp_path = self._manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _meta(self, ticker, interval):
+        return self._read_manifest().get(f'{ticker}_{interval}')
+
+    def _open(self, ticker, interval, meta=None):
+        """以 memory-map 開啟檔案 (不會讀入整個檔案) 並去掉預留空間, 不存在則回傳 None"""
+        path = self.path(ticker, interval)
+        if not os.path.exists(path):
+            return None
+        array = np.load(path, mmap_mode='r')
+        bars = (meta or self._meta(ticker, interval) or {}).get('bars')
+        return array if bars is None else array[:, :bars]
+
+    def _to_timestamp(self, value, tz):
+        ts = pd.Timestamp(value)
+        if tz is not None and ts.tzinfo is None:
+            ts = ts.tz_localize(tz)
+        elif tz is None and ts.tzinfo is not None:
+            ts = ts.tz_convert(None)
+        return ts
+
+    # --- 讀取 ---
+
+    def tickers(self, interval='1d'):
+        suffix = f'_{interval}'
+        return sorted(key[:-len(suffix)] for key in self._read_manifest() if key.endswith(suffix))
+
+    def date_range(self, ticker, interval='1d'):
+        """回傳 (第一根, 最後一根) 的時間, 沒有資料則回傳 None"""
+        meta = self._meta(ticker, interval)
+        array = self._open(ticker, interval, meta)
+        if array is None or array.shape[1] == 0:
+            return None
+        tz = meta['tz']
+        dates = array[0].view(np.int64)
+        return tuple(self._index(dates[[0, -1]], tz, None))
+
+    def _index(self, dates_ns, tz, name):
+        index = pd.DatetimeIndex(np.asarray(dates_ns).view('datetime64[ns]'), name=name)
+        if tz is not None:
+            index = index.tz_localize('UTC').tz_convert(tz)
+        return index
+
+    def load(self, ticker, start=None, end=None, interval='1d', update=False):
+        """
+        讀取 [start, end) 區間的 OHLCV，回傳與 yfinance 攤平後相同格式的 DataFrame
+        (可直接交給 Backtester)。只有該區間會從磁碟讀入記憶體。
+
+        Args:
+            ticker (str): 股票代碼.
+            start, end (str | Timestamp, optional): 日期區間, end 不包含. 省略表示不限.
+            interval (str, optional): K 棒週期, 例如 '1d', '1h', '1m'.
+            update (bool, optional): True 時先用 fetcher 補齊本機缺少的日期區間 (需要 start / end).
+        """
+        if update:
+            self.update(ticker, start, end, interval)
+
+        array, meta, lo, hi = self._slice(ticker, start, end, interval)
+        return self._frame(array, meta, lo, hi)
+
+    def iter_chunks(self, ticker, chunk_size, start=None, end=None, interval='1d'):
+        """
+        依序讀取 [start, end) 區間的 OHLCV，每次只從磁碟讀入 chunk_size 根 K 棒
+        (格式同 load)，記憶體用量只取決於 chunk_size，與資料總長度無關。
+        """
+        array, meta, lo, hi = self._slice(ticker, start, end, interval)
+        for chunk_lo in range(lo, hi, chunk_size):
+            yield self._frame(array, meta, chunk_lo, min(chunk_lo + chunk_size, hi))
+
+    def count(self, ticker, start=None, end=None, interval='1d'):
+        """[start, end) 區間的 K 棒數 (不讀入資料)"""
+        _, _, lo, hi = self._slice(ticker, start, end, interval)
+        return hi - lo
+
+    def _slice(self, ticker, start, end, interval):
+        """開啟檔案並以 searchsorted 找出 [start, end) 對應的欄位範圍"""
+        meta = self._meta(ticker, interval)
+        array = self._open(ticker, interval, meta)
+        if array is None:
+            if meta is None:
+                raise KeyError(f"No stored data for {ticker} ({interval}); call update() first")
+            # 已涵蓋但區間內沒有任何 K 棒 (例如只有假日)
+            array = np.empty((len(COLUMNS) + 1, 0))
+        tz = meta['tz']
+
+        dates = array[0].view(np.int64)
+        lo = 0 if start is None else np.searchsorted(dates, self._to_timestamp(start, tz).value, side='left')
+        hi = len(dates) if end is None else np.searchsorted(dates, self._to_timestamp(end, tz).value, side='left')
+        return array, meta, int(lo), int(hi)
+
+    def _frame(self, array, meta, lo, hi):
+        index = self._index(array[0, lo:hi].view(np.int64), meta['tz'], meta['index_name'])
+        values = np.array(array[1:, lo:hi]).T
+        return pd.DataFrame(values, index=index, columns=COLUMNS)
+
+    # --- 寫入 ---
+
+    def append(self, ticker, data, interval='1d'):
+        """
+        將新資料併入本機檔案 (相同時間的 K 棒以新資料為準)，回傳新增的 K 棒數。
+        新資料在已存資料之後 (或只取代最後幾根) 時直接寫入預留空間, 否則重寫整個檔案。
+        """
+        data = normalize(data)
+        if data.empty:
+            return 0
+
+        key = f'{ticker}_{interval}'
+        manifest = self._read_manifest()
+        meta = manifest.get(key, {'covered': None})
+        existing = self._open(ticker, interval, meta)
+        if existing is None:
+            # 第一次寫入 (可能已有 mark_covered 建立的項目): 時區與 index 名稱以資料為準
+            meta['tz'] = str(data.index.tz) if data.index.tz is not None else None
+            meta['index_name'] = data.index.name or 'Date'
+        index = data.index
+        if meta['tz'] is not None:
+            index = index.tz_convert('UTC').tz_localize(None) if index.tz is not None else index
+        elif index.tz is not None:
+            index = index.tz_convert(None)
+        new_dates = index.as_unit('ns').asi8
+        new_values = data.to_numpy().T
+
+        if existing is not None:
+            old_dates = existing[0].view(np.int64)
+            n_before = len(old_dates)
+            # 新資料之後的舊 K 棒都會被取代時 (通常是接在最後面, 或重抓最後幾根), 從 lo 開始原地寫入
+            lo = int(np.searchsorted(old_dates, new_dates[0]))
+            if np.isin(old_dates[lo:], new_dates).all() and self._write_tail(ticker, interval, lo, n_before,
+                                                                             new_dates, new_values):
+                meta['bars'] = lo + len(new_dates)
+                manifest[key] = meta
+                self._write_manifest(manifest)
+                return meta['bars'] - n_before
+            keep = ~np.isin(old_dates, new_dates)
+            dates = np.concatenate([old_dates[keep], new_dates])
+            values = np.concatenate([existing[1:, keep], new_values], axis=1)
+        else:
+            dates, values, n_before = new_dates, new_values, 0
+
+        order = np.argsort(dates, kind='stable')
+        bars = len(dates)
+        array = np.empty((len(COLUMNS) + 1, bars + max(int(bars * _SPARE_RATIO), _MIN_SPARE)), dtype=np.float64)
+        array[0, :bars] = dates[order].view(np.float64)
+        array[1:, :bars] = values[:, order]
+        array[:, bars:] = np.nan
+
+        path = self.path(ticker, interval)
+        tmp_path = path + '.tmp.npy'
+        np.save(tmp_path, array)
+        os.replace(tmp_path, path)
+
+        meta['bars'] = bars
+        manifest[key] = meta
+        self._write_manifest(manifest)
+        return bars - n_before
+
+    def _write_tail(self, ticker, interval, lo, bars, new_dates, new_values):
+        """
+        由第 lo 根開始寫入新資料 (使用檔案的預留空間, 不重新排列前面的資料)。
+        lo == bars (只接在最後面) 時原地寫入; 會覆蓋既有 K 棒時先複製到暫存檔, 寫入後再置換,
+        中斷時不會留下新舊混合的資料。
+        預留空間不足 (或舊格式的檔案沒有預留空間) 時回傳 False, 由呼叫端重寫檔案。
+        """
+        path = self.path(ticker, interval)
+        hi = lo + len(new_dates)
+        if hi > np.load(path, mmap_mode='r').shape[1]:
+            return False
+        target = path
+        if lo < bars:
+            target = path + '.tmp.npy'
+            shutil.copyfile(path, target)
+        array = np.load(target, mmap_mode='r+')
+        array[0, lo:hi] = new_dates.view(np.float64)
+        array[1:, lo:hi] = new_values
+        array.flush()
+        del array
+        if target != path:
+            os.replace(target, path)
+        return True
+
+    def missing_ranges(self, ticker, start, end, interval='1d'):
+        """
+        回傳本機尚未涵蓋的日期區間 [(start, end), ...] (可能為空)。
+        """
+        if start is None or end is None:
+            raise ValueError("update() needs both start and end")
+        meta = self._meta(ticker, interval)
+        tz = meta['tz'] if meta else None
+        start = self._to_timestamp(start, tz)
+        end = self._to_timestamp(end, tz)
+        # 未來的日期還沒有資料, 不算已涵蓋
+        end = min(end, pd.Timestamp.now(tz=start.tz))
+
+        covered = meta['covered'] if meta else None
+        if covered is None:
+            missing = [(start, end)]
+        else:
+            covered_start, covered_end = (self._to_timestamp(v, tz) for v in covered)
+            missing = []
+            if start < covered_start:
+                missing.append((start, covered_start))
+            if end > covered_end:
+                missing.append((covered_end, end))
+        return [(lo, hi) for lo, hi in missing if lo < hi]
+
+    def mark_covered(self, ticker, ranges, interval='1d'):
+        """把已補齊的日期區間併入 manifest 的 covered 範圍"""
+        if not ranges:
+            return
+        key = f'{ticker}_{interval}'
+        manifest = self._read_manifest()
+        meta = manifest.get(key, {'tz': None, 'index_name': 'Date', 'covered': None})
+        bounds = [ts for pair in ranges for ts in pair]
+        if meta['covered'] is not None:
+            bounds += [self._to_timestamp(v, meta['tz']) for v in meta['covered']]
+        meta['covered'] = [min(bounds).isoformat(), max(bounds).isoformat()]
+        manifest[key] = meta
+        self._write_manifest(manifest)
+
+    def update(self, ticker, start, end, interval='1d'):
+        """
+        只向 fetcher 請求本機尚未涵蓋的日期區間並併入檔案，回傳新增的 K 棒數。
+        (同時補多檔股票請用 ingest.ingest, 會並行下載。)
+        """
+        missing = self.missing_ranges(ticker, start, end, interval)
+        added = 0
+        for fetch_start, fetch_end in missing:
+            added += self.append(ticker, self.fetcher(ticker, fetch_start, fetch_end, interval), interval)
+        self.mark_covered(ticker, missing, interval)
+        return added
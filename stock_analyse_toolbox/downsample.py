@@ -0,0 +1,116 @@
+"""
+繪圖前的降採樣: 讓很長的序列 (分鐘線、十年日線) 在繪圖時只保留與圖片像素寬度相當的點數，
+繪圖時間與圖檔大小不再隨資料長度成長。
+
+- K 棒: 連續等長分組後合併成較大的 K 棒 (Open 取第一根、High 取最大、Low 取最小、Close 取最後一根、Volume 加總)
+- 與 K 棒對齊的指標線: 每組以 LTTB (Largest-Triangle-Three-Buckets) 挑一個最能保留形狀的點
+- 獨立的折線 (indicator_plot): 每組保留最小值與最大值兩個點 (依時間順序)
+- 買賣點: 組內只要出現過就標在合併後的那根 K 棒上
+"""
+import numpy as np
+import pandas as pd
+
+# 每根合併後的 K 棒大約佔用的像素寬度
+PIXELS_PER_CANDLE = 3
+
+
+def pixel_width(width_inches):
+    """figure 寬度 (英吋) 在存檔時對應的像素數"""
+    import matplotlib.pyplot as plt
+    dpi = plt.rcParams['savefig.dpi']
+    if dpi == 'figure':
+        dpi = plt.rcParams['figure.dpi']
+    return int(width_inches * dpi)
+
+
+def bucket_starts(n, n_buckets):
+    """將 n 個點連續分成至多 n_buckets 組 (每組點數相同, 最後一組可能較少)，回傳每組的起始位置"""
+    size = max(1, -(-n // max(1, n_buckets)))
+    return np.arange(0, n, size)
+
+
+def ohlcv(data, starts):
+    """
+    依 bucket_starts 的分組合併 OHLCV，index 為每組第一根 K 棒的時間。
+    """
+    columns = {}
+    if 'Open' in data.columns:
+        columns['Open'] = data['Open'].to_numpy(dtype=float)[starts]
+    if 'High' in data.columns:
+        columns['High'] = np.fmax.reduceat(data['High'].to_numpy(dtype=float), starts)
+    if 'Low' in data.columns:
+        columns['Low'] = np.fmin.reduceat(data['Low'].to_numpy(dtype=float), starts)
+    if 'Close' in data.columns:
+        ends = np.append(starts[1:], len(data)) - 1
+        columns['Close'] = data['Close'].to_numpy(dtype=float)[ends]
+    if 'Volume' in data.columns:
+        columns['Volume'] = np.add.reduceat(np.nan_to_num(data['Volume'].to_numpy(dtype=float)), starts)
+    return pd.DataFrame(columns, index=data.index[starts])
+
+
+def any_in_bucket(condition, starts):
+    """每組中是否有任何一個點為 True (買賣點用)"""
+    return np.logical_or.reduceat(np.asarray(condition, dtype=bool), starts)
+
+
+def lttb(values, starts):
+    """
+    LTTB: 每組挑一個點, 使它與前一組已選的點、下一組的平均點構成的三角形面積最大，
+    保留尖峰與轉折。回傳每組選中的值 (全為 NaN 的組回傳 NaN)。
+    """
+    y = np.asarray(values, dtype=float)
+    n = len(y)
+    ends = np.append(starts[1:], n)
+    x = np.arange(n, dtype=float)
+
+    # 每組有效點的平均位置 / 平均值 (當作下一組的參考點)
+    valid = ~np.isnan(y)
+    counts = np.add.reduceat(valid.astype(float), starts)
+    with np.errstate(invalid='ignore'):
+        mean_x = np.add.reduceat(np.where(valid, x, 0), starts) / counts
+        mean_y = np.add.reduceat(np.where(valid, y, 0), starts) / counts
+
+    out = np.full(len(starts), np.nan)
+    prev_x = prev_y = np.nan
+    for i, (lo, hi) in enumerate(zip(starts, ends)):
+        bucket_x, bucket_y = x[lo:hi], y[lo:hi]
+        if counts[i] == 0:
+            continue
+        if np.isnan(prev_y) or i + 1 >= len(starts) or counts[i + 1] == 0:
+            # 第一組、最後一組或相鄰組沒有資料時, 取離組平均最遠的點
+            area = np.abs(bucket_y - mean_y[i])
+        else:
+            area = np.abs((prev_x - mean_x[i + 1]) * (bucket_y - prev_y)
+                          - (prev_x - bucket_x) * (mean_y[i + 1] - prev_y))
+        pick = int(np.nanargmax(np.where(np.isnan(bucket_y), -1, area)))
+        prev_x, prev_y = bucket_x[pick], bucket_y[pick]
+        out[i] = prev_y
+    return out
+
+
+def minmax(index, values, max_points):
+    """
+    每組保留最小值與最大值兩個點 (依原本的時間順序)，總點數不超過 max_points。
+    資料本身不超過 max_points 時原樣回傳。max_points 至少為 4 (兩組, 較小的值視為 4)。
+
+    Returns:
+        (index, values): 降採樣後的 x 與 y.
+    """
+    y = np.asarray(values, dtype=float)
+    n = len(y)
+    max_points = max(int(max_points), 4)
+    if n <= max_points:
+        return index, y
+
+    starts = bucket_starts(n, max_points // 2)
+    size = starts[1] - starts[0]
+    padded = np.full(len(starts) * size, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(len(starts), size)
+
+    empty = np.isnan(blocks).all(axis=1)
+    lo = np.argmin(np.where(np.isnan(blocks), np.inf, blocks), axis=1)
+    hi = np.argmax(np.where(np.isnan(blocks), -np.inf, blocks), axis=1)
+    picks = np.sort(np.stack([lo, hi], axis=1), axis=1) + starts[:, None]
+    picks = np.unique(picks[~empty].ravel())
+    return index[picks], y[picks]
@@ -0,0 +1,340 @@
+"""
+以運算式組合策略訊號: 指標、比較、穿越、AND / OR，最後轉成 Backtester 使用的狀態訊號。
+
+    from stock_analyse_toolbox import expressions as ex
+
+    k, d = ex.stoch_k(), ex.stoch_d()
+    kd_filtered = ex.state(buy=ex.crosses_above(k, d) & (k < 50),
+                           sell=ex.crosses_below(k, d) & (k > 50))
+    rsi_and_ma = ex.state(buy=ex.crosses_above(ex.rsi(14), 30) & (ex.sma(10) > ex.sma(30)),
+                          sell=ex.crosses_below(ex.rsi(14), 70))
+
+    bt.run(kd_filtered)                                    # 組合出的策略可直接當作策略函式
+    plan = ex.compile_plan({'kd': kd_filtered, 'rsi_ma': rsi_and_ma})
+    signals = plan.evaluate(data)                          # 每個策略一欄的 int8 DataFrame
+
+運算式以內容 (運算與參數) 判斷是否相同: compile_plan 會合併所有策略中重複的子運算式，
+每個不同的指標 (例如上例兩個策略都用到的 RSI(14)) 只計算一次，所有策略的事件→狀態轉換也一次完成。
+"""
+import numpy as np
+import pandas as pd
+
+from stock_analyse_toolbox import indicators, profiling
+from stock_analyse_toolbox.strategies import _flatten, _previous, events_to_state
+
+
+class Expr:
+    """
+    運算式節點。數值運算式可做 + - * / 與 > >= < <= 比較 (得到條件)，
+    條件之間可用 & | ~ 組合。key 為節點內容的 tuple, 內容相同的節點視為同一個。
+    """
+
+    def __init__(self, op, *args, kind='number', label=None):
+        self.op = op
+        self.args = args
+        self.kind = kind  # 'number' / 'condition' / 'state'
+        self.label = label  # 指標節點的欄名, 會附在策略訊號上供繪圖使用
+        self.key = (op,) + tuple(a.key if isinstance(a, Expr) else ('const', a) for a in args)
+
+    def __repr__(self):
+        return f'Expr{self.key!r}'
+
+    # --- 數值 ---
+
+    def _arith(self, op, other, reverse=False):
+        _require(self, 'number')
+        _require(other, 'number')
+        return Expr(op, other, self) if reverse else Expr(op, self, other)
+
+    def __add__(self, other):
+        return self._arith('add', other)
+
+    def __radd__(self, other):
+        return self._arith('add', other, reverse=True)
+
+    def __sub__(self, other):
+        return self._arith('sub', other)
+
+    def __rsub__(self, other):
+        return self._arith('sub', other, reverse=True)
+
+    def __mul__(self, other):
+        return self._arith('mul', other)
+
+    def __rmul__(self, other):
+        return self._arith('mul', other, reverse=True)
+
+    def __truediv__(self, other):
+        return self._arith('div', other)
+
+    def __rtruediv__(self, other):
+        return self._arith('div', other, reverse=True)
+
+    def _compare(self, op, other):
+        _require(self, 'number')
+        _require(other, 'number')
+        return Expr(op, self, other, kind='condition')
+
+    def __gt__(self, other):
+        return self._compare('gt', other)
+
+    def __ge__(self, other):
+        return self._compare('ge', other)
+
+    def __lt__(self, other):
+        return self._compare('lt', other)
+
+    def __le__(self, other):
+        return self._compare('le', other)
+
+    def previous(self):
+        """前一根 K 棒的值 (第一根為 NaN)"""
+        return previous(self)
+
+    # --- 條件 ---
+
+    def __and__(self, other):
+        _require(self, 'condition')
+        _require(other, 'condition')
+        return Expr('and', self, other, kind='condition')
+
+    def __or__(self, other):
+        _require(self, 'condition')
+        _require(other, 'condition')
+        return Expr('or', self, other, kind='condition')
+
+    def __invert__(self):
+        _require(self, 'condition')
+        return Expr('not', self, kind='condition')
+
+    # --- 狀態訊號 ---
+
+    def __call__(self, data, **kwargs):
+        """
+        狀態運算式可以直接當作策略函式 (Backtester.run(expr)): 回傳 int8 狀態訊號,
+        用到的指標放在 signals.attrs['indicators'].
+        """
+        _require(self, 'state')
+        if kwargs:
+            raise TypeError(f"composed strategies take no parameters, got {sorted(kwargs)}")
+        plan = self.__dict__.get('_plan')
+        if plan is None:
+            plan = self._plan = compile_plan([self])
+        return plan.evaluate_one(data)
+
+
+def _require(value, kind):
+    actual = value.kind if isinstance(value, Expr) else 'number'
+    if actual != kind:
+        raise TypeError(f"expected a {kind} expression, got a {actual}: {value!r}")
+
+
+# --- 指標與價格 ---
+
+def price(column='Close'):
+    """價格欄位 ('Open', 'High', 'Low', 'Close', 'Volume')"""
+    return Expr('column', column)
+
+
+def close():
+    return price('Close')
+
+
+def rsi(period=14):
+    """Wilder's RSI (與 rsi_strategy 相同)"""
+    return Expr('rsi', period, label=f'RSI_{period}')
+
+
+def _kd(period, smooth_window):
+    return Expr('kd', period, smooth_window)
+
+
+def stoch_k(period=14, smooth_window=3):
+    """隨機指標 %K (與 stoch_d 共用同一次計算)"""
+    return Expr('item', _kd(period, smooth_window), 0, label=f'%K_{period}_{smooth_window}')
+
+
+def stoch_d(period=14, smooth_window=3):
+    """隨機指標 %D"""
+    return Expr('item', _kd(period, smooth_window), 1, label=f'%D_{period}_{smooth_window}')
+
+
+def sma(window=20):
+    """收盤價的簡單移動平均"""
+    return Expr('sma', window, label=f'SMA_{window}')
+
+
+def ema(window=50):
+    """收盤價的指數移動平均"""
+    return Expr('ema', window, label=f'EMA_{window}')
+
+
+def macd(part='line'):
+    """MACD (12, 26, 9); part 為 'line' / 'signal' / 'hist'"""
+    parts = ('line', 'signal', 'hist')
+    if part not in parts:
+        raise ValueError(f"part must be one of {parts}, got {part!r}")
+    return Expr('item', Expr('macd'), parts.index(part), label=f'MACD_{part}')
+
+
+# --- 組合 ---
+
+def previous(expr):
+    if not isinstance(expr, Expr):
+        return expr  # 常數的前一根仍是常數
+    _require(expr, 'number')
+    return Expr('prev', expr)
+
+
+def crosses_above(a, b):
+    """a 向上穿越 b: 前一根 a <= b 且這一根 a > b"""
+    return (previous(a) <= previous(b)) & (a > b) if isinstance(a, Expr) else (previous(b) >= a) & (b < a)
+
+
+def crosses_below(a, b):
+    """a 向下穿越 b: 前一根 a >= b 且這一根 a < b"""
+    return (previous(a) >= previous(b)) & (a < b) if isinstance(a, Expr) else (previous(b) <= a) & (b > a)
+
+
+def state(buy, sell):
+    """
+    買賣事件轉成狀態訊號 (strategies.events_to_state): 買入後持續為 1 直到賣出事件, 同一根同時成立時以賣出為準。
+    """
+    _require(buy, 'condition')
+    _require(sell, 'condition')
+    return Expr('state', buy, sell, kind='state')
+
+
+def hold_while(condition):
+    """條件成立時持有 (1), 不成立時空手 (-1)"""
+    return state(condition, ~condition)
+
+
+# --- 計算 ---
+
+def _price_column(data, column):
+    return data[column].to_numpy(dtype=float)
+
+
+def _binary(func):
+    return lambda data, a, b: func(a, b)
+
+
+_INDICATOR_OPS = {
+    'column': _price_column,
+    'rsi': lambda data, period: indicators.rsi(data['Close'], period).to_numpy(),
+    'kd': lambda data, period, smooth_window: tuple(
+        s.to_numpy() for s in indicators.stochastic(data['High'], data['Low'], data['Close'], period, smooth_window)),
+    'sma': lambda data, window: indicators.sma(data['Close'], window).to_numpy(),
+    'ema': lambda data, window: indicators.ema(data['Close'], window).to_numpy(),
+    'macd': lambda data: tuple(s.to_numpy() for s in indicators.macd(data['Close'])),
+}
+
+_SIGNAL_OPS = {
+    'item': lambda data, values, i: values[i],
+    'prev': lambda data, values: _previous(np.asarray(values, dtype=float)),
+    'add': _binary(np.add),
+    'sub': _binary(np.subtract),
+    'mul': _binary(np.multiply),
+    'div': _binary(np.divide),
+    'gt': _binary(np.greater),
+    'ge': _binary(np.greater_equal),
+    'lt': _binary(np.less),
+    'le': _binary(np.less_equal),
+    'and': _binary(np.logical_and),
+    'or': _binary(np.logical_or),
+    'not': lambda data, values: np.logical_not(values),
+}
+
+
+class EvaluationPlan:
+    """
+    多個組合策略的計算計畫: 所有不同的子運算式依相依順序排成 steps, 每個只計算一次。
+    """
+
+    def __init__(self, strategies):
+        """
+        Args:
+            strategies (dict | list): {名稱: 狀態運算式} 或狀態運算式的列表 (名稱為 0, 1, ...).
+        """
+        if not isinstance(strategies, dict):
+            strategies = dict(enumerate(strategies))
+        for expr in strategies.values():
+            _require(expr, 'state')
+        self.names = list(strategies)
+        self.outputs = list(strategies.values())
+        self.steps = []  # 不含 state 節點, 依相依順序排列
+        seen = set()
+
+        def visit(expr):
+            if expr.key in seen:
+                return
+            seen.add(expr.key)
+            for arg in expr.args:
+                if isinstance(arg, Expr):
+                    visit(arg)
+            if expr.op != 'state':
+                self.steps.append(expr)
+
+        for expr in self.outputs:
+            visit(expr)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __repr__(self):
+        return f'EvaluationPlan({len(self.names)} strategies, {len(self.steps)} steps)'
+
+    def _compute(self, data):
+        values = {}
+        for step in self.steps:
+            args = [values[a.key] if isinstance(a, Expr) else a for a in step.args]
+            if step.op in _INDICATOR_OPS:
+                with profiling.stage('indicator'):
+                    values[step.key] = _INDICATOR_OPS[step.op](data, *args)
+            else:
+                with profiling.stage('signal'):
+                    values[step.key] = _SIGNAL_OPS[step.op](data, *args)
+        return values
+
+    def _states(self, values, n):
+        """所有策略的事件一次轉成狀態, 回傳 (bars, 策略數) 的 int8 矩陣"""
+        with profiling.stage('signal'):
+            if len(self.outputs) == 1:
+                buy, sell = (values[arg.key] for arg in self.outputs[0].args)
+                return events_to_state(buy, sell)[:, None]
+            shape = (n, len(self.outputs))
+            buy = np.empty(shape, dtype=bool)
+            sell = np.empty(shape, dtype=bool)
+            for i, expr in enumerate(self.outputs):
+                buy[:, i] = values[expr.args[0].key]
+                sell[:, i] = values[expr.args[1].key]
+            return events_to_state(buy, sell)
+
+    def evaluate(self, data):
+        """
+        Args:
+            data (pd.DataFrame): OHLCV 資料 (不會被修改).
+
+        Returns:
+            pd.DataFrame: 每個策略一欄的狀態訊號 (int8, 1 / -1 / 0).
+        """
+        data = _flatten(data)
+        values = self._compute(data)
+        return pd.DataFrame(self._states(values, len(data)), index=data.index, columns=self.names)
+
+    def evaluate_one(self, data):
+        """只有一個策略時回傳 Series, 並附上用到的指標 (signals.attrs['indicators'])"""
+        data = _flatten(data)
+        values = self._compute(data)
+        signals = pd.Series(self._states(values, len(data))[:, 0], index=data.index)
+        signals.attrs['indicators'] = {
+            step.label: pd.Series(values[step.key], index=data.index)
+            for step in self.steps if step.label is not None
+        }
+        return signals
+
+
+def compile_plan(strategies):
+    """建立 EvaluationPlan (見 EvaluationPlan.__init__)"""
+    return EvaluationPlan(strategies)
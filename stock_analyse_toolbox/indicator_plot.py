@@ -1,12 +1,17 @@
-def plot_indicators(data, ticker=None, indicators_to_plot=['RSI','MACD','OBV','KD'], xaxis_freq='auto'):
+from stock_analyse_toolbox import downsample, indicators, profiling
+
+
+@profiling.profiled('plot_indicators')
+def plot_indicators(data, ticker=None, indicators_to_plot=['RSI','MACD','OBV','KD'], xaxis_freq='auto',
+                    max_points='auto'):
     """
     畫技術指標，並自動建立資料夾存圖
     xaxis_freq: 'auto' ,'year', 'month', 'day'
+    max_points: 每條線最多繪製的點數, 超過時每組只保留最小 / 最大值 ('auto' 依圖片像素寬度, None 表示不降採樣)
     """
     import matplotlib.dates as mdates
     import os
     import matplotlib.pyplot as plt
-    import ta
     from matplotlib.dates import AutoDateLocator, AutoDateFormatter
 
     if ticker is None:
@@ -16,25 +21,30 @@ def plot_indicators(data, ticker=None, indicators_to_plot=['RSI','MACD','OBV','K
     folder = os.path.join('output', ticker)
     os.makedirs(folder, exist_ok=True)
 
-    # 計算技術指標
     close = data['Close']
     high = data['High']
     low = data['Low']
     volume = data['Volume']
 
-    if 'RSI' in indicators_to_plot:
-        data['RSI'] = ta.momentum.RSIIndicator(close=close, window=14).rsi()
-    if 'MACD' in indicators_to_plot:
-        macd = ta.trend.MACD(close)
-        data['MACD'] = macd.macd()
-        data['MACD_signal'] = macd.macd_signal()
-        data['MACD_hist'] = macd.macd_diff()
-    if 'OBV' in indicators_to_plot:
-        data['OBV'] = ta.volume.OnBalanceVolumeIndicator(close, volume).on_balance_volume()
-    if 'KD' in indicators_to_plot:
-        stoch = ta.momentum.StochasticOscillator(high=high, low=low, close=close, window=14, smooth_window=3)
-        data['%K'] = stoch.stoch()
-        data['%D'] = stoch.stoch_signal()
+    # 計算技術指標 (透過 indicators 快取，與策略 / K 線圖共用)
+    with profiling.stage('indicators'):
+        if 'RSI' in indicators_to_plot:
+            data['RSI'] = indicators.rsi_ta(close, 14)
+        if 'MACD' in indicators_to_plot:
+            data['MACD'], data['MACD_signal'], data['MACD_hist'] = indicators.macd(close)
+        if 'OBV' in indicators_to_plot:
+            data['OBV'] = indicators.obv(close, volume)
+        if 'KD' in indicators_to_plot:
+            data['%K'], data['%D'] = indicators.stochastic(high, low, close, 14, 3)
+
+    # 降採樣: 每條線的點數不超過圖片的像素寬度 (保留每段的最小 / 最大值)
+    if max_points == 'auto':
+        max_points = downsample.pixel_width(14)
+
+    def line(col):
+        if max_points is None:
+            return data.index, data[col]
+        return downsample.minmax(data.index, data[col], max_points)
 
     # 設定 subplot
     n_subplots = len(indicators_to_plot)
@@ -44,25 +54,25 @@ def plot_indicators(data, ticker=None, indicators_to_plot=['RSI','MACD','OBV','K
 
     for ax, ind in zip(axes, indicators_to_plot):
         if ind == 'RSI':
-            ax.plot(data.index, data['RSI'], label='RSI', color='purple')
+            ax.plot(*line('RSI'), label='RSI', color='purple')
             ax.axhline(70, linestyle='--', color='red', alpha=0.7, label='Overbought 70')
             ax.axhline(30, linestyle='--', color='green', alpha=0.7, label='Oversold 30')
             ax.set_ylabel('RSI')
             ax.legend(loc='upper left')
         elif ind == 'MACD':
-            ax.plot(data.index, data['MACD'], label='MACD', color='blue')
-            ax.plot(data.index, data['MACD_signal'], label='Signal', color='red')
-            ax.bar(data.index, data['MACD_hist'], label='MACD Hist', color='gray', alpha=0.4)
+            ax.plot(*line('MACD'), label='MACD', color='blue')
+            ax.plot(*line('MACD_signal'), label='Signal', color='red')
+            ax.bar(*line('MACD_hist'), label='MACD Hist', color='gray', alpha=0.4)
             ax.axhline(0, color='black', linestyle='--')
             ax.set_ylabel('MACD')
             ax.legend(loc='upper left')
         elif ind == 'OBV':
-            ax.plot(data.index, data['OBV'], label='OBV', color='brown')
+            ax.plot(*line('OBV'), label='OBV', color='brown')
             ax.set_ylabel('OBV')
             ax.legend(loc='upper left')
         elif ind == 'KD':
-            ax.plot(data.index, data['%K'], label='%K', color='blue')
-            ax.plot(data.index, data['%D'], label='%D', color='orange')
+            ax.plot(*line('%K'), label='%K', color='blue')
+            ax.plot(*line('%D'), label='%D', color='orange')
             ax.axhline(80, linestyle='--', color='red', alpha=0.7, label='Overbought 80')
             ax.axhline(20, linestyle='--', color='green', alpha=0.7, label='Oversold 20')
             ax.set_ylabel('KD')
@@ -92,5 +102,7 @@ def plot_indicators(data, ticker=None, indicators_to_plot=['RSI','MACD','OBV','K
 
     plt.tight_layout()
     save_path = os.path.join(folder, f'{ticker}_indicators.png')
-    plt.savefig(save_path)
+    with profiling.stage('save'):
+        plt.savefig(save_path)
+        plt.close(fig)
     print(f"Saved indicator chart to {save_path}")
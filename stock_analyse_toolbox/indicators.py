@@ -0,0 +1,164 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from stock_analyse_toolbox import kernels
+
+
+def _nbytes(value):
+    """快取值 (Series 或 Series 的 tuple) 的數值位元組數; index 與輸入資料共用, 不計入"""
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    return int(value.memory_usage(index=False, deep=False))
+
+
+class IndicatorCache:
+    """
+    技術指標的記憶化快取 (LRU)。
+
+    key 由資料指紋、指標名稱與參數組成；數值的總位元組數超過 max_bytes 時淘汰最久未使用的項目
+    (長資料的一個指標就可能有數十 MB, 以項目數限制無法控制記憶體用量)。
+    快取中的 Series 會被多處共用，請勿就地修改。
+    """
+
+    def __init__(self, max_bytes=256 * 2**20):
+        """
+        Args:
+            max_bytes (int, optional): 快取的容量上限 (位元組); 至少保留最近的一項.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._store = OrderedDict()  # key -> (value, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._store:
+                self.hits += 1
+                self._store.move_to_end(key)
+                return self._store[key][0]
+            self.misses += 1
+
+        value = compute()
+        nbytes = _nbytes(value)
+
+        with self._lock:
+            old = self._store.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._store[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and len(self._store) > 1:
+                _, (_, evicted) = self._store.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._store),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+
+# 全域共用的快取: strategies / k_line_plot / indicator_plot 預設都使用它
+default_cache = IndicatorCache()
+
+
+def fingerprint(*series):
+    """以 index 與數值內容計算資料指紋 (內容相同的 Series 會得到相同指紋)"""
+    h = hashlib.blake2b(digest_size=16)
+    for s in series:
+        if isinstance(s.index, pd.DatetimeIndex):
+            h.update(str(s.index.dtype).encode())
+            h.update(s.index.asi8.tobytes())
+        else:
+            h.update(pd.util.hash_pandas_object(s.index, index=False).to_numpy().tobytes())
+        h.update(np.ascontiguousarray(s.to_numpy(dtype=float)).tobytes())
+    return h.hexdigest()
+
+
+def _cached(name, inputs, params, compute, cache):
+    cache = default_cache if cache is None else cache
+    key = (name, fingerprint(*inputs), params)
+    return cache.get_or_compute(key, compute)
+
+
+def _series(values, like, name):
+    """將 kernels 的結果包回與輸入相同 index 的 Series"""
+    return pd.Series(values, index=like.index, name=name)
+
+
+def rsi(close, period=14, cache=None):
+    """Wilder's RSI (rsi_strategy 使用的版本)"""
+    return _cached('RSI', (close,), (period,),
+                   lambda: _series(kernels.rsi(close.to_numpy(dtype=float), period), close, close.name), cache)
+
+
+def rsi_ta(close, period=14, cache=None):
+    """與 ta 套件的 RSIIndicator 相同 (繪圖在資料中沒有 RSI 欄位時使用)"""
+    return _cached('RSI_ta', (close,), (period,),
+                   lambda: _series(kernels.rsi_ta(close.to_numpy(dtype=float), period), close, 'rsi'), cache)
+
+
+def stochastic(high, low, close, period=14, smooth_window=3, cache=None):
+    """隨機指標, 回傳 (%K, %D)"""
+    def compute():
+        k, d = kernels.stochastic(high.to_numpy(dtype=float), low.to_numpy(dtype=float),
+                                  close.to_numpy(dtype=float), period, smooth_window)
+        return _series(k, close, 'stoch_k'), _series(d, close, 'stoch_k_signal')
+    return _cached('KD', (high, low, close), (period, smooth_window), compute, cache)
+
+
+def macd(close, cache=None):
+    """MACD (12, 26, 9), 回傳 (MACD, Signal, Histogram)"""
+    def compute():
+        line, signal, hist = kernels.macd(close.to_numpy(dtype=float))
+        return (_series(line, close, 'MACD_12_26'), _series(signal, close, 'MACD_sign_12_26'),
+                _series(hist, close, 'MACD_diff_12_26'))
+    return _cached('MACD', (close,), (), compute, cache)
+
+
+def sma(close, window=20, cache=None):
+    return _cached('SMA', (close,), (window,),
+                   lambda: _series(kernels.sma(close.to_numpy(dtype=float), window), close, f'sma_{window}'),
+                   cache)
+
+
+def ema(close, window=50, cache=None):
+    return _cached('EMA', (close,), (window,),
+                   lambda: _series(kernels.ema(close.to_numpy(dtype=float), window), close, f'ema_{window}'),
+                   cache)
+
+
+def bollinger(close, window=20, window_dev=2, cache=None):
+    """布林通道, 回傳 (上軌, 下軌)"""
+    def compute():
+        high, _, low = kernels.bollinger(close.to_numpy(dtype=float), window, window_dev)
+        return _series(high, close, 'hband'), _series(low, close, 'lband')
+    return _cached('BB', (close,), (window, window_dev), compute, cache)
+
+
+def obv(close, volume, cache=None):
+    return _cached('OBV', (close, volume), (),
+                   lambda: _series(kernels.obv(close.to_numpy(dtype=float), volume.to_numpy(dtype=float)),
+                                   close, 'obv'),
+                   cache)
@@ -0,0 +1,308 @@
+"""
+多檔股票的並行資料下載: 可替換的資料來源 (provider)、併發上限、速率限制與指數退避重試。
+
+    from stock_analyse_toolbox import ingest
+    from stock_analyse_toolbox.data_store import OHLCVStore
+
+    report = ingest.ingest(['NVDA', 'AAPL', 'MSFT'], start='2020-01-01', end='2025-01-01',
+                           max_workers=8, rate_limit=5, progress=True)
+    report.data['NVDA']                     # 欄位已攤平, 可直接交給 Backtester
+    report.summary()                        # 每檔的狀態 / K 棒數 / 嘗試次數 / 耗時
+
+    store = OHLCVStore('data')              # 指定 store 時只下載本機缺少的區間並寫入
+    ingest.ingest(universe, start='2020-01-01', end='2025-01-01', store=store)
+
+逐檔呼叫 yf.download 時總時間是 N 次網路往返；這裡同時最多有 max_workers 個請求在等待，
+總時間約為 N / max_workers 次往返 (同時受 rate_limit 限制)。
+provider 只要是 provider(ticker, start, end, interval) -> DataFrame 的 callable 即可，
+與 OHLCVStore 的 fetcher 相同；測試時用 FakeProvider 不需要網路。
+"""
+import logging
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from stock_analyse_toolbox import synthetic
+from stock_analyse_toolbox.data_store import COLUMNS, normalize, yfinance_fetcher
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('ok', 'empty', 'failed')
+
+
+class NonRetryableError(Exception):
+    """provider 用來表示重試也不會成功的錯誤 (例如不存在的代碼)"""
+
+
+# --- provider ---
+
+class YFinanceProvider:
+    """yfinance 資料來源 (與 data_store.yfinance_fetcher 相同, 但不輸出下載進度列)"""
+
+    def __call__(self, ticker, start, end, interval):
+        import yfinance as yf
+        return yf.download(ticker, start=start, end=end, interval=interval, progress=False,
+                           auto_adjust=False, threads=False)
+
+
+class FakeProvider:
+    """
+    不需要網路的測試用資料來源: 以 synthetic.make_ohlcv 產生固定的資料 (每檔股票的種子由代碼決定),
+    並模擬網路延遲與暫時性失敗。calls / max_in_flight 記錄呼叫次數與同時進行中的最大請求數。
+    """
+
+    def __init__(self, latency=0.05, failures=None, missing=(), freq='B'):
+        """
+        Args:
+            latency (float, optional): 每次呼叫的延遲秒數.
+            failures (dict, optional): {ticker: 前幾次呼叫要失敗的次數}, 用來測試重試.
+            missing (iterable, optional): 沒有資料的代碼 (丟出 NonRetryableError).
+            freq (str, optional): K 棒頻率.
+        """
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.missing = set(missing)
+        self.freq = freq
+        self.calls = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _index(self, start, end):
+        key = (str(start), str(end))
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = pd.date_range(start, end, freq=self.freq, inclusive='left', name='Date')
+        return index
+
+    def __call__(self, ticker, start, end, interval):
+        with self._lock:
+            attempt = self.calls[ticker] = self.calls.get(ticker, 0) + 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            if ticker in self.missing:
+                raise NonRetryableError(f"{ticker}: no such ticker")
+            if attempt <= self.failures.get(ticker, 0):
+                raise ConnectionError(f"{ticker}: simulated network error (attempt {attempt})")
+            index = self._index(start, end)
+            if len(index) == 0:
+                return pd.DataFrame(columns=COLUMNS, dtype=float)
+            # 'B' 的 date_range 很慢, 數值以固定頻率產生後再換上共用的 index
+            data = synthetic.make_ohlcv(len(index), seed=zlib.crc32(ticker.encode()), freq='D', ticker=ticker)
+            data.index = index
+            return data
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+# --- 速率限制 / 重試 ---
+
+class RateLimiter:
+    """
+    Token bucket: 平均每秒最多 rate 次, 最多累積 burst 次的突發 (thread-safe).
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一個 token, 不足時等待; 回傳等待的秒數"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def backoff_delays(retries, backoff=0.5, max_backoff=30.0, jitter=0.5, seed=None):
+    """
+    各次重試前的等待秒數: backoff * 2**i (上限 max_backoff), 再乘上 [1 - jitter, 1] 的隨機比例,
+    避免大量失敗的請求同時重試.
+    """
+    rng = random.Random(seed)
+    return [min(max_backoff, backoff * 2 ** i) * (1 - jitter * rng.random()) for i in range(retries)]
+
+
+# --- 下載 ---
+
+class IngestReport:
+    """
+    ingest 的結果。data 為 {ticker: DataFrame} (只含成功的代碼),
+    results 為每檔的 {status, bars, attempts, seconds, error}。
+    """
+
+    def __init__(self, tickers):
+        self.tickers = list(tickers)
+        self.data = {}
+        self.results = {}
+        self.elapsed = 0.0
+        self.rate_limited_seconds = 0.0
+
+    def summary(self):
+        """
+        Returns:
+            pd.DataFrame: 以 ticker 為 index, 欄位為 status / bars / attempts / seconds / error.
+        """
+        columns = ['status', 'bars', 'attempts', 'seconds', 'error']
+        rows = [self.results[t] for t in self.tickers if t in self.results]
+        return pd.DataFrame(rows, index=[t for t in self.tickers if t in self.results], columns=columns)
+
+    @property
+    def failed(self):
+        return [t for t in self.tickers if self.results.get(t, {}).get('status') == 'failed']
+
+    def counts(self):
+        counts = dict.fromkeys(STATUSES, 0)
+        for result in self.results.values():
+            counts[result['status']] += 1
+        return counts
+
+    def __repr__(self):
+        counts = ', '.join(f'{k}={v}' for k, v in self.counts().items())
+        return f'IngestReport({len(self.tickers)} tickers, {counts}, {self.elapsed:.2f}s)'
+
+
+def _print_progress(done, total, ticker, result):
+    detail = f"{result['bars']} bars" if result['status'] != 'failed' else result['error']
+    print(f"[{done}/{total}] {ticker}: {result['status']} ({detail}, {result['attempts']} attempt(s), "
+          f"{result['seconds']:.2f}s)")
+
+
+def _fetch(provider, ticker, ranges, interval, limiter, delays):
+    """
+    下載一檔股票的所有區間 (在 worker thread 執行), 回傳 (frames, attempts, error, rate_wait, seconds)。
+    """
+    began = time.perf_counter()
+    frames, attempts, error, rate_wait = [], 0, None, 0.0
+    for start, end in ranges:
+        for attempt in range(len(delays) + 1):
+            if limiter is not None:
+                rate_wait += limiter.acquire()
+            attempts += 1
+            try:
+                frames.append(normalize(provider(ticker, start, end, interval)))
+                break
+            except Exception as exc:
+                if isinstance(exc, NonRetryableError) or attempt == len(delays):
+                    error = f'{type(exc).__name__}: {exc}'
+                    break
+                logger.debug("%s: attempt %d failed (%s), retrying in %.2fs", ticker, attempts, exc, delays[attempt])
+                time.sleep(delays[attempt])
+        if error is not None:
+            break
+    return frames, attempts, error, rate_wait, time.perf_counter() - began
+
+
+def ingest(tickers, start, end, interval='1d', provider=None, store=None, max_workers=8, rate_limit=None,
+           burst=None, retries=3, backoff=0.5, max_backoff=30.0, jitter=0.5, progress=None, seed=None):
+    """
+    並行下載多檔股票的 OHLCV。
+
+    Args:
+        tickers (iterable): 股票代碼.
+        start, end (str | Timestamp): 日期區間, end 不包含.
+        interval (str, optional): K 棒週期.
+        provider (callable, optional): provider(ticker, start, end, interval) -> DataFrame,
+                                       預設為 YFinanceProvider; 指定 store 且省略時使用 store.fetcher.
+        store (data_store.OHLCVStore, optional): 指定時只下載本機缺少的區間, 寫入 store 後
+                                                 report.data 為 store.load 讀回的完整區間.
+                                                 寫入都在呼叫端的 thread 依序進行.
+        max_workers (int, optional): 同時進行中的請求上限.
+        rate_limit (float, optional): 每秒最多的請求數 (所有 worker 合計), None 表示不限.
+        burst (int, optional): 速率限制允許的突發請求數, 預設為 max(1, rate_limit).
+        retries (int, optional): 失敗後的重試次數 (NonRetryableError 不重試).
+        backoff, max_backoff, jitter: 重試等待時間, 見 backoff_delays.
+        progress (callable | bool, optional): 每完成一檔呼叫 progress(done, total, ticker, result);
+                                              True 時輸出一行進度.
+        seed (int, optional): 重試等待時間的亂數種子.
+
+    Returns:
+        IngestReport
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if provider is None:
+        # store 的預設 fetcher 會輸出 yfinance 的下載進度列, 並行時改用不輸出的 YFinanceProvider
+        custom_fetcher = store is not None and store.fetcher is not yfinance_fetcher
+        provider = store.fetcher if custom_fetcher else YFinanceProvider()
+    if progress is True:
+        progress = _print_progress
+    limiter = RateLimiter(rate_limit, burst) if rate_limit is not None else None
+    report = IngestReport(tickers)
+    began = time.perf_counter()
+
+    if store is not None:
+        ranges = {ticker: store.missing_ranges(ticker, start, end, interval) for ticker in tickers}
+    else:
+        ranges = {ticker: [(start, end)] for ticker in tickers}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers) or 1))) as executor:
+        futures = {}
+        for i, ticker in enumerate(tickers):
+            delays = backoff_delays(retries, backoff, max_backoff, jitter,
+                                    seed=None if seed is None else seed + i)
+            futures[executor.submit(_fetch, provider, ticker, ranges[ticker], interval, limiter, delays)] = ticker
+
+        for done, future in enumerate(as_completed(futures), 1):
+            ticker = futures[future]
+            frames, attempts, error, rate_wait, seconds = future.result()
+            report.rate_limited_seconds += rate_wait
+
+            if store is not None:
+                # 失敗時仍保存已下載的區間, 但只把成功的區間記為已涵蓋
+                for frame in frames:
+                    store.append(ticker, frame, interval)
+                store.mark_covered(ticker, ranges[ticker][:len(frames)], interval)
+                if error is not None:
+                    data = None
+                elif store.date_range(ticker, interval) is None:
+                    # 區間內沒有任何 K 棒 (例如只有假日), store 中也還沒有這檔的資料
+                    data = normalize(pd.DataFrame())
+                else:
+                    data = store.load(ticker, start, end, interval)
+            elif error is None:
+                data = frames[0]
+
+            if error is not None:
+                status = 'failed'
+            else:
+                status = 'ok' if len(data) else 'empty'
+                if status == 'ok':
+                    report.data[ticker] = data
+            result = report.results[ticker] = {
+                'status': status,
+                'bars': 0 if error is not None else len(data),
+                'attempts': attempts,
+                'seconds': seconds,
+                'error': error,
+            }
+            if error is not None:
+                logger.warning("%s: failed after %d attempt(s): %s", ticker, attempts, error)
+            if progress:
+                progress(done, len(tickers), ticker, result)
+
+    report.elapsed = time.perf_counter() - began
+    counts = report.counts()
+    logger.info("ingested %d tickers in %.2fs: %d ok, %d empty, %d failed",
+                len(tickers), report.elapsed, counts['ok'], counts['empty'], counts['failed'])
+    return report
@@ -1,11 +1,12 @@
 import os
-import mplfinance as mpf
 import pandas as pd
-import ta
 import numpy as np
 
+from stock_analyse_toolbox import downsample, indicators, profiling
+
+@profiling.profiled('plot_ohlc')
 def plot_ohlc(data, ticker=None, xaxis_freq='auto', save_suffix='_ohlc', 
-              strategy_indicators=[], **kwargs): # *** 修改 1: 增加 new_argument ***
+              strategy_indicators=[], max_bars='auto', **kwargs): # *** 修改 1: 增加 new_argument ***
     """
     畫蠟燭圖、買賣點、並在下方加入指定的技術指標子圖 (Panel)
     
@@ -17,7 +18,15 @@ def plot_ohlc(data, ticker=None, xaxis_freq='auto', save_suffix='_ohlc',
         save_suffix (str, optional): 儲存的檔案名稱後綴.
         strategy_indicators (list, optional): 要在 K 線圖下方額外繪製的指標列表.
                                              支援: ['RSI', 'MACD', 'KD']
+        max_bars (int | str | None, optional): 最多繪製的 K 棒數, 超過時合併成較大的 K 棒.
+                                             'auto' 依圖片像素寬度決定, None 表示不降採樣.
+
+    Returns:
+        str: 圖檔路徑 (資料不足無法繪製時為 None).
     """
+    # 繪圖套件在第一次繪圖時才載入, 只做回測的程式不需要 matplotlib / mplfinance
+    import mplfinance as mpf
+    import matplotlib.pyplot as plt
     
     # --- 1. 資料準備 (與您原先的程式碼相同) ---
     if ticker is None:
@@ -39,20 +48,63 @@ def plot_ohlc(data, ticker=None, xaxis_freq='auto', save_suffix='_ohlc',
         print("資料不足，無法繪製 OHLC")
         return
 
-    # --- 2. 準備 add_plots 列表 (K線圖上的疊圖) ---
+    # --- 2. 計算指標 (在完整資料上計算, 降採樣之後才繪製) ---
     close = data['Close']
     high = data['High']
     low = data['Low']
     volume = data['Volume']
     
+    with profiling.stage('indicators'):
+        # 2a. 計算 SMA / EMA / BB (疊加在 K 線圖上, panel=0，透過 indicators 快取)
+        #     data 中已有這些欄位時直接沿用, 不再重算
+        if 'SMA20' not in data.columns:
+            data['SMA20'] = indicators.sma(close, 20)
+        if 'EMA50' not in data.columns:
+            data['EMA50'] = indicators.ema(close, 50)
+        if 'BB_high' not in data.columns or 'BB_low' not in data.columns:
+            data['BB_high'], data['BB_low'] = indicators.bollinger(close, 20, 2)
+
+        # 2b. 買賣點 (在原始 K 棒上判斷, 降採樣後標在所屬的合併 K 棒上)
+        buy_cond = sell_cond = None
+        if 'Signal' in data.columns:
+            buy_cond = (data['Signal'] == 1) & (data['Signal'].shift(1) != 1)
+            sell_cond = (data['Signal'] == -1) & (data['Signal'].shift(1) == 1)
+
+        # 2c. 子圖指標: 優先使用 data 中已有的欄位 (來自 strategy)
+        # --- 從 kwargs 獲取參數，如果沒有就用預設值 ---
+        period = kwargs.get('period', 14)
+        overbought = kwargs.get('overbought', 70)
+        oversold = kwargs.get('oversold', 30)
+        # ----------------------------------------
+        if 'RSI' in strategy_indicators and 'RSI' not in data.columns:
+            print(f"Warning: Calculating RSI using 'ta' (SMA-based) with period={period}.")
+            # 修正: 確保使用 data['Close']
+            data['RSI'] = indicators.rsi_ta(data['Close'], period)
+        if 'MACD' in strategy_indicators and 'MACD' not in data.columns:
+            print("Warning: Calculating MACD using 'ta'.")
+            data['MACD'], data['MACD_signal'], data['MACD_hist'] = indicators.macd(close)
+        if 'KD' in strategy_indicators and ('%K' not in data.columns or '%D' not in data.columns):
+            print("Warning: Calculating KD using 'ta'.")
+            data['%K'], data['%D'] = indicators.stochastic(high, low, close, 14, 3)
+
+    # 2d. 降採樣: K 棒數超過圖片寬度能呈現的數量時, 合併成較大的 K 棒,
+    #     指標線以 LTTB 在每根合併 K 棒中挑一個點 (繪圖時間與資料長度無關)
+    if max_bars == 'auto':
+        max_bars = downsample.pixel_width(14) // downsample.PIXELS_PER_CANDLE
+    if max_bars is not None and len(data) > max_bars:
+        with profiling.stage('downsample'):
+            starts = downsample.bucket_starts(len(data), max_bars)
+            plot_data = downsample.ohlcv(data, starts)
+            for col in data.columns:
+                if col not in plot_data.columns and pd.api.types.is_numeric_dtype(data[col]):
+                    plot_data[col] = downsample.lttb(data[col], starts)
+            if buy_cond is not None:
+                buy_cond = pd.Series(downsample.any_in_bucket(buy_cond, starts), index=plot_data.index)
+                sell_cond = pd.Series(downsample.any_in_bucket(sell_cond, starts), index=plot_data.index)
+            data = plot_data
+
+    # --- 3. 準備 add_plots 列表 (K線圖上的疊圖) ---
     add_plots = []
-    
-    # 2a. 計算 SMA / EMA / BB (疊加在 K 線圖上, panel=0)
-    data['SMA20'] = ta.trend.SMAIndicator(close=close, window=20).sma_indicator()
-    data['EMA50'] = ta.trend.EMAIndicator(close=close, window=50).ema_indicator()
-    bb = ta.volatility.BollingerBands(close, window=20, window_dev=2)
-    data['BB_high'] = bb.bollinger_hband()
-    data['BB_low'] = bb.bollinger_lband()
 
     if data['SMA20'].notna().any():
         add_plots.append(mpf.make_addplot(data['SMA20'], color='blue', width=1, label='SMA20', panel=0))
@@ -63,10 +115,8 @@ def plot_ohlc(data, ticker=None, xaxis_freq='auto', save_suffix='_ohlc',
     if data['BB_low'].notna().any():
         add_plots.append(mpf.make_addplot(data['BB_low'], color='orange', linestyle='--', alpha=0.7, label='BB Low', panel=0))
 
-    # 2b. 繪製買賣訊號 (疊加在 K 線圖上, panel=0)
-    if 'Signal' in data.columns:
-        buy_cond = (data['Signal'] == 1) & (data['Signal'].shift(1) != 1)
-        sell_cond = (data['Signal'] == -1) & (data['Signal'].shift(1) == 1)
+    # 3a. 繪製買賣訊號 (疊加在 K 線圖上, panel=0)
+    if buy_cond is not None:
         buy_markers = pd.Series(np.nan, index=data.index)
         sell_markers = pd.Series(np.nan, index=data.index)
         buy_markers[buy_cond] = data['Low'][buy_cond] * 0.98 
@@ -78,7 +128,7 @@ def plot_ohlc(data, ticker=None, xaxis_freq='auto', save_suffix='_ohlc',
             add_plots.append(mpf.make_addplot(sell_markers, type='scatter', marker='v', color='r', markersize=150, label='Sell', panel=0))
 
             
-    # --- 3. 準備子圖指標 (Indicators in new panels) ---
+    # 3b. 準備子圖指標 (Indicators in new panels)
     
     # K 線圖佔 3 份高度
     panel_ratios = [3] 
@@ -89,23 +139,12 @@ def plot_ohlc(data, ticker=None, xaxis_freq='auto', save_suffix='_ohlc',
     
     # 指標從 panel 2 開始
     current_panel = 2 
+    hlines = [] # (panel, y, color)
 
     for ind in strategy_indicators:
         if ind == 'RSI':
-            # --- 從 kwargs 獲取參數，如果沒有就用預設值 ---
-            period = kwargs.get('period', 14)
-            overbought = kwargs.get('overbought', 70)
-            oversold = kwargs.get('oversold', 30)
-            # ----------------------------------------
-            
-            # ** 關鍵 **: 優先使用 data 中已有的 'RSI' (來自 strategy)
-            if 'RSI' not in data.columns:
-                print(f"Warning: Calculating RSI using 'ta' (SMA-based) with period={period}.")
-                # 修正: 確保使用 data['Close']
-                data['RSI'] = ta.momentum.RSIIndicator(close=data['Close'], window=period).rsi() 
-
             rsi_ylabel = f"RSI({period})\n{overbought} (OB)\n{oversold} (OS)"
-           # --- 3. (新功能) 繪製 RSI 主線條 + 強制 Y 軸 ---
+           # --- 繪製 RSI 主線條 + 強制 Y 軸 ---
             # 1. 加上 ylim 來強制 Y 軸範圍 0-100
             # 2. 替換 ylabel 
             add_plots.append(mpf.make_addplot(
@@ -116,36 +155,15 @@ def plot_ohlc(data, ticker=None, xaxis_freq='auto', save_suffix='_ohlc',
                 ylim=(0, 100)      # <-- 新增: 強制 Y 軸範圍
             ))
             
-            # --- 4. (新功能) 繪製動態的水平線 + 強制 Y 軸 ---
-            # 這裡也加上 ylim=(0, 100) 是為了確保 Y 軸在所有 plot 之間保持一致
-            add_plots.append(mpf.make_addplot(
-                pd.Series(overbought, index=data.index), 
-                panel=current_panel, 
-                color='red', 
-                linestyle='--', 
-                alpha=0.7,
-                ylim=(0, 100)      # <-- 新增: 保持 Y 軸一致
-            ))
-            add_plots.append(mpf.make_addplot(
-                pd.Series(oversold, index=data.index), 
-                panel=current_panel, 
-                color='green', 
-                linestyle='--', 
-                alpha=0.7,
-                ylim=(0, 100)      # <-- 新增: 保持 Y 軸一致
-            ))
+            # --- 繪製動態的水平線 ---
+            # 水平線在 mpf.plot 之後以 axhline 直接畫在該 panel 上, 不需建立整條常數 Series
+            hlines.append((current_panel, overbought, 'red'))
+            hlines.append((current_panel, oversold, 'green'))
             
             panel_ratios.append(1) # RSI 佔 1 份高度
             current_panel += 1
 
         elif ind == 'MACD':
-            if 'MACD' not in data.columns:
-                print("Warning: Calculating MACD using 'ta'.")
-                macd = ta.trend.MACD(close)
-                data['MACD'] = macd.macd()
-                data['MACD_signal'] = macd.macd_signal()
-                data['MACD_hist'] = macd.macd_diff()
-
             # 將 MACD 畫在新的 panel 上
             add_plots.append(mpf.make_addplot(data['MACD'], panel=current_panel, ylabel='MACD', color='blue', label='MACD'))
             add_plots.append(mpf.make_addplot(data['MACD_signal'], panel=current_panel, color='red', linestyle='--', label='Signal'))
@@ -156,18 +174,12 @@ def plot_ohlc(data, ticker=None, xaxis_freq='auto', save_suffix='_ohlc',
             current_panel += 1
             
         elif ind == 'KD':
-            if '%K' not in data.columns or '%D' not in data.columns:
-                print("Warning: Calculating KD using 'ta'.")
-                stoch = ta.momentum.StochasticOscillator(high=high, low=low, close=close, window=14, smooth_window=3)
-                data['%K'] = stoch.stoch()
-                data['%D'] = stoch.stoch_signal()
-                
             # 將 KD 畫在新的 panel 上
             add_plots.append(mpf.make_addplot(data['%K'], panel=current_panel, ylabel='KD', color='blue', label='%K'))
             add_plots.append(mpf.make_addplot(data['%D'], panel=current_panel, color='orange', label='%D'))
             # 加上 80 / 20 水平線
-            add_plots.append(mpf.make_addplot(pd.Series(80, index=data.index), panel=current_panel, color='red', linestyle='--', alpha=0.7))
-            add_plots.append(mpf.make_addplot(pd.Series(20, index=data.index), panel=current_panel, color='green', linestyle='--', alpha=0.7))
+            hlines.append((current_panel, 80, 'red'))
+            hlines.append((current_panel, 20, 'green'))
             
             panel_ratios.append(1) # KD 佔 1 份高度
             current_panel += 1
@@ -180,22 +192,36 @@ def plot_ohlc(data, ticker=None, xaxis_freq='auto', save_suffix='_ohlc',
     elif xaxis_freq == 'day': dt_format = '%Y-%m-%d'
     else: dt_format = None 
 
-    mpf.plot(
-        data,
-        type='candle',
-        style='charles',
-        title=f'{ticker} Chart ({save_suffix.strip("_")})',
-        ylabel='Price',
-        volume=True,  # 啟用 Volume, 它會自動佔用 panel 1
-        addplot=add_plots,
-        figsize=(14, 4 + 2 * len(strategy_indicators)), # 動態調整高度
-        tight_layout=True,
-        warn_too_much_data=10000,
-        show_nontrading=False,
-        datetime_format=dt_format,
-        xrotation=15,
-        savefig=save_path,
-        panel_ratios=tuple(panel_ratios) # *** 修改 2: 傳入 panel 比例 ***
-    )
-
-    print(f"Saved OHLC chart with indicators to {save_path}")
\ No newline at end of file
+    # 'auto' 時交給 mplfinance 自行決定日期格式 (不能傳入 None)
+    format_kwargs = {'datetime_format': dt_format} if dt_format is not None else {}
+
+    with profiling.stage('render'):
+        fig, axlist = mpf.plot(
+            data,
+            type='candle',
+            style='charles',
+            title=f'{ticker} Chart ({save_suffix.strip("_")})',
+            ylabel='Price',
+            volume=True,  # 啟用 Volume, 它會自動佔用 panel 1
+            addplot=add_plots,
+            figsize=(14, 4 + 2 * len(strategy_indicators)), # 動態調整高度
+            tight_layout=True,
+            warn_too_much_data=10000,
+            show_nontrading=False,
+            xrotation=15,
+            panel_ratios=tuple(panel_ratios), # *** 修改 2: 傳入 panel 比例 ***
+            returnfig=True,
+            **format_kwargs
+        )
+
+    # 每個 panel 在 axlist 中有 (主軸, 副軸) 兩個 axes
+    for panel, y, color in hlines:
+        axlist[2 * panel].axhline(y, color=color, linestyle='--', alpha=0.7)
+
+    # 存檔後立即關閉 figure, 批次繪圖時記憶體才不會持續累積
+    with profiling.stage('save'):
+        fig.savefig(save_path, bbox_inches='tight')
+        plt.close(fig)
+
+    print(f"Saved OHLC chart with indicators to {save_path}")
+    return save_path
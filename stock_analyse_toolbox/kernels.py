@@ -0,0 +1,616 @@
+"""
+以 NumPy 陣列直接計算的技術指標核心 (不經過 pandas / ta 的中間 Series)。
+
+- 參數可以是單一整數 (回傳 1-D) 或整數列表 (回傳 shape (bars, len(periods)) 的矩陣，一次算完多個週期)
+- 單一週期的 EMA / RSI / 滾動標準差交給 pandas 的 Cython 迴圈 (比 NumPy 的區塊化計算快);
+  區塊化的 EWM 只用在一次算多個週期與分段計算 (ChunkedRSI)
+- dtype=np.float32 可輸出 float32 (內部仍以 float64 計算)
+- 滾動最大 / 最小值與加總 / 標準差使用 van Herk / Gil-Werman 的區塊分解，與視窗長度無關的線性時間
+- 數值與 indicators (pandas / ta 版) 在浮點誤差範圍內相同
+"""
+import numpy as np
+import pandas as pd
+
+# EWM 分段計算時 r^-k 的上限 (避免溢位), 以及每段的最大長度
+_MAX_LOG_SCALE = 500.0
+_MAX_BLOCK = 2048
+# 一次算完整段時, 每次餵入 ChunkedRSI 的 K 棒數 (約值), 限制 delta / gain / loss 等暫存陣列的大小
+_SEGMENT_BARS = 1 << 16
+# EWM 中權重低於此值的舊資料視為已完全衰減 (遠高於 float64 的下溢範圍)
+_NEGLIGIBLE_WEIGHT = 1e-150
+
+
+def _as_periods(periods):
+    """回傳 (periods 陣列, 是否為單一數值)"""
+    scalar = np.ndim(periods) == 0
+    return np.atleast_1d(np.asarray(periods, dtype=int)), scalar
+
+
+def _finish(out, scalar, dtype):
+    out = out[:, 0] if scalar else out
+    return out.astype(dtype, copy=False)
+
+
+def _to_array(series, dtype):
+    # pandas (copy-on-write) 的 to_numpy 回傳唯讀的 view, 複製一份讓呼叫端可以修改
+    return series.to_numpy(dtype=dtype, copy=True)
+
+
+def _pandas_ewm(x, alpha, adjust, min_periods):
+    """單一 alpha 的 ewm_mean, 以 pandas 計算 (NaN 的處理相同)"""
+    return pd.Series(x, copy=False).ewm(alpha=alpha, adjust=adjust, min_periods=int(min_periods)).mean()
+
+
+def ewm_block_size(decay):
+    """
+    EWM 分段計算的區段長度 (只取決於最小的衰減率 r = 1 - alpha)。
+    分段處理大量資料時, 以它的整數倍切塊可得到與一次算完完全相同的結果。
+    """
+    decay = np.min(decay)
+    if decay <= 0:
+        return 1
+    return int(max(1, min(_MAX_BLOCK, _MAX_LOG_SCALE // -np.log(decay))))
+
+
+def _recurrence_blocks(x, decay, coef=1.0, state=None, offset=0):
+    """
+    逐區塊產生 s_t = r * s_{t-1} + coef * x_t 的結果 (lo, hi, s[lo:hi])。
+
+    每個區塊長度為 ewm_block_size(r)，區塊內以 r^-k 縮放後 cumsum 一次算完，
+    因此只需 bars / 區塊長度 次的陣列運算，不需逐根 Python 迴圈。
+    區塊邊界對齊絕對位置 (offset + lo) 的區塊長度倍數，分段餵入時結果與一次算完相同。
+    state 會就地更新為目前最後一列 (s_{hi-1})。
+    """
+    n = x.shape[0]
+    block = ewm_block_size(decay)
+    state = np.zeros(decay.shape) if state is None else state
+
+    k = np.arange(block)[:, None]
+    pow_k = decay ** k
+    with np.errstate(divide='ignore', over='ignore'):
+        scaled_coef = coef * np.where(pow_k > 0, 1 / pow_k, 0)
+
+    lo = 0
+    while lo < n:
+        hi = min(lo + block - (offset + lo) % block, n)
+        size = hi - lo
+        s = np.cumsum(x[lo:hi, None] * scaled_coef[:size], axis=0)
+        s += decay * state
+        s *= pow_k[:size]
+        state[...] = s[-1]
+        yield lo, hi, s
+        lo = hi
+
+
+def linear_recurrence(x, decay, coef=1.0, state=None):
+    """
+    計算 s_t = r * s_{t-1} + coef * x_t (沿 axis 0)，一次處理多個衰減率 r。
+
+    Args:
+        x (np.ndarray): shape (bars,)，所有 r 共用同一條序列.
+        decay (np.ndarray): 衰減率 r, shape (N,).
+        coef (float | np.ndarray, optional): x 的係數, 純量或 shape (N,).
+        state (np.ndarray, optional): s_{-1}, 預設為 0 (分段處理時傳入上一段的最後一列).
+
+    Returns:
+        np.ndarray: shape (bars, N) 的 s.
+    """
+    x = np.asarray(x, dtype=float)
+    decay = np.atleast_1d(np.asarray(decay, dtype=float))
+    state = np.zeros(decay.shape) if state is None else np.array(state, dtype=float)
+    out = np.empty((x.shape[0],) + decay.shape)
+    for lo, hi, s in _recurrence_blocks(x, decay, coef, state):
+        out[lo:hi] = s
+    return out
+
+
+class _EWMState:
+    """EWM 分段計算的狀態 (分段餵入時依序傳入同一個物件即可接續)"""
+
+    def __init__(self, n):
+        self.s = np.zeros(n)  # 遞迴式的 s_t (adjust=False 時即為平均值)
+        self.den = None  # adjust=True: 出現缺值後改以遞迴式追蹤的分母 (None 表示使用封閉解)
+        self.mean = np.full(n, np.nan)  # 最後一列的平均值
+        self.gap = 0  # adjust=False: 目前連續缺值的筆數
+        self.positions = 0  # 第一個有效值 (含) 之後的筆數
+        self.nobs = 0  # 有效值的筆數 (min_periods 以此判斷, 與 pandas 相同)
+
+
+def _ewm_blocks(body, alphas, adjust, state, offset=0):
+    """
+    逐區塊產生 body 的 EWM 平均 (lo, hi, mean, nobs)，尚未套用 min_periods；nobs 為每列累計的有效值筆數。
+
+    body[0] 須為有效值 (開頭的 NaN 由呼叫端略過)，中間的 NaN 與 pandas 的 ignore_na=False 相同:
+    缺值不計入平均，但權重照常衰減，缺值那一列輸出前一個平均值。
+    state 為 _EWMState (就地更新)，offset 為 body[0] 的絕對位置。
+    """
+    decay = 1 - alphas
+    missing = np.isnan(body)
+    has_missing = bool(missing.any())
+
+    if not adjust:
+        if has_missing or state.gap:
+            yield _ewm_fixed_with_gaps(body, missing, alphas, state, offset)
+            return
+        # 第一個值直接當作起始值: s_{-1} = x_0 使得 s_0 = r * x_0 + alpha * x_0 = x_0
+        if state.positions == 0:
+            state.s[...] = body[0]
+        for lo, hi, mean in _recurrence_blocks(body, decay, alphas, state.s, offset):
+            yield lo, hi, mean, _advance(state, hi - lo)
+        return
+
+    # adjust=True 的分母 sum(r^j, j < positions) = (1 - r^positions) / alpha 有封閉解;
+    # r^positions < e^-40 之後 1 - r^positions 在 float64 中恆為 1, 只需計算前面幾列
+    with np.errstate(divide='ignore'):
+        needed = np.where(decay > 0, np.ceil(40 / -np.log(np.where(decay > 0, decay, 0.5))), 1)
+    norm_rows = int(needed.max())
+
+    x = np.where(missing, 0.0, body) if has_missing else body
+    for lo, hi, num in _recurrence_blocks(x, decay, 1.0, state.s, offset):
+        positions = state.positions
+        # 以區塊判斷 (區塊對齊絕對位置), 分段餵入時切換的位置與一次算完相同
+        if has_missing and state.den is None and missing[lo:hi].any():
+            state.den = (1 - decay ** positions) / alphas
+        if state.den is not None:
+            # 有缺值時分母 sum(r^(t-j), j 為有效值) 也以遞迴式計算, 與分子一起衰減 (長時間缺值也不會相減失去精度)
+            observed = (~missing[lo:hi]).astype(float)
+            _, _, den = next(_recurrence_blocks(observed, decay, 1.0, state.den, offset + lo))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = num / den
+            # 缺值太久, 舊資料的權重小到可忽略 (接近下溢、失去精度) 時沿用前一個平均值,
+            # 並把狀態歸零: 下一個有效值的平均即為該值本身 (與 pandas 在浮點精度內相同)
+            weighted = den > _NEGLIGIBLE_WEIGHT
+            if not weighted.all():
+                rows = np.arange(hi - lo)[:, None]
+                last = np.maximum.accumulate(np.where(weighted, rows, -1), axis=0)
+                mean = np.where(last >= 0, np.take_along_axis(mean, np.maximum(last, 0), axis=0), state.mean)
+                faded = state.den <= _NEGLIGIBLE_WEIGHT
+                state.s[faded] = 0
+                state.den[faded] = 0
+            # 分母回到 1 / alpha 之後改回封閉解
+            if positions + hi - lo >= norm_rows and np.all(np.abs(state.den * alphas - 1) < 1e-15):
+                state.den = None
+        else:
+            mean = num
+            mean *= alphas
+            if positions < norm_rows:
+                counts = np.arange(positions + 1, min(positions + hi - lo, norm_rows) + 1)
+                mean[:len(counts)] /= 1 - decay ** counts[:, None]
+        state.mean = mean[-1].copy()
+        yield lo, hi, mean, _advance(state, hi - lo, missing[lo:hi] if has_missing else None)
+
+
+def _advance(state, size, missing=None):
+    """更新 positions / nobs, 回傳這 size 列各自的累計有效值筆數"""
+    if missing is None:
+        nobs = np.arange(state.nobs + 1, state.nobs + size + 1)
+    else:
+        nobs = state.nobs + np.cumsum(~missing)
+    state.positions += size
+    if size:
+        state.nobs = int(nobs[-1])
+    return nobs
+
+
+def _ewm_fixed_with_gaps(body, missing, alphas, state, offset):
+    """
+    adjust=False 且有缺值時: 缺值後的第一個有效值以 r^(gap+1) 衰減後的舊權重與新值 (權重 alpha) 加權平均
+    (pandas 的 old_wt 在每筆觀測後重設為 1)，其餘部分仍以區塊遞迴式計算。
+    """
+    decay = 1 - alphas
+    n = len(body)
+    out = np.empty((n, len(alphas)))
+    valid = ~missing
+    # 每段連續有效值的 [起點, 終點)
+    edges = np.flatnonzero(np.diff(np.concatenate([[False], valid, [False]]).astype(np.int8)))
+    runs = edges.reshape(-1, 2)
+
+    pos = 0
+    for lo, hi in runs:
+        if lo > pos:  # 缺值: 輸出前一個平均值
+            out[pos:lo] = state.s
+            state.gap += lo - pos
+        if state.positions + lo == 0:
+            state.s[...] = body[0]
+        elif state.gap:
+            old = decay ** (state.gap + 1)
+            state.s[...] = (old * state.s + alphas * body[lo]) / (old + alphas)
+        else:
+            state.s[...] = decay * state.s + alphas * body[lo]
+        out[lo] = state.s
+        state.gap = 0
+        for sub_lo, sub_hi, mean in _recurrence_blocks(body[lo + 1:hi], decay, alphas, state.s, offset + lo + 1):
+            out[lo + 1 + sub_lo:lo + 1 + sub_hi] = mean
+        pos = hi
+    if pos < n:
+        out[pos:] = state.s
+        state.gap += n - pos
+    return 0, n, out, _advance(state, n, missing)
+
+
+def ewm_mean(x, alpha, adjust=True, min_periods=0, dtype=np.float64):
+    """
+    與 pandas Series.ewm(alpha=..., adjust=..., min_periods=...).mean() 相同。
+    alpha 可為列表，一次算出同一條序列在多個平滑係數下的結果 (shape (bars, N))。
+    開頭的 NaN 會被略過；序列中間的 NaN 與 pandas (ignore_na=False) 相同處理。
+    """
+    alphas, scalar = np.atleast_1d(np.asarray(alpha, dtype=float)), np.ndim(alpha) == 0
+    x = np.asarray(x, dtype=float)
+    out = np.empty((x.shape[0], len(alphas)), dtype=dtype)
+    min_periods = np.broadcast_to(np.asarray(min_periods), alphas.shape)
+
+    valid = ~np.isnan(x)
+    first = int(np.argmax(valid)) if valid.any() else x.shape[0]
+    out[:first] = np.nan
+    if first < x.shape[0]:
+        state = _EWMState(len(alphas))
+        for lo, hi, mean, nobs in _ewm_blocks(x[first:], alphas, adjust, state, offset=first):
+            rows = out[first + lo:first + hi]
+            rows[...] = mean
+            # nobs 遞增, 未達 min_periods 的只有每欄開頭的幾列
+            for j, cut in enumerate(np.searchsorted(nobs, min_periods)):
+                rows[:cut, j] = np.nan
+    return out[:, 0] if scalar else out
+
+
+def _rolling_extreme(x, window, ufunc, fill):
+    """
+    van Herk / Gil-Werman: 將序列切成長度 window 的區塊，
+    每個視窗的極值 = 起點所在區塊的後綴極值 與 終點所在區塊的前綴極值 取較大 (小) 者，O(n)。
+    視窗內有 NaN 時結果為 NaN。
+    """
+    x = np.asarray(x, dtype=float)
+    n = x.shape[0]
+    out = np.full(x.shape, np.nan)
+    if window > n:
+        return out
+    n_blocks = -(-n // window)
+    padded = np.full((n_blocks * window,) + x.shape[1:], fill)
+    padded[:n] = x
+    blocks = padded.reshape((n_blocks, window) + x.shape[1:])
+
+    prefix = ufunc.accumulate(blocks, axis=1).reshape(padded.shape)
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+    out[window - 1:] = ufunc(suffix[:n - window + 1], prefix[window - 1:n])
+    return out
+
+
+def rolling_max(x, window):
+    """滑動視窗最大值 (前 window-1 根為 NaN)，線性時間"""
+    return _rolling_extreme(x, window, np.maximum, -np.inf)
+
+
+def rolling_min(x, window):
+    """滑動視窗最小值 (前 window-1 根為 NaN)，線性時間"""
+    return _rolling_extreme(x, window, np.minimum, np.inf)
+
+
+def _aligned_blocks(x, window, origin):
+    """
+    x 前後補 NaN 後切成長度 window 的區塊, 區塊邊界對齊絕對位置 (x[0] 的位置為 origin),
+    分段計算時每段的區塊切法與一次算完相同。回傳 (blocks, 前面補的長度)。
+    """
+    lead = origin % window
+    n_blocks = -(-(lead + x.shape[0]) // window)
+    padded = np.full((n_blocks * window,) + x.shape[1:], np.nan)
+    padded[lead:lead + x.shape[0]] = x
+    return padded.reshape((n_blocks, window) + x.shape[1:]), lead
+
+
+def _block_sums(blocks):
+    """
+    區塊內的後綴和與前綴和 (與 blocks 相同形狀)。
+    區塊最後一個位置的前綴和設為 0: 起點剛好在區塊開頭的視窗整段都在後綴和中。
+    """
+    suffix = np.empty_like(blocks)
+    np.cumsum(blocks[:, ::-1], axis=1, out=suffix[:, ::-1])
+    prefix = np.cumsum(blocks, axis=1)
+    prefix[:, -1] = 0
+    return suffix, prefix
+
+
+def rolling_sum(x, window, origin=0):
+    """
+    滑動視窗加總 (前 window-1 根為 NaN)，與 rolling_max 相同的區塊分解, 線性時間。
+    每個視窗 = 起點所在區塊的後綴和 + 終點所在區塊的前綴和, 只有加法
+    (不是累積和相減, 不會累積誤差; 視窗內有 NaN 時結果為 NaN)。
+
+    Args:
+        origin (int): x[0] 的絕對位置; 分段計算時傳入各段的起點, 結果與一次算完完全相同.
+    """
+    x = np.asarray(x, dtype=float)
+    n = x.shape[0]
+    out = np.full(x.shape, np.nan)
+    if window > n:
+        return out
+    blocks, lead = _aligned_blocks(x, window, origin)
+    suffix, prefix = (part.reshape((-1,) + x.shape[1:]) for part in _block_sums(blocks))
+    np.add(suffix[lead:lead + n - window + 1], prefix[lead + window - 1:lead + n], out=out[window - 1:])
+    return out
+
+
+def rolling_mean(x, window, origin=0):
+    return rolling_sum(x, window, origin) / window
+
+
+def rolling_std(x, window, ddof=0, origin=0):
+    """
+    滑動視窗標準差, 線性時間。
+    與 rolling_sum 相同的區塊分解; 每個區塊先減去區塊平均再累加一次方與平方和,
+    終點區塊的前綴再平移到起點區塊的中心, 避免大數值相減的精度損失。
+    """
+    x = np.asarray(x, dtype=float)
+    n = x.shape[0]
+    out = np.full(x.shape, np.nan)
+    if window > n:
+        return out
+    blocks, lead = _aligned_blocks(x, window, origin)
+    finite = np.isfinite(blocks)
+    center = (np.where(finite, blocks, 0).sum(axis=1, keepdims=True)
+              / np.maximum(finite.sum(axis=1, keepdims=True), 1))
+    dev = blocks - center
+    suffix1, prefix1 = _block_sums(dev)
+    np.square(dev, out=dev)
+    suffix2, prefix2 = _block_sums(dev)
+
+    # 前綴 (終點區塊) 以 c 為中心 -> 以前一區塊的中心 c' 為中心: 差 step = c - c', 前綴個數 count
+    step = np.zeros_like(center)
+    step[1:] = center[1:] - center[:-1]
+    count = np.arange(1, window + 1, dtype=float).reshape((1, window) + (1,) * (x.ndim - 1))
+    count[0, -1] = 0
+    shifted = count * step
+    prefix2 += (2 * prefix1 + shifted) * step
+    prefix1 += shifted
+
+    shape = (-1,) + x.shape[1:]
+    starts = slice(lead, lead + n - window + 1)
+    ends = slice(lead + window - 1, lead + n)
+    total = suffix1.reshape(shape)[starts] + prefix1.reshape(shape)[ends]
+    squares = suffix2.reshape(shape)[starts]
+    squares += prefix2.reshape(shape)[ends]
+    total *= total
+    total /= window
+    squares -= total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        squares /= window - ddof
+    np.sqrt(np.maximum(squares, 0, out=squares), out=out[window - 1:])
+    return out
+
+
+# --- 技術指標 ---
+
+def _wilder_rsi(avg_gain, avg_loss, count, periods):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+    # 資料不足 (min_periods)、avg_loss 為 0 (inf / NaN) 時 rs 視為 100
+    rs[(count < periods) | ~np.isfinite(rs)] = 100
+    rs += 1
+    np.divide(100, rs, out=rs)
+    np.subtract(100, rs, out=rs)
+    return rs
+
+
+def _ta_rsi(avg_gain, avg_loss, count, periods):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = np.where(avg_loss == 0, 100, 100 - (100 / (1 + avg_gain / avg_loss)))
+    out[np.broadcast_to(count < periods, out.shape)] = np.nan
+    return out
+
+
+class ChunkedRSI:
+    """
+    可分段計算的 RSI: 依序以 update() 餵入收盤價區段，串接後的輸出與一次算完 (rsi / rsi_ta) 完全相同。
+
+    gain / loss 的 EWM 逐區塊計算，並立即換算成 RSI 寫入輸出，
+    只配置輸出矩陣，不保留 bars × periods 的中間結果。
+    為了得到完全相同的結果，除了最後一段之外，每段的結束位置須為 block_size 的整數倍。
+    """
+
+    def __init__(self, period=14, dtype=np.float64, variant='wilder'):
+        """
+        Args:
+            period (int | list[int]): 週期; 傳入列表時輸出每個週期一欄的矩陣.
+            dtype: 輸出型別, 例如 np.float32.
+            variant (str): 'wilder' (與 indicators.rsi 相同) 或 'ta' (與 ta 的 RSIIndicator 相同).
+        """
+        if variant not in ('wilder', 'ta'):
+            raise ValueError(f"variant must be 'wilder' or 'ta', got {variant!r}")
+        self.periods, self._scalar = _as_periods(period)
+        self.dtype = dtype
+        self.variant = variant
+        self._alphas = 1 / self.periods
+        self.block_size = ewm_block_size(1 - self._alphas)
+
+        self.position = 0  # 已處理的 K 棒數
+        self._prev_close = np.nan
+        self._gain_state = _EWMState(len(self.periods))
+        self._loss_state = _EWMState(len(self.periods))
+
+    def update(self, close):
+        close = np.asarray(close, dtype=float)
+        delta = np.diff(close, prepend=self._prev_close)
+        if len(close):
+            self._prev_close = close[-1]
+
+        if self.variant == 'wilder':
+            gain = np.clip(delta, 0, None)
+            loss = -np.clip(delta, None, 0)
+            adjust, combine = True, _wilder_rsi
+        else:
+            gain = np.where(delta > 0, delta, 0.0)
+            loss = np.where(delta < 0, -delta, 0.0)
+            adjust, combine = False, _ta_rsi
+
+        n = len(close)
+        out = np.empty((n, len(self.periods)), dtype=self.dtype)
+        first = 0
+        if self._gain_state.positions == 0:
+            valid = ~(np.isnan(gain) | np.isnan(loss))
+            first = int(np.argmax(valid)) if valid.any() else n
+            if first > 0:
+                empty = np.full((first, len(self.periods)), np.nan)
+                out[:first] = combine(empty, empty, np.zeros((first, 1)), self.periods)
+
+        if first < n:
+            offset = self.position + first
+            blocks = zip(
+                _ewm_blocks(gain[first:], self._alphas, adjust, self._gain_state, offset),
+                _ewm_blocks(loss[first:], self._alphas, adjust, self._loss_state, offset),
+            )
+            # gain / loss 的缺值位置相同 (都來自 delta), nobs 共用
+            for (lo, hi, avg_gain, nobs), (_, _, avg_loss, _) in blocks:
+                out[first + lo:first + hi] = combine(avg_gain, avg_loss, nobs[:, None], self.periods)
+
+        self.position += n
+        return out[:, 0] if self._scalar else out
+
+
+def _single_rsi(close, period, dtype, variant):
+    """單一週期的 RSI: gain / loss 的 EWM 交給 pandas, 結果與 ChunkedRSI 相同"""
+    close = np.asarray(close, dtype=float)
+    delta = np.diff(close, prepend=np.nan)
+    if variant == 'wilder':
+        gain = np.clip(delta, 0, None)
+        loss = -np.clip(delta, None, 0)
+        adjust, combine = True, _wilder_rsi
+    else:
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+        adjust, combine = False, _ta_rsi
+    # 未達 min_periods 的位置為 NaN, combine 再換成各自的預設值 (wilder: 100, ta: NaN)
+    avg_gain = _pandas_ewm(gain, 1 / period, adjust, period).to_numpy()
+    avg_loss = _pandas_ewm(loss, 1 / period, adjust, period).to_numpy()
+    out = combine(avg_gain, avg_loss, period, period)
+    return out.astype(dtype, copy=False)
+
+
+def rsi(close, period=14, dtype=np.float64):
+    """
+    Wilder's RSI (與 indicators.rsi / rsi_strategy 相同的定義)。
+
+    Args:
+        close (array-like): 收盤價.
+        period (int | list[int]): 週期; 傳入列表時回傳每個週期一欄的矩陣.
+        dtype: 輸出型別, 例如 np.float32.
+    """
+    if np.ndim(period) == 0:
+        return _single_rsi(close, int(period), dtype, 'wilder')
+    return _update_in_segments(ChunkedRSI(period, dtype), close)
+
+
+def rsi_ta(close, period=14, dtype=np.float64):
+    """與 ta.momentum.RSIIndicator 相同的 RSI (adjust=False 的 Wilder 平滑)"""
+    if np.ndim(period) == 0:
+        return _single_rsi(close, int(period), dtype, 'ta')
+    return _update_in_segments(ChunkedRSI(period, dtype, variant='ta'), close)
+
+
+def _update_in_segments(model, close):
+    """
+    以 block_size 整數倍的區段依序餵入 model, 結果與一次 update(close) 完全相同，
+    但暫存陣列只有一個區段的大小 (記憶體峰值約等於輸出本身)。
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    step = model.block_size * max(_SEGMENT_BARS // model.block_size, 1)
+    if n <= step:
+        return model.update(close)
+    out = None
+    for lo in range(0, n, step):
+        part = model.update(close[lo:lo + step])
+        if out is None:
+            out = np.empty((n,) + part.shape[1:], dtype=part.dtype)
+        out[lo:lo + len(part)] = part
+    return out
+
+
+class ChunkedStochastic:
+    """
+    可分段計算的隨機指標: 依序以 update() 餵入 high / low / close 區段，
+    串接後的 (%K, %D) 與 stochastic() 一次算完完全相同 (區段長度不限)。
+    只保留滾動視窗所需的最後幾根資料作為暖機狀態。
+    """
+
+    def __init__(self, period=14, smooth_window=3, dtype=np.float64):
+        self.periods, self._scalar = _as_periods(period)
+        self.smooth_window = smooth_window
+        self.dtype = dtype
+        self._high = np.empty(0)
+        self._low = np.empty(0)
+        self._k = np.empty((0, len(self.periods)))
+        self._bars = 0
+
+    def update(self, high, low, close):
+        # 接上前一段的尾巴後計算, 再去掉尾巴部分的輸出
+        high = np.concatenate([self._high, np.asarray(high, dtype=float)])
+        low = np.concatenate([self._low, np.asarray(low, dtype=float)])
+        close = np.asarray(close, dtype=float)
+        tail = len(high) - len(close)
+
+        k = np.empty((len(close), len(self.periods)))
+        for i, p in enumerate(self.periods):
+            highest = rolling_max(high, p)[tail:]
+            lowest = rolling_min(low, p)[tail:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                k[:, i] = 100 * (close - lowest) / (highest - lowest)
+        k_all = np.concatenate([self._k, k])
+        d = rolling_mean(k_all, self.smooth_window, origin=self._bars - len(self._k))[len(self._k):]
+        self._bars += len(close)
+
+        keep_from = max(len(high) - int(self.periods.max()) + 1, 0)
+        self._high = high[keep_from:]
+        self._low = low[keep_from:]
+        self._k = k_all[max(len(k_all) - self.smooth_window + 1, 0):]
+        return _finish(k, self._scalar, self.dtype), _finish(d, self._scalar, self.dtype)
+
+
+def stochastic(high, low, close, period=14, smooth_window=3, dtype=np.float64):
+    """
+    隨機指標 (與 ta.momentum.StochasticOscillator 相同)，回傳 (%K, %D)。
+    period 可為列表, 一次計算多個週期。
+    """
+    return ChunkedStochastic(period, smooth_window, dtype).update(high, low, close)
+
+
+def sma(x, window=20, dtype=np.float64):
+    windows, scalar = _as_periods(window)
+    x = np.asarray(x, dtype=float)
+    out = np.column_stack([rolling_mean(x, w) for w in windows])
+    return _finish(out, scalar, dtype)
+
+
+def ema(x, window=50, dtype=np.float64):
+    """與 ta 的 EMAIndicator 相同 (span=window, adjust=False, min_periods=window)"""
+    windows, scalar = _as_periods(window)
+    x = np.asarray(x, dtype=float)
+    if scalar:
+        return _to_array(_pandas_ewm(x, 2 / (window + 1), False, window), dtype)
+    out = ewm_mean(x, 2 / (windows + 1), adjust=False, min_periods=windows)
+    return _finish(out, scalar, dtype)
+
+
+def macd(close, window_fast=12, window_slow=26, window_sign=9, dtype=np.float64):
+    """與 ta.trend.MACD 相同，回傳 (MACD, Signal, Histogram)"""
+    close = np.asarray(close, dtype=float)
+    line = ema(close, window_fast) - ema(close, window_slow)
+    signal = ema(line, window_sign)
+    return line.astype(dtype), signal.astype(dtype), (line - signal).astype(dtype)
+
+
+def bollinger(close, window=20, window_dev=2, dtype=np.float64):
+    """與 ta.volatility.BollingerBands 相同 (母體標準差)，回傳 (上軌, 中線, 下軌)"""
+    close = np.asarray(close, dtype=float)
+    mavg = rolling_mean(close, window)
+    # 單一視窗的標準差以 pandas 的線上演算法較快 (rolling_std 適合一次算多欄)
+    mstd = pd.Series(close, copy=False).rolling(window, min_periods=window).std(ddof=0).to_numpy()
+    return ((mavg + window_dev * mstd).astype(dtype), mavg.astype(dtype),
+            (mavg - window_dev * mstd).astype(dtype))
+
+
+def obv(close, volume, dtype=np.float64):
+    """與 ta.volume.OnBalanceVolumeIndicator 相同"""
+    close = np.asarray(close, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    down = np.zeros(len(close), dtype=bool)
+    down[1:] = close[1:] < close[:-1]
+    return np.cumsum(np.where(down, -volume, volume)).astype(dtype)
@@ -0,0 +1,167 @@
+"""
+由投資組合淨值序列計算的績效指標 (回撤、Sharpe、Sortino、CAGR、曝險比例、週轉率)。
+
+所有計算都沿 axis 0 向量化，淨值可以是 (bars,) 或一次多組參數的 (bars, N)；
+ReturnStats 可分段餵入 (ChunkedBacktester)，結果與一次傳入整段相同。
+"""
+import numpy as np
+import pandas as pd
+
+# 無法由 index 推算時, 每年的 K 棒數 (交易日)
+DEFAULT_PERIODS_PER_YEAR = 252
+
+METRIC_KEYS = (
+    "Max Drawdown", "Max Drawdown Duration", "Sharpe Ratio", "Sortino Ratio",
+    "CAGR", "Exposure", "Turnover",
+)
+
+
+def periods_per_year(index, default=DEFAULT_PERIODS_PER_YEAR):
+    """
+    由 DatetimeIndex 的時間跨度推算每年的 K 棒數 (日線約 252, 分鐘線依實際資料密度)。
+    不是 DatetimeIndex 或長度不足時回傳 default。
+    """
+    if not isinstance(index, pd.DatetimeIndex) or len(index) < 2:
+        return default
+    return span_periods_per_year(index[0], index[-1], len(index), default)
+
+
+def span_periods_per_year(first, last, n_bars, default=DEFAULT_PERIODS_PER_YEAR):
+    """同 periods_per_year, 但只需要第一根 / 最後一根的時間與 K 棒數 (分段讀取時使用)"""
+    if not isinstance(first, pd.Timestamp) or n_bars < 2:
+        return default
+    years = (last - first).total_seconds() / (365.25 * 86400)
+    if years <= 0:
+        return default
+    return (n_bars - 1) / years
+
+
+def _scalar(value):
+    """0 維陣列轉回 numpy 純量 (單一淨值序列時回傳值與其他統計一樣是純量)"""
+    return value[()] if isinstance(value, np.ndarray) and value.ndim == 0 else value
+
+
+def _safe_divide(numerator, denominator):
+    denominator = np.asarray(denominator, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), 0.0)
+
+
+class ReturnStats:
+    """
+    逐段累積淨值序列的回撤與報酬率統計。每段只需 O(段長) 的暫存記憶體，
+    跨段保留前一根淨值、歷史高點與其位置, 以及報酬率的一次 / 二次和。
+    """
+
+    def __init__(self):
+        self.n_bars = 0
+        self.first_value = None
+        self.last_value = None
+        self.value_sum = 0.0
+        self._peak = None
+        self._peak_pos = None
+        self._max_drawdown = 0.0
+        self._max_duration = 0
+        self._sum_r = 0.0
+        self._sum_r2 = 0.0
+        self._sum_down2 = 0.0
+
+    def update(self, portfolio):
+        p = np.asarray(portfolio, dtype=float)
+        if len(p) == 0:
+            return self
+        shape = (len(p),) + (1,) * (p.ndim - 1)
+        positions = self.n_bars + np.arange(len(p)).reshape(shape)
+
+        # 報酬率 (第一段的第一根沒有報酬率)
+        if self.last_value is None:
+            r = p[1:] / p[:-1] - 1
+            self.first_value = p[0].copy()
+        else:
+            prev = np.concatenate([self.last_value[None], p[:-1]])
+            r = p / prev - 1
+        self._sum_r = self._sum_r + r.sum(axis=0)
+        self._sum_r2 = self._sum_r2 + (r * r).sum(axis=0)
+        down = np.minimum(r, 0)
+        self._sum_down2 = self._sum_down2 + (down * down).sum(axis=0)
+
+        # 回撤: 相對歷史高點的跌幅; 持續期間為距離上一次創新高的 K 棒數
+        peak = np.maximum.accumulate(p, axis=0)
+        if self._peak is not None:
+            peak = np.maximum(peak, self._peak)
+        self._max_drawdown = np.minimum(self._max_drawdown, (p / peak - 1).min(axis=0))
+
+        last_peak = np.where(p >= peak, positions, -1)
+        np.maximum.accumulate(last_peak, axis=0, out=last_peak)
+        if self._peak_pos is not None:
+            last_peak = np.maximum(last_peak, self._peak_pos)
+        self._max_duration = np.maximum(self._max_duration, (positions - last_peak).max(axis=0))
+
+        self._peak = peak[-1]
+        self._peak_pos = last_peak[-1]
+        self.last_value = p[-1].copy()
+        self.value_sum = self.value_sum + p.sum(axis=0)
+        self.n_bars += len(p)
+        return self
+
+    def result(self, periods_per_year=DEFAULT_PERIODS_PER_YEAR):
+        """
+        Returns:
+            dict: Max Drawdown (負值), Max Drawdown Duration (K 棒數), Sharpe Ratio, Sortino Ratio, CAGR.
+                  Sharpe / Sortino 以無風險利率 0 計算並年化.
+        """
+        n_returns = max(self.n_bars - 1, 0)
+        mean_r = self._sum_r / max(n_returns, 1)
+        variance = _safe_divide(self._sum_r2 - n_returns * mean_r * mean_r, n_returns - 1)
+        std = np.sqrt(np.maximum(variance, 0))
+        downside = np.sqrt(self._sum_down2 / max(n_returns, 1))
+        annualize = np.sqrt(periods_per_year)
+
+        years = n_returns / periods_per_year
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = self.last_value / self.first_value
+            cagr = np.where((growth > 0) & (years > 0), growth ** (1 / max(years, 1e-12)) - 1, 0.0)
+
+        return {
+            "Max Drawdown": _scalar(np.asarray(self._max_drawdown)),
+            "Max Drawdown Duration": _scalar(np.asarray(self._max_duration)),
+            "Sharpe Ratio": _scalar(_safe_divide(mean_r, std) * annualize),
+            "Sortino Ratio": _scalar(_safe_divide(mean_r, downside) * annualize),
+            "CAGR": _scalar(cagr),
+        }
+
+
+def activity_stats(held_intervals, traded_value, n_bars, mean_value, periods_per_year=DEFAULT_PERIODS_PER_YEAR):
+    """
+    曝險比例與週轉率。
+
+    Args:
+        held_intervals: 持倉經過的 K 棒間隔數 (每筆交易的 exit_idx - entry_idx 總和).
+        traded_value: 所有買入與賣出時的淨值總和 (全額進出, 即成交金額).
+        n_bars (int): K 棒數.
+        mean_value: 平均淨值.
+        periods_per_year (float, optional): 每年的 K 棒數.
+
+    Returns:
+        dict: Exposure (持倉時間比例), Turnover (每年平均的買賣來回次數, 以平均淨值計).
+    """
+    n_intervals = max(n_bars - 1, 0)
+    years = n_intervals / periods_per_year
+    return {
+        "Exposure": _scalar(_safe_divide(held_intervals, n_intervals)),
+        "Turnover": _scalar(_safe_divide(_safe_divide(np.asarray(traded_value) / 2, mean_value), years)),
+    }
+
+
+def performance_stats(portfolio, entry_idx, exit_idx, periods_per_year=DEFAULT_PERIODS_PER_YEAR):
+    """
+    單一淨值序列加上逐筆交易 (買入 / 賣出位置) 的所有延伸指標 (key 見 METRIC_KEYS)。
+    """
+    portfolio = np.asarray(portfolio, dtype=float)
+    returns = ReturnStats().update(portfolio)
+    stats = returns.result(periods_per_year)
+    traded_value = portfolio[entry_idx].sum() + portfolio[exit_idx].sum()
+    held_intervals = np.sum(np.asarray(exit_idx) - np.asarray(entry_idx))
+    stats.update(activity_stats(held_intervals, traded_value, len(portfolio),
+                                returns.value_sum / max(len(portfolio), 1), periods_per_year))
+    return stats
@@ -0,0 +1,227 @@
+import inspect
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from stock_analyse_toolbox import indicators, metrics, strategies
+from stock_analyse_toolbox.back_tester import batch_summary_stats
+
+
+# 策略接受但不影響訊號的參數: 展開網格時固定為預設值, 不會產生結果完全相同的重複組合
+_UNUSED_PARAMS = {
+    strategies.kd_strategy: ('oversold', 'overbought'),
+}
+
+
+def expand_grid(strategy_func, param_grid):
+    """
+    將參數網格展開成參數組合列表，未指定的參數使用策略函式的預設值。
+    重複的組合只保留第一次出現的 (候選值重複, 或只差在策略不使用的參數, 例如 kd_strategy 的
+    oversold / overbought, 這些參數一律為預設值)。
+
+    Args:
+        strategy_func (callable): 策略函式, 例如 strategies.rsi_strategy.
+        param_grid (dict): {參數名稱: 候選值列表}, 例如 {'period': [14, 21], 'oversold': [30, 40]}.
+
+    Returns:
+        list[dict]: 每一組完整的參數 (不重複).
+    """
+    defaults = {
+        name: param.default
+        for name, param in inspect.signature(strategy_func).parameters.items()
+        if param.default is not inspect.Parameter.empty
+    }
+    unused = _UNUSED_PARAMS.get(strategy_func, ())
+    names = [name for name in param_grid if name not in unused]
+    values = [list(np.atleast_1d(param_grid[name])) for name in names]
+    combos = {}
+    for combo in itertools.product(*values):
+        params = dict(defaults, **dict(zip(names, combo)))
+        combos.setdefault(tuple(sorted(params.items())), params)
+    return list(combos.values())
+
+
+def _group_by(combos, keys):
+    """依指定參數分組, 回傳 {參數值 tuple: [欄位索引]}"""
+    groups = {}
+    for i, params in enumerate(combos):
+        groups.setdefault(tuple(params[k] for k in keys), []).append(i)
+    return groups
+
+
+def _rsi_signal_matrix(data, combos):
+    close = data['Close']
+    signals = np.empty((len(data), len(combos)), dtype=np.int8)
+
+    # 每個 period 只算一次 RSI，所有門檻組合共用
+    for (period,), cols in _group_by(combos, ('period',)).items():
+        rsi = indicators.rsi(close, period).to_numpy()[:, None]
+        rsi_prev = np.vstack([np.full((1, 1), np.nan), rsi[:-1]])
+
+        oversold = np.array([combos[i]['oversold'] for i in cols], dtype=float)
+        overbought = np.array([combos[i]['overbought'] for i in cols], dtype=float)
+
+        buy_condition = (rsi_prev <= oversold) & (rsi > oversold)
+        sell_condition = (rsi_prev >= overbought) & (rsi < overbought)
+        signals[:, cols] = strategies.events_to_state(buy_condition, sell_condition)
+    return signals
+
+
+def _kd_signal_matrix(data, combos):
+    signals = np.empty((len(data), len(combos)), dtype=np.int8)
+
+    # KD 的訊號只取決於 (period, smooth_window)，oversold / overbought 目前未參與過濾
+    for (period, smooth_window), cols in _group_by(combos, ('period', 'smooth_window')).items():
+        k, d = indicators.stochastic(data['High'], data['Low'], data['Close'], period, smooth_window)
+        k, d = k.to_numpy(), d.to_numpy()
+        k_prev = np.r_[np.nan, k[:-1]]
+        d_prev = np.r_[np.nan, d[:-1]]
+
+        buy_condition = (k_prev <= d_prev) & (k > d)
+        sell_condition = (k_prev >= d_prev) & (k < d)
+        signals[:, cols] = strategies.events_to_state(buy_condition, sell_condition)[:, None]
+    return signals
+
+
+# 支援批次計算訊號矩陣的策略; 其他策略會逐組呼叫策略函式
+_SIGNAL_MATRIX_BUILDERS = {
+    strategies.rsi_strategy: _rsi_signal_matrix,
+    strategies.kd_strategy: _kd_signal_matrix,
+}
+
+
+def signal_matrix(data, strategy_func, combos):
+    """
+    產生訊號矩陣, shape (bars, len(combos))，第 i 欄等同 strategy_func(data, **combos[i])。
+
+    rsi_strategy / kd_strategy 的指標透過 indicators 的快取計算，相同 period 只算一次。
+    """
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy()
+        data.columns = [col[0] for col in data.columns]
+
+    builder = _SIGNAL_MATRIX_BUILDERS.get(strategy_func)
+    if builder is not None:
+        return builder(data, combos)
+
+    signals = np.empty((len(data), len(combos)), dtype=np.int8)
+    for i, params in enumerate(combos):
+        signals[:, i] = np.asarray(strategy_func(data.copy(), **params))
+    return signals
+
+
+def evaluate(data, strategy_func, combos, initial_cash=100000, transaction_fee=0.001425, batch_size=1024):
+    """
+    批次評估多組參數 (data 的欄位須已攤平)。
+
+    Args:
+        data (pd.DataFrame): OHLCV 資料.
+        strategy_func (callable): 策略函式.
+        combos (list[dict]): 完整的參數組合 (見 expand_grid).
+        initial_cash, transaction_fee: 同 Backtester.
+        batch_size (int, optional): 每批同時評估的參數組合數.
+
+    Returns:
+        dict: get_summary_stats 的 key, 每個 value 是長度 len(combos) 的 np.ndarray.
+    """
+    close = data['Close'].to_numpy(dtype=float)
+    periods_per_year = metrics.periods_per_year(data.index)
+
+    stats_batches = []
+    for start in range(0, len(combos), batch_size):
+        batch = combos[start:start + batch_size]
+        signals = signal_matrix(data, strategy_func, batch)
+        stats_batches.append(batch_summary_stats(close, signals, initial_cash, transaction_fee,
+                                                 periods_per_year))
+    return {key: np.concatenate([b[key] for b in stats_batches]) for key in stats_batches[0]}
+
+
+def optimize(data, strategy_func, param_grid, initial_cash=100000, transaction_fee=0.001425,
+             sort_by='Total Return', ascending=False, batch_size=1024):
+    """
+    參數網格最佳化: 一次評估所有參數組合，回傳依 sort_by 排序的結果表。
+
+    Args:
+        data (pd.DataFrame): OHLCV 資料.
+        strategy_func (callable): 策略函式 (rsi_strategy / kd_strategy 會批次計算).
+        param_grid (dict): {參數名稱: 候選值列表}.
+        initial_cash (float, optional): 初始資金.
+        transaction_fee (float, optional): 手續費率.
+        sort_by (str, optional): 排序依據的統計欄位 (get_summary_stats 的 key).
+        ascending (bool, optional): 是否遞增排序.
+        batch_size (int, optional): 每批同時評估的參數組合數, 用來限制記憶體用量.
+
+    Returns:
+        pd.DataFrame: 每列一組參數, 包含參數欄位與 get_summary_stats 的所有統計.
+    """
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy()
+        data.columns = [col[0] for col in data.columns]
+
+    combos = expand_grid(strategy_func, param_grid)
+    stats = evaluate(data, strategy_func, combos, initial_cash, transaction_fee, batch_size)
+    table = pd.concat([pd.DataFrame(combos), pd.DataFrame(stats)], axis=1)
+    return table.sort_values(sort_by, ascending=ascending, kind='stable').reset_index(drop=True)
+
+
+def walk_forward(data, strategy_func, param_grid, train_size, test_size, step=None,
+                 metric='Total Return', initial_cash=100000, transaction_fee=0.001425, batch_size=1024):
+    """
+    Walk-forward 分析: 在每個訓練視窗挑出 metric 最好的參數，再於緊接其後的測試視窗評估樣本外表現。
+
+    指標與所有參數組合的訊號只在完整歷史上計算一次，各視窗直接切片重用
+    (因此視窗開頭的持倉狀態沿用完整歷史的訊號，不會重新暖機)。
+
+    Args:
+        data (pd.DataFrame): OHLCV 資料.
+        strategy_func (callable): 策略函式.
+        param_grid (dict): {參數名稱: 候選值列表}.
+        train_size (int): 訓練視窗長度 (K 棒數).
+        test_size (int): 測試視窗長度 (K 棒數).
+        step (int, optional): 視窗每次前進的 K 棒數, 預設等於 test_size.
+        metric (str, optional): 挑選參數依據的統計欄位 (越大越好).
+        initial_cash, transaction_fee: 同 Backtester.
+        batch_size (int, optional): 訓練視窗每批評估的參數組合數.
+
+    Returns:
+        pd.DataFrame: 每列一個視窗, 包含訓練 / 測試區間、選出的參數、訓練期的 metric
+                      以及測試期的所有統計 (欄名前綴 'Test ')。
+                      串接後的樣本外報酬為 (1 + table['Test Total Return']).prod() - 1.
+    """
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy()
+        data.columns = [col[0] for col in data.columns]
+    step = step or test_size
+
+    combos = expand_grid(strategy_func, param_grid)
+    close = data['Close'].to_numpy(dtype=float)
+    signals = signal_matrix(data, strategy_func, combos)
+    periods_per_year = metrics.periods_per_year(data.index)
+
+    rows = []
+    for start in range(0, len(data) - train_size - test_size + 1, step):
+        train = slice(start, start + train_size)
+        test = slice(start + train_size, start + train_size + test_size)
+
+        train_scores = np.concatenate([
+            batch_summary_stats(close[train], signals[train, lo:lo + batch_size],
+                                initial_cash, transaction_fee, periods_per_year)[metric]
+            for lo in range(0, len(combos), batch_size)
+        ])
+        best = int(np.argmax(train_scores))
+        test_stats = batch_summary_stats(close[test], signals[test, best:best + 1],
+                                         initial_cash, transaction_fee, periods_per_year)
+
+        row = {
+            'Train Start': data.index[train.start],
+            'Train End': data.index[train.stop - 1],
+            'Test Start': data.index[test.start],
+            'Test End': data.index[test.stop - 1],
+        }
+        row.update(combos[best])
+        row[f'Train {metric}'] = train_scores[best]
+        row.update({f'Test {key}': value[0] for key, value in test_stats.items()})
+        rows.append(row)
+
+    return pd.DataFrame(rows)
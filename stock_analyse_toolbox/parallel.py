@@ -0,0 +1,172 @@
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from stock_analyse_toolbox.back_tester import Backtester
+
+
+def _attach(name):
+    """在 worker 端掛載既有的共享記憶體 (釋放由建立它的主程序負責)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 沒有 track 參數; worker 與主程序共用同一個 resource tracker,
+        # 重複註冊不影響主程序 unlink
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedOHLCV:
+    """
+    將多檔股票的 OHLCV 放進共享記憶體，worker 直接以 NumPy view 讀取，不需 pickle DataFrame。
+
+    每檔股票佔兩塊共享記憶體: 數值欄位 (bars × 欄位數, float64) 與日期 index (int64 ns)。
+    使用完畢請呼叫 close() (或用 with 區塊) 釋放。
+    """
+
+    def __init__(self, data_by_ticker):
+        self.specs = {}
+        self._blocks = []
+        try:
+            for ticker, data in data_by_ticker.items():
+                self.specs[ticker] = self._share(data)
+        except BaseException:
+            self.close()
+            raise
+
+    def _share(self, data):
+        if isinstance(data.columns, pd.MultiIndex):
+            data = data.copy()
+            data.columns = [col[0] for col in data.columns]
+        columns = list(data.columns)
+        values = data.to_numpy(dtype=float)
+        index = pd.DatetimeIndex(data.index).as_unit('ns')
+
+        value_block = self._create(values)
+        index_block = self._create(index.asi8)
+        return {
+            'values': (value_block, values.shape),
+            'index': (index_block, index.shape),
+            'columns': columns,
+            'index_name': index.name,
+            'tz': str(index.tz) if index.tz is not None else None,
+        }
+
+    def _create(self, array):
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks.append(shm)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        return shm.name
+
+    def close(self):
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 每個 worker process 已掛載的共享記憶體 (同一檔股票只掛載一次)
+_worker_blocks = {}
+
+
+def _view(name, shape, dtype):
+    if name not in _worker_blocks:
+        _worker_blocks[name] = _attach(name)
+    array = np.ndarray(shape, dtype=dtype, buffer=_worker_blocks[name].buf)
+    array.flags.writeable = False
+    return array
+
+
+def frame_from_spec(spec):
+    """由 SharedOHLCV 的 spec 重建 DataFrame (數值直接引用共享記憶體, 不複製)"""
+    values = _view(*spec['values'], dtype=np.float64)
+    index = pd.DatetimeIndex(_view(*spec['index'], dtype=np.int64).view('datetime64[ns]'), name=spec['index_name'])
+    if spec['tz'] is not None:
+        index = index.tz_localize('UTC').tz_convert(spec['tz'])
+    return pd.DataFrame(values, index=index, columns=spec['columns'], copy=False)
+
+
+def _job_result(job_id, ticker, strategy_func, params, stats=None, error=None):
+    return {
+        'job_id': job_id,
+        'ticker': ticker,
+        'strategy': getattr(strategy_func, '__name__', repr(strategy_func)),
+        'params': params,
+        'stats': stats,
+        'error': error,
+    }
+
+
+def _run_job(job_id, ticker, spec, strategy_func, params, backtester_kwargs):
+    result = _job_result(job_id, ticker, strategy_func, params)
+    try:
+        # 共享記憶體中的資料不需要複製; 只需要摘要, 以精簡模式回測
+        bt = Backtester(frame_from_spec(spec), copy=False, **backtester_kwargs)
+        result['stats'] = bt.run_stats(strategy_func, **params)
+    except Exception:
+        result['error'] = traceback.format_exc()
+    return result
+
+
+def iter_parallel(data_by_ticker, jobs, max_workers=None, **backtester_kwargs):
+    """
+    以 process pool 平行執行多組 (ticker, strategy, params) 回測，每完成一組就 yield 結果。
+
+    Args:
+        data_by_ticker (dict): {ticker: OHLCV DataFrame}.
+        jobs (list): [(ticker, strategy_func, params_dict), ...].
+                     strategy_func 必須是可 pickle 的模組層級函式 (例如 strategies.rsi_strategy).
+        max_workers (int, optional): worker 數量, 預設為 CPU 核心數.
+        **backtester_kwargs: 傳給 Backtester 的參數 (initial_cash, transaction_fee, engine).
+
+    Yields:
+        dict: job_id (jobs 中的索引), ticker, strategy, params,
+              stats (get_summary_stats 的結果), error (失敗時的 traceback, 否則為 None).
+              單一工作失敗 (包含 data_by_ticker 中沒有的 ticker) 不影響其他工作。
+    """
+    jobs = list(jobs)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    with SharedOHLCV(data_by_ticker) as shared:
+        pool = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {}
+            invalid = []
+            for job_id, (ticker, strategy_func, params) in enumerate(jobs):
+                # 沒有資料的工作直接回報錯誤, 不送進 pool (也不影響其他工作)
+                if ticker not in shared.specs:
+                    invalid.append(_job_result(job_id, ticker, strategy_func, params,
+                                               error=f"KeyError: no data for ticker {ticker!r}"))
+                    continue
+                future = pool.submit(_run_job, job_id, ticker, shared.specs[ticker],
+                                     strategy_func, dict(params), backtester_kwargs)
+                futures[future] = (job_id, ticker, strategy_func, params)
+
+            yield from invalid
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception:
+                    # worker 本身異常終止 (例如 BrokenProcessPool)
+                    yield _job_result(*futures[future], error=traceback.format_exc())
+        finally:
+            # 呼叫端提早結束迭代 (break / close / 例外) 時取消還在排隊的工作, 不等它們全部跑完;
+            # 用 with 的話離開時會 shutdown(wait=True), 排隊中的工作仍會一一執行
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_parallel(data_by_ticker, jobs, max_workers=None, **backtester_kwargs):
+    """
+    與 iter_parallel 相同，但等全部完成後依 jobs 的順序回傳結果列表。
+    """
+    results = list(iter_parallel(data_by_ticker, jobs, max_workers=max_workers, **backtester_kwargs))
+    return sorted(results, key=lambda r: r['job_id'])
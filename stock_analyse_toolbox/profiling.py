@@ -0,0 +1,212 @@
+"""
+回測流程的分段效能量測 (wall time、呼叫次數、記憶體峰值)。
+
+程式中以 `with profiling.stage('名稱'):` 標記各個階段；只有在 Profiler 啟用時才會記錄，
+未啟用時 stage() 只做一次 ContextVar 查詢並回傳共用的空 context manager，幾乎沒有額外成本。
+
+    prof = profiling.Profiler()
+    with prof:
+        bt = Backtester(data)
+        bt.run(strategies.rsi_strategy)
+        bt.get_summary_stats()
+    prof.to_frame()                     # 每個階段的統計
+    prof.to_chrome_trace('trace.json')  # 用 chrome://tracing 或 Perfetto 開啟
+
+也可以傳入 Backtester(data, profiler=prof)，只量測該回測器的 run / get_summary_stats。
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+_active = contextvars.ContextVar('stock_analyse_toolbox_profiler', default=None)
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+def stage(name):
+    """標記一個階段; 沒有啟用中的 Profiler 時不做任何事"""
+    profiler = _active.get()
+    if profiler is None:
+        return _NULL_CONTEXT
+    return profiler.stage(name)
+
+
+def use(profiler):
+    """在這個區塊內啟用 profiler (None 或已經啟用時不做任何事)"""
+    if profiler is None or _active.get() is profiler:
+        return _NULL_CONTEXT
+    return profiler
+
+
+def profiled(name):
+    """裝飾器: 整個函式呼叫記為一個階段"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _Stage:
+    __slots__ = ('profiler', 'name', 'path', 'start', 'start_memory', 'peak')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._exit(self)
+        return False
+
+
+class Profiler:
+    """
+    記錄每個階段的 wall time、呼叫次數與記憶體峰值。
+
+    階段可以巢狀，以 'Backtester.run/strategy/indicator' 這樣的路徑區分；
+    記憶體峰值為該階段執行期間比開始時多配置的最大位元組數 (tracemalloc)。
+    """
+
+    def __init__(self, memory=True):
+        """
+        Args:
+            memory (bool, optional): 是否以 tracemalloc 量測記憶體峰值.
+                                     tracemalloc 本身會讓程式變慢, 只需要時間時可設為 False.
+        """
+        self.memory = memory
+        self.events = []  # 每次呼叫一筆: name, path, depth, start, duration, peak_bytes, thread
+        self._local = threading.local()  # 每個 thread 各自的階段堆疊
+        self._tokens = []
+        self._started_tracing = False
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    # --- 啟用 / 停用 ---
+
+    def __enter__(self):
+        self._tokens.append(_active.set(self))
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        return self
+
+    def __exit__(self, *exc):
+        _active.reset(self._tokens.pop())
+        if not self._tokens and self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    # --- 記錄 ---
+
+    @property
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, stage):
+        parent = self._stack[-1] if self._stack else None
+        stage.path = f'{parent.path}/{stage.name}' if parent else stage.name
+        stage.start_memory = stage.peak = 0
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # reset_peak 會清掉外層階段的峰值, 先把目前的峰值記到外層
+            if parent is not None:
+                parent.peak = max(parent.peak, peak)
+            tracemalloc.reset_peak()
+            stage.start_memory = stage.peak = current
+        self._stack.append(stage)
+        stage.start = time.perf_counter()
+
+    def _exit(self, stage):
+        duration = time.perf_counter() - stage.start
+        stack = self._stack
+        stack.pop()
+        peak_bytes = 0
+        if self.memory and tracemalloc.is_tracing():
+            stage.peak = max(stage.peak, tracemalloc.get_traced_memory()[1])
+            peak_bytes = stage.peak - stage.start_memory
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, stage.peak)
+            tracemalloc.reset_peak()
+
+        with self._lock:
+            self.events.append({
+                'name': stage.name,
+                'path': stage.path,
+                'depth': len(stack),
+                'start': stage.start - self._origin,
+                'duration': duration,
+                'peak_bytes': peak_bytes,
+                'thread': threading.get_ident(),
+            })
+
+    # --- 輸出 ---
+
+    def stats(self):
+        """
+        每個階段 (依路徑) 的彙總: calls, total_s, mean_s, max_s, peak_bytes (各次呼叫中的最大值)。
+        """
+        summary = {}
+        for event in sorted(self.events, key=lambda e: e['start']):
+            s = summary.setdefault(event['path'], {
+                'calls': 0, 'total_s': 0.0, 'max_s': 0.0, 'peak_bytes': 0,
+            })
+            s['calls'] += 1
+            s['total_s'] += event['duration']
+            s['max_s'] = max(s['max_s'], event['duration'])
+            s['peak_bytes'] = max(s['peak_bytes'], event['peak_bytes'])
+        for s in summary.values():
+            s['mean_s'] = s['total_s'] / s['calls']
+        return summary
+
+    def to_frame(self):
+        """stats() 的 DataFrame 版本, index 為階段路徑, 依第一次出現的順序排列"""
+        columns = ['calls', 'total_s', 'mean_s', 'max_s', 'peak_bytes']
+        return pd.DataFrame.from_dict(self.stats(), orient='index', columns=columns).rename_axis('stage')
+
+    def to_dict(self):
+        return {'stages': self.stats(), 'events': list(self.events)}
+
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def to_chrome_trace(self, path):
+        """輸出 Chrome trace event 格式 (chrome://tracing / Perfetto 可直接開啟)"""
+        pid = os.getpid()
+        trace = [{
+            'name': event['name'],
+            'cat': event['path'],
+            'ph': 'X',
+            'ts': event['start'] * 1e6,
+            'dur': event['duration'] * 1e6,
+            'pid': pid,
+            'tid': event['thread'],
+            'args': {'path': event['path'], 'peak_bytes': event['peak_bytes']},
+        } for event in self.events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    def clear(self):
+        with self._lock:
+            self.events = []
@@ -0,0 +1,215 @@
+"""
+多週期 K 棒金字塔: 由最細的 OHLCV (例如 1 分鐘線) 一次算出 5m / 1h / 1d 等較大週期，
+之後新增細 K 棒時只重算受影響的最後幾根大週期 K 棒，不需要每次重新下載或 resample。
+
+    from stock_analyse_toolbox.pyramid import BarPyramid
+
+    pyramid = BarPyramid(minute_data, ['5m', '1h', '1d'])
+    pyramid['1h']                                   # 可直接交給 Backtester / plot_ohlc
+    pyramid.append(new_minute_bars)                 # 增量更新所有週期
+    pyramid.save(store, 'NVDA')                     # 各週期存成 OHLCVStore 的 interval
+    pyramid = BarPyramid.load(store, 'NVDA', '1m', ['5m', '1h', '1d'])
+
+    daily_rsi = indicators.rsi(pyramid['1d']['Close'])
+    pyramid.align(daily_rsi, '1d', minute_data.index)   # 每根分鐘 K 棒可用的日線 RSI
+
+週期必須是固定長度 ('5m', '1h', '1d' 或 pandas 的 '15min', '4h' ...)，大 K 棒的時間為區間起點
+(以 floor 對齊，時區資料依當地時間)。align 只使用「已完成」的大 K 棒, 不會用到未來的資料。
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from stock_analyse_toolbox import downsample
+from stock_analyse_toolbox.data_store import normalize
+
+# yfinance 的週期名稱 -> pandas 的 offset
+_YF_UNITS = {'m': 'min', 'h': 'h', 'd': 'D'}
+
+
+def timeframe_delta(timeframe):
+    """
+    週期名稱 ('1m', '5m', '1h', '1d', '15min' ...) 轉成 pd.Timedelta.
+    """
+    match = re.fullmatch(r'(\d+)([mhd])', timeframe)
+    freq = f'{match[1]}{_YF_UNITS[match[2]]}' if match else timeframe
+    try:
+        delta = pd.Timedelta(freq)
+    except ValueError:
+        raise ValueError(f"timeframe must have a fixed length (e.g. '5m', '1h', '1d'), got {timeframe!r}") from None
+    if delta <= pd.Timedelta(0):
+        raise ValueError(f"timeframe must be positive, got {timeframe!r}")
+    return delta
+
+
+class BarPyramid:
+    """
+    同一檔股票多個週期的 OHLCV。base 為最細的資料, levels 為 {週期: DataFrame}。
+
+    每個週期由能整除它的最大已建立週期合併而來 (1h 由 5m、1d 由 1h),
+    合併方式與 downsample.ohlcv 相同 (Open 取第一根、High 最大、Low 最小、Close 最後一根、Volume 加總)。
+    """
+
+    def __init__(self, data, timeframes=('5m', '1h', '1d')):
+        """
+        Args:
+            data (pd.DataFrame): 最細週期的 OHLCV (yfinance 的 MultiIndex 欄位會被攤平).
+            timeframes (iterable): 要建立的較大週期.
+        """
+        self._setup(normalize(data), timeframes)
+        if len(self.base):
+            self._mark_unsaved(None, self.base.index[0])
+            for tf in self.timeframes:
+                self._rebuild_from(tf, self._label(self.base.index[0], tf))
+
+    def _setup(self, base, timeframes):
+        self.base = base
+        self.deltas = {tf: timeframe_delta(tf) for tf in timeframes}
+        self.timeframes = sorted(self.deltas, key=self.deltas.get)
+        self.levels = {tf: base.iloc[:0] for tf in self.timeframes}
+        self._sources = {}
+        for i, tf in enumerate(self.timeframes):
+            # 由能整除的最大週期合併 (結果與直接由 base 合併相同, 但資料量小得多)
+            divisors = [finer for finer in self.timeframes[:i]
+                        if self.deltas[tf] % self.deltas[finer] == pd.Timedelta(0)]
+            self._sources[tf] = divisors[-1] if divisors else None
+        self._positions = {}
+        # 每個週期 (None 為 base) 尚未寫入 store 的起點, None 表示沒有
+        self._unsaved = dict.fromkeys([None] + self.timeframes)
+
+    def __getitem__(self, timeframe):
+        return self.levels[timeframe]
+
+    def __repr__(self):
+        end = self.base.index[-1] if len(self.base) else None
+        sizes = ', '.join(f'{tf}: {len(self.levels[tf])}' for tf in self.timeframes)
+        return f'BarPyramid(base: {len(self.base)} bars to {end}, {sizes})'
+
+    def _frame(self, timeframe):
+        return self.base if timeframe is None else self.levels[timeframe]
+
+    def _label(self, timestamp, timeframe):
+        """timestamp 所屬大 K 棒的起點"""
+        return pd.Timestamp(timestamp).floor(self.deltas[timeframe])
+
+    def _aggregate(self, source, timeframe):
+        if source.empty:
+            return source.iloc[:0]
+        labels = source.index.floor(self.deltas[timeframe])
+        values = labels.asi8
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+        bars = downsample.ohlcv(source, starts)[list(source.columns)]
+        bars.index = labels[starts]
+        return bars
+
+    def _rebuild_from(self, timeframe, label):
+        """由來源週期重算起點 >= label 的大 K 棒"""
+        source = self._frame(self._sources[timeframe])
+        level = self.levels[timeframe]
+        rebuilt = self._aggregate(source.iloc[source.index.searchsorted(label):], timeframe)
+        self.levels[timeframe] = pd.concat([level.iloc[:level.index.searchsorted(label)], rebuilt])
+        self._positions.pop(timeframe, None)
+        self._mark_unsaved(timeframe, label)
+        return rebuilt
+
+    def _mark_unsaved(self, timeframe, start):
+        current = self._unsaved[timeframe]
+        self._unsaved[timeframe] = start if current is None else min(current, start)
+
+    # --- 增量更新 ---
+
+    def append(self, data):
+        """
+        併入新的細 K 棒 (相同時間的 K 棒以新資料為準)。各週期只重算新資料起點所在的大 K 棒之後的部分。
+
+        Returns:
+            dict: {週期: 重算過的大 K 棒 (DataFrame)}.
+        """
+        new = normalize(data)
+        if new.empty:
+            return {}
+        start = new.index[0]
+        lo = self.base.index.searchsorted(start)
+        tail = self.base.iloc[lo:]
+        tail = tail[~tail.index.isin(new.index)]
+        self.base = pd.concat([self.base.iloc[:lo], new, tail])
+        if len(tail):
+            self.base = self.base.sort_index()
+        self._mark_unsaved(None, start)
+        return {tf: self._rebuild_from(tf, self._label(start, tf)) for tf in self.timeframes}
+
+    # --- 對齊 ---
+
+    def positions(self, timeframe, index=None):
+        """
+        index (預設為 base) 的每根 K 棒當時最後一根「已完成」的大 K 棒位置 (尚無時為 -1)。
+        大 K 棒在下一個大週期開始後才算完成, 因此只會用到過去的資料。
+        """
+        if index is None or index is self.base.index:
+            positions = self._positions.get(timeframe)
+            if positions is None:
+                positions = self._positions[timeframe] = self._completed(timeframe, self.base.index)
+            return positions
+        return self._completed(timeframe, pd.DatetimeIndex(index))
+
+    def _completed(self, timeframe, index):
+        labels = index.floor(self.deltas[timeframe])
+        return self.levels[timeframe].index.searchsorted(labels, side='left') - 1
+
+    def align(self, values, timeframe, index=None):
+        """
+        把大週期的序列 (例如日線 RSI) 對齊到 index 的每根 K 棒, 不需要重新 resample。
+
+        Args:
+            values (pd.Series | np.ndarray): 與 self[timeframe] 等長的值.
+            timeframe (str): values 的週期.
+            index (pd.DatetimeIndex, optional): 要對齊的 K 棒時間, 預設為 base 的 index.
+
+        Returns:
+            np.ndarray: 每根 K 棒可用的最新值 (float, 尚無已完成的大 K 棒時為 NaN).
+        """
+        values = np.asarray(values, dtype=float)
+        n_level = len(self.levels[timeframe])
+        if len(values) != n_level:
+            raise ValueError(f"values has {len(values)} rows, the {timeframe} level has {n_level}")
+        # 位置 -1 (尚無已完成的大 K 棒) 取到最後補上的 NaN
+        return np.append(values, np.nan)[self.positions(timeframe, index)]
+
+    # --- 儲存 ---
+
+    def save(self, store, ticker, base_interval='1m'):
+        """
+        base 與各週期寫入 OHLCVStore (interval 分別為 base_interval 與週期名稱),
+        只寫入上次 save / load 之後變動的部分。
+        """
+        for timeframe in [None] + self.timeframes:
+            start = self._unsaved[timeframe]
+            if start is None:
+                continue
+            frame = self._frame(timeframe)
+            store.append(ticker, frame.iloc[frame.index.searchsorted(start):],
+                         base_interval if timeframe is None else timeframe)
+            self._unsaved[timeframe] = None
+
+    @classmethod
+    def load(cls, store, ticker, base_interval='1m', timeframes=('5m', '1h', '1d'), start=None, end=None):
+        """
+        由 OHLCVStore 讀取 base 與已儲存的各週期。
+        缺少的週期由 base 補算; 最後一根大 K 棒可能在儲存後又有新的細 K 棒 (或被 end 截斷), 一律重算。
+        """
+        pyramid = cls.__new__(cls)
+        pyramid._setup(store.load(ticker, start, end, base_interval), timeframes)
+        base = pyramid.base
+        if base.empty:
+            return pyramid
+        for tf in pyramid.timeframes:
+            first = pyramid._label(base.index[0], tf)
+            try:
+                pyramid.levels[tf] = store.load(ticker, first, end, tf)
+            except KeyError:
+                pass
+            level = pyramid.levels[tf]
+            last = pyramid._label(base.index[-1], tf)
+            pyramid._rebuild_from(tf, min(level.index[-1], last) if len(level) else first)
+        return pyramid
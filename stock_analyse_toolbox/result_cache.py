@@ -0,0 +1,446 @@
+"""
+回測結果的持久化快取 (記憶體 LRU + 磁碟)。
+
+同一份資料、同一個策略 (同一版原始碼)、同樣的參數與手續費, 回測結果一定相同,
+因此以這些內容的雜湊作為 key，把 get_summary_stats 的結果 (以及選擇性的 Signal / Portfolio 陣列)
+存在記憶體與磁碟中，notebook、夜間參數掃描與報表可以共用。
+
+    cache = ResultCache('backtest_cache')
+    bt = Backtester(data)
+    stats = cache.run(bt, strategies.rsi_strategy, period=21)          # 第一次: 實際回測
+    stats = cache.run(bt, strategies.rsi_strategy, period=21)          # 之後: 直接由快取回傳
+    stats, arrays = cache.run(bt, strategies.rsi_strategy, arrays=True)  # 一併取得 Signal / Portfolio
+
+策略原始碼改變時 key 隨之改變，舊結果不會再被使用 (之後依大小淘汰, 或以 invalidate() 清除)。
+key 也包含策略讀取的全域變數 (函式以原始碼、其他值以內容計入), 以及 indicators / kernels /
+back_tester / metrics 的原始碼雜湊; 其他被呼叫的模組有修改時請 invalidate() 或更換 version。
+"""
+import functools
+import hashlib
+import importlib
+import inspect
+import json
+import marshal
+import os
+import re
+import shutil
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from stock_analyse_toolbox import indicators
+
+ARRAY_COLUMNS = ('Signal', 'Portfolio')
+
+# 摘要統計 (十幾個純量) 的估計大小, 用於記憶體容量的計算
+_STATS_BYTES = 1024
+
+# 回測結果也取決於這些模組 (指標、回測引擎與統計), 它們的原始碼雜湊一併計入 key
+_ENGINE_MODULES = ('indicators', 'kernels', 'back_tester', 'metrics')
+
+
+@functools.lru_cache(maxsize=None)
+def _engine_version():
+    """_ENGINE_MODULES 原始碼的雜湊 (執行期間不變, 只讀一次)"""
+    h = hashlib.blake2b(digest_size=16)
+    for name in _ENGINE_MODULES:
+        module = importlib.import_module(f'stock_analyse_toolbox.{name}')
+        with open(module.__file__, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def _strategy_identity(strategy_func):
+    """
+    策略的名稱與版本: (模組.名稱, 原始碼雜湊)。
+    functools.partial 會連同綁定的參數一起計入; 閉包變數以 repr 計入。
+    """
+    bound = ''
+    while isinstance(strategy_func, functools.partial):
+        bound += repr((strategy_func.args, sorted(strategy_func.keywords.items())))
+        strategy_func = strategy_func.func
+
+    if not hasattr(strategy_func, '__code__'):
+        # 可呼叫的物件 (例如 expressions 組合出的策略): 以類別的原始碼加上物件的 repr 作為版本
+        cls = type(strategy_func)
+        source = inspect.getsource(cls) + repr(strategy_func)
+        return f'{cls.__module__}.{cls.__qualname__}', hashlib.blake2b(
+            (source + bound).encode(), digest_size=16).hexdigest()
+
+    name = f'{strategy_func.__module__}.{strategy_func.__qualname__}'
+    try:
+        source = inspect.getsource(strategy_func).encode()
+    except (OSError, TypeError):
+        # 互動環境中定義的函式沒有原始碼檔案, 改用 bytecode
+        source = marshal.dumps(strategy_func.__code__)
+    h = hashlib.blake2b(source, digest_size=16)
+    for cell in strategy_func.__closure__ or ():
+        h.update(repr(cell.cell_contents).encode())
+    h.update(bound.encode())
+    return name, h.hexdigest()
+
+
+def _code_names(code):
+    """code 物件 (含巢狀的 lambda / 生成式) 讀取的全域與屬性名稱"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names.update(_code_names(const))
+    return names
+
+
+def _referenced_globals(strategy_func):
+    """
+    策略函式讀取的模組層級變數 [(名稱, 目前的值)], 依名稱排序。
+    模組本身不列入 (內容由其中被讀取的函式或 _ENGINE_MODULES 的版本涵蓋)。
+    """
+    while isinstance(strategy_func, functools.partial):
+        strategy_func = strategy_func.func
+    code = getattr(strategy_func, '__code__', None)
+    if code is None:
+        return []
+    namespace = strategy_func.__globals__
+    return [(name, namespace[name]) for name in sorted(_code_names(code))
+            if name in namespace and not inspect.ismodule(namespace[name])]
+
+
+def _data_fingerprint(data):
+    """OHLCV DataFrame 的內容雜湊 (index 與所有欄位)"""
+    return indicators.fingerprint(*(data[col] for col in sorted(data.columns)))
+
+
+def _param_json(value):
+    """
+    json.dumps 的 default: 把參數中的 numpy / pandas 物件換成可比較的內容雜湊,
+    其他無法以 JSON 表示的物件直接拒絕 (repr 可能省略內容, 不同的值會得到相同的 key)。
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return value.tolist()
+        content = hashlib.blake2b(np.ascontiguousarray(value).tobytes(), digest_size=16).hexdigest()
+        return {'ndarray': [str(value.dtype), list(value.shape), content]}
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        names = [str(value.name)] if isinstance(value, pd.Series) else list(map(str, value.columns))
+        rows = pd.util.hash_pandas_object(value, index=True).to_numpy()
+        content = hashlib.blake2b(rows.tobytes(), digest_size=16).hexdigest()
+        return {type(value).__name__: [names, str(value.dtypes), content]}
+    from stock_analyse_toolbox.pyramid import BarPyramid
+    if isinstance(value, BarPyramid):
+        # 各週期都由 base 算出
+        return {'BarPyramid': [value.timeframes, _data_fingerprint(value.base)]}
+    raise TypeError(f"ResultCache cannot key parameter of type {type(value).__name__}; "
+                    f"use JSON values, numpy arrays, pandas objects or BarPyramid")
+
+
+def _folder_name(name):
+    """策略名稱 -> 磁碟上的資料夾名稱 (例如 '__main__.<lambda>' 在 Windows 上不是合法的名稱)"""
+    safe = re.sub(r'[^A-Za-z0-9._-]+', '_', name).strip('._') or 'strategy'
+    return f"{safe[:80]}-{hashlib.blake2b(name.encode(), digest_size=4).hexdigest()}"
+
+
+def _normalize_stats(stats):
+    """統一成 numpy 純量, 記憶體與磁碟命中時回傳的型別相同"""
+    return {key: np.asarray(value)[()] for key, value in stats.items()}
+
+
+class _Entry:
+    __slots__ = ('name', 'stats', 'arrays', 'nbytes')
+
+    def __init__(self, name, stats, arrays=None):
+        self.name = name
+        self.stats = stats
+        self.arrays = arrays
+        self.nbytes = _STATS_BYTES + sum(a.nbytes for a in (arrays or {}).values())
+
+
+class ResultCache:
+    """
+    回測結果的快取: 記憶體中為 LRU (依位元組數淘汰)，磁碟上每筆結果一個 .npz 檔
+    (root/<策略名稱>-<雜湊>/<key>.npz)，超過 max_disk_bytes 時淘汰最久未使用的檔案。
+    可在多個 thread 間共用。
+    """
+
+    def __init__(self, root='backtest_cache', max_memory_bytes=256 * 2**20, max_disk_bytes=2**30,
+                 store_arrays=False, version=''):
+        """
+        Args:
+            root (str | None, optional): 磁碟快取資料夾, None 表示只使用記憶體.
+            max_memory_bytes (int, optional): 記憶體快取的容量上限.
+            max_disk_bytes (int, optional): 磁碟快取的容量上限.
+            store_arrays (bool, optional): 是否總是一併保存 Signal / Portfolio 陣列
+                                           (否則只有 run(arrays=True) 時才保存).
+            version (str, optional): 額外加入 key 的版本字串, 更換後所有舊結果都不再命中.
+        """
+        self.root = root
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.store_arrays = store_arrays
+        self.version = version
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory = OrderedDict()  # key -> _Entry
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        # 每個 (擁有資料複本的) Backtester 只算一次資料雜湊, 每個策略函式只讀一次原始碼
+        self._data_keys = weakref.WeakKeyDictionary()
+        self._strategy_keys = weakref.WeakKeyDictionary()
+
+        self._disk_bytes = 0
+        if root is not None:
+            os.makedirs(root, exist_ok=True)
+            self._disk_bytes = sum(os.path.getsize(path) for path, _ in self._disk_files())
+
+    # --- key ---
+
+    def _strategy_key(self, strategy_func):
+        with self._lock:
+            cached = self._strategy_keys.get(strategy_func)
+        code = getattr(strategy_func, '__code__', None)
+        if cached is None or cached[0] is not code:
+            cached = (code, _strategy_identity(strategy_func))
+            with self._lock:
+                self._strategy_keys[strategy_func] = cached
+        return cached[1]
+
+    def _globals_key(self, strategy_func, seen=None):
+        """
+        策略讀取的全域變數目前的值 (每次都重新讀取, 全域變數可能在兩次回測之間被修改)。
+        函式以名稱與原始碼計入 (並遞迴包含它們讀取的全域變數), 類別以原始碼計入;
+        其他值與參數相同須能以 JSON 表示, 否則丟出 TypeError (例如 logger 或連線物件, 請改以參數傳入)。
+        """
+        seen = set() if seen is None else seen
+        seen.add(id(strategy_func))
+        state = []
+        for name, value in _referenced_globals(strategy_func):
+            if inspect.isfunction(value) or isinstance(value, functools.partial):
+                if id(value) not in seen:
+                    state.append([name, *self._strategy_key(value), self._globals_key(value, seen)])
+            elif inspect.isclass(value):
+                try:
+                    source = inspect.getsource(value)
+                except (OSError, TypeError):
+                    source = ''
+                state.append([name, f'{value.__module__}.{value.__qualname__}',
+                              hashlib.blake2b(source.encode(), digest_size=16).hexdigest()])
+            elif inspect.isbuiltin(value):
+                state.append([name, f'{value.__module__}.{value.__qualname__}'])
+            else:
+                try:
+                    state.append([name, json.dumps(value, sort_keys=True, default=_param_json)])
+                except TypeError as exc:
+                    raise TypeError(f"ResultCache cannot key global {name!r} read by "
+                                    f"{getattr(strategy_func, '__qualname__', strategy_func)!r}: {exc}") from None
+        return state
+
+    def key(self, backtester, strategy_func, params):
+        """
+        回傳 (策略名稱, key)。key 由資料內容、策略名稱與原始碼、策略讀取的全域變數、參數、手續費、
+        初始資金與 _ENGINE_MODULES 的版本決定。
+        參數須能以 JSON 表示; numpy 陣列、pandas 物件與 BarPyramid 以內容雜湊計入, 其他物件丟出 TypeError。
+        backtester.data 的雜湊在第一次使用時計算並記住 (Backtester 預設持有資料的複本, 內容不會改變);
+        Backtester(copy=False) 的資料可能在外部被原地修改, 每次都重新計算。
+        """
+        data_key = None
+        owns_data = getattr(backtester, 'owns_data', False)
+        if owns_data:
+            with self._lock:
+                data_key = self._data_keys.get(backtester)
+        if data_key is None:
+            data_key = _data_fingerprint(backtester.data)
+            if owns_data:
+                with self._lock:
+                    self._data_keys[backtester] = data_key
+        name, source = self._strategy_key(strategy_func)
+        payload = json.dumps([data_key, name, source, self._globals_key(strategy_func), params,
+                              backtester.transaction_fee, backtester.initial_cash, _engine_version(),
+                              self.version], sort_keys=True, default=_param_json)
+        return name, hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    # --- 讀寫 ---
+
+    def run(self, backtester, strategy_func, arrays=False, **params):
+        """
+        有快取時直接回傳結果, 否則執行 backtester.run(strategy_func, **params) 並存入快取。
+        命中時不會更新 backtester.results_data / trades.
+
+        Args:
+            backtester (Backtester): 回測器.
+            strategy_func (callable): 策略函式.
+            arrays (bool, optional): 是否一併回傳 {'Signal': ..., 'Portfolio': ...} (唯讀的 np.ndarray).
+            **params: 策略參數.
+
+        Returns:
+            dict: get_summary_stats 的結果; arrays=True 時為 (dict, dict).
+        """
+        name, key = self.key(backtester, strategy_func, params)
+        entry = self.get(key, name, arrays)
+        if entry is None:
+            results = backtester.run(strategy_func, **params)
+            stats = _normalize_stats(backtester.get_summary_stats())
+            saved_arrays = None
+            if arrays or self.store_arrays:
+                saved_arrays = {col: results[col].to_numpy(copy=True) for col in ARRAY_COLUMNS}
+            entry = self.put(key, name, stats, saved_arrays)
+
+        if arrays:
+            return dict(entry.stats), dict(entry.arrays)
+        return dict(entry.stats)
+
+    def get(self, key, name, arrays=False):
+        """取出快取的 _Entry (先查記憶體再查磁碟), 沒有 (或需要陣列但沒有保存) 時回傳 None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and (entry.arrays is not None or not arrays):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._load(key, name)
+        if entry is not None and (entry.arrays is not None or not arrays):
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(key, entry)
+            return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, name, stats, arrays=None):
+        """存入一筆結果 (記憶體與磁碟), 回傳 _Entry"""
+        if arrays is not None:
+            arrays = {col: np.asarray(values) for col, values in arrays.items()}
+            for values in arrays.values():
+                values.flags.writeable = False
+        entry = _Entry(name, _normalize_stats(stats), arrays)
+        self._remember(key, entry)
+        self._save(key, name, entry)
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= old.nbytes
+            self._memory[key] = entry
+            self._memory_bytes += entry.nbytes
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    # --- 磁碟 ---
+
+    def _path(self, key, name):
+        return os.path.join(self.root, _folder_name(name), f'{key}.npz')
+
+    def _disk_files(self):
+        """磁碟上所有快取檔 (路徑, 最後使用時間)"""
+        files = []
+        for folder in os.scandir(self.root):
+            if folder.is_dir():
+                files.extend((f.path, f.stat().st_mtime) for f in os.scandir(folder.path)
+                             if f.name.endswith('.npz'))
+        return files
+
+    def _load(self, key, name):
+        if self.root is None:
+            return None
+        path = self._path(key, name)
+        try:
+            with np.load(path) as npz:
+                stats = {k: npz[f'stat:{k}'][()] for k in json.loads(npz['keys'][()])}
+                arrays = {col: npz[col] for col in ARRAY_COLUMNS if col in npz.files} or None
+            os.utime(path)  # 以修改時間記錄最後使用時間, 供 LRU 淘汰
+        except (OSError, KeyError, ValueError):
+            return None
+        if arrays is not None:
+            for values in arrays.values():
+                values.flags.writeable = False
+        return _Entry(name, stats, arrays)
+
+    def _save(self, key, name, entry):
+        if self.root is None:
+            return
+        path = self._path(key, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        content = {'keys': np.array(json.dumps(list(entry.stats)))}
+        content.update({f'stat:{k}': np.asarray(v) for k, v in entry.stats.items()})
+        content.update(entry.arrays or {})
+
+        # 先寫入暫存檔再置換, 其他程序不會讀到寫到一半的檔案
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **content)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._disk_bytes += os.path.getsize(path) - previous
+            over_limit = self._disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._evict_disk(keep=path)
+
+    def _evict_disk(self, keep=None):
+        """刪除最久未使用的檔案, 直到低於 max_disk_bytes"""
+        files = sorted(self._disk_files(), key=lambda item: item[1])
+        total = sum(os.path.getsize(path) for path, _ in files)
+        for path, _ in files:
+            if total <= self.max_disk_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+        with self._lock:
+            self._disk_bytes = total
+
+    # --- 管理 ---
+
+    def invalidate(self, strategy_func=None):
+        """
+        清除某個策略 (所有版本) 的結果; 不指定時清除全部。
+        策略原始碼修改後舊結果本來就不會命中, 這個函式用於立即釋放空間, 或策略依賴的程式碼有修改時.
+        """
+        name = None if strategy_func is None else self._strategy_key(strategy_func)[0]
+        with self._lock:
+            for key in [k for k, entry in self._memory.items() if name in (None, entry.name)]:
+                self._memory_bytes -= self._memory.pop(key).nbytes
+        if self.root is not None:
+            folders = [os.path.join(self.root, _folder_name(name))] if name else [f.path for f in os.scandir(self.root)
+                                                                   if f.is_dir()]
+            for folder in folders:
+                shutil.rmtree(folder, ignore_errors=True)
+            with self._lock:
+                self._disk_bytes = sum(os.path.getsize(path) for path, _ in self._disk_files())
+
+    def clear(self):
+        """清除所有結果並重設統計"""
+        self.invalidate()
+        with self._lock:
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory_bytes,
+            'disk_bytes': self._disk_bytes,
+        }
@@ -0,0 +1,298 @@
+"""
+回測結果的穩健性分析 (Monte Carlo / bootstrap)。
+
+以一次實際回測 (Backtester.run) 的淨值與交易紀錄為基礎產生大量重抽樣情境，
+每批情境以 (K 棒或交易 × 情境數) 的矩陣一次向量化計算, 不會逐情境呼叫 run():
+
+- bootstrap_returns: 以區塊 bootstrap 重抽策略每根 K 棒的報酬率 (保留區塊內的自我相關)
+- shuffle_trades: 打亂逐筆交易的順序 (replace=True 時改為重抽交易)
+- cost_scenarios: 在 transaction_fee 附近隨機化手續費, 並對每筆買賣加上隨機滑價
+
+每個函式回傳 {指標: 長度 n_scenarios 的陣列} (Final Value, Max Drawdown, Win Rate;
+bootstrap_returns 不含 Win Rate)，
+confidence_intervals() 轉成信賴區間表; analyze() 一次執行全部情境並彙整。
+
+    bt = Backtester(data, engine='vectorized')
+    bt.run(strategies.rsi_strategy, period=21)
+    robustness.analyze(bt, n_scenarios=10_000, seed=0)
+
+Win Rate 以扣除手續費 (與滑價) 後的交易報酬計算: 賣出後淨值高於買入前淨值即為獲利，
+與 get_summary_stats 只看買賣價差的 Win Rate 不同。
+"""
+import numpy as np
+import pandas as pd
+
+from stock_analyse_toolbox.back_tester import _held_state
+
+SCENARIO_KEYS = ("Final Value", "Max Drawdown", "Win Rate")
+
+# 未指定 batch_size 時, 每批情境矩陣的元素數上限 (約 16 MB 的 float64)
+_BATCH_ELEMENTS = 2_000_000
+
+
+class _BaseRun:
+    """從已執行過 run() 的 Backtester 取出分析所需的陣列"""
+
+    def __init__(self, backtester):
+        if backtester.results_data is None:
+            raise Exception("請先執行 run() 才能進行穩健性分析。")
+        results = backtester.results_data
+        self.initial_cash = backtester.initial_cash
+        self.transaction_fee = backtester.transaction_fee
+        self.portfolio = results['Portfolio'].to_numpy(dtype=float)
+        self.close = results['Close'].to_numpy(dtype=float)
+        self.held = _held_state(results['Signal'].to_numpy())
+        self.entry_idx = np.asarray(backtester.trades['entry_idx'])
+        self.exit_idx = np.asarray(backtester.trades['exit_idx'])
+
+        # 每筆交易的淨成長倍數: 賣出 (或期末) 的淨值 / 買入前一根的淨值 (已含手續費)
+        before = np.concatenate([[self.initial_cash], self.portfolio[:-1]])
+        self.trade_growth = self.portfolio[self.exit_idx] / before[self.entry_idx]
+
+    def actual(self):
+        """實際回測路徑的指標 (與各情境同樣的定義)"""
+        return {
+            "Final Value": self.portfolio[-1],
+            "Max Drawdown": _max_drawdown(self.portfolio),
+            "Win Rate": _win_rate(self.trade_growth),
+        }
+
+
+def _max_drawdown(equity):
+    """沿 axis 0 的最大回撤 (負值)"""
+    return (equity / np.maximum.accumulate(equity, axis=0) - 1).min(axis=0)
+
+
+def _win_rate(growth):
+    """沿 axis 0 的獲利交易比例 (沒有交易時為 0)"""
+    return np.count_nonzero(growth > 1, axis=0) / max(len(growth), 1)
+
+
+def _batches(n_scenarios, n_rows, batch_size=None):
+    """把 n_scenarios 切成數批, 回傳每批的情境數"""
+    if batch_size is None:
+        batch_size = max(1, _BATCH_ELEMENTS // max(n_rows, 1))
+    for lo in range(0, n_scenarios, batch_size):
+        yield min(batch_size, n_scenarios - lo)
+
+
+def _collect(parts):
+    """串接各批結果 (每批的值須為複本, 保留 equity[-1] 這類 view 會讓整個淨值矩陣無法釋放)"""
+    return {key: np.concatenate([np.atleast_1d(p[key]) for p in parts]) for key in parts[0]}
+
+
+def bootstrap_returns(backtester, n_scenarios=10_000, block_size=20, seed=None, batch_size=None):
+    """
+    區塊 bootstrap: 把策略每根 K 棒的淨值報酬率切成長度 block_size 的區塊 (循環取用)，
+    隨機抽取區塊接成與原始資料等長的新路徑。
+
+    區塊會把一筆交易切開或與其他交易的片段接在一起, 重組後的路徑沒有完整的交易,
+    因此只計算淨值層級的指標; 交易層級的分布 (勝率) 請用 shuffle_trades(replace=True) 重抽整筆交易。
+
+    Args:
+        backtester (Backtester): 已執行過 run() 的回測器.
+        n_scenarios (int, optional): 情境數.
+        block_size (int, optional): 區塊長度 (K 棒數), 1 即為一般的 i.i.d. bootstrap.
+        seed (int, optional): 亂數種子.
+        batch_size (int, optional): 每批同時計算的情境數, 預設依資料長度自動決定.
+
+    Returns:
+        dict: {Final Value, Max Drawdown: 長度 n_scenarios 的 np.ndarray}.
+    """
+    base = _BaseRun(backtester)
+    rng = np.random.default_rng(seed)
+    log_returns = np.log(base.portfolio[1:] / base.portfolio[:-1])
+    n = len(log_returns)
+    if n == 0:
+        raise ValueError("至少需要兩根 K 棒才能做 bootstrap。")
+    block_size = max(1, min(block_size, n))
+    n_blocks = -(-n // block_size)
+
+    parts = []
+    offsets = np.arange(block_size)
+    for size in _batches(n_scenarios, n, batch_size):
+        starts = rng.integers(0, n, size=(n_blocks, 1, size))
+        idx = ((starts + offsets[:, None]) % n).reshape(n_blocks * block_size, size)[:n]
+
+        equity = np.empty((n + 1, size))
+        equity[0] = base.portfolio[0]
+        np.cumsum(log_returns[idx], axis=0, out=equity[1:])
+        np.exp(equity[1:], out=equity[1:])
+        equity[1:] *= base.portfolio[0]
+
+        parts.append({
+            "Final Value": equity[-1].copy(),
+            "Max Drawdown": _max_drawdown(equity),
+        })
+    return _collect(parts)
+
+
+def shuffle_trades(backtester, n_scenarios=10_000, replace=False, seed=None, batch_size=None):
+    """
+    打亂 backtester.trades 的交易順序 (replace=True 時為有放回的重抽)，重新串接出淨值路徑。
+
+    只打亂順序時最終淨值與勝率不變 (乘法可交換)，分布反映的是回撤對交易順序的敏感度；
+    重抽時三個指標都會變動。回撤以每筆交易結束時的淨值, 加上該筆交易持倉期間的最低淨值計算。
+
+    Args:
+        backtester (Backtester): 已執行過 run() 的回測器.
+        n_scenarios (int, optional): 情境數.
+        replace (bool, optional): True 為 bootstrap 重抽交易, False 為只打亂順序.
+        seed (int, optional): 亂數種子.
+        batch_size (int, optional): 每批同時計算的情境數.
+
+    Returns:
+        dict: {Final Value, Max Drawdown, Win Rate: 長度 n_scenarios 的 np.ndarray}.
+    """
+    base = _BaseRun(backtester)
+    rng = np.random.default_rng(seed)
+    growth = base.trade_growth
+    n_trades = len(growth)
+    if n_trades == 0:
+        actual = base.actual()
+        return {key: np.full(n_scenarios, actual[key], dtype=float) for key in SCENARIO_KEYS}
+
+    # 每筆交易持倉期間相對買入前淨值的最低倍數
+    before = np.concatenate([[base.initial_cash], base.portfolio[:-1]])
+    trough = np.array([base.portfolio[entry:exit_ + 1].min()
+                       for entry, exit_ in zip(base.entry_idx, base.exit_idx)]) / before[base.entry_idx]
+
+    parts = []
+    for size in _batches(n_scenarios, n_trades, batch_size):
+        if replace:
+            order = rng.integers(0, n_trades, size=(n_trades, size))
+        else:
+            order = rng.permuted(np.broadcast_to(np.arange(n_trades)[:, None], (n_trades, size)), axis=0)
+
+        equity = np.empty((n_trades + 1, size))
+        equity[0] = base.initial_cash
+        np.cumprod(growth[order], axis=0, out=equity[1:])
+        equity[1:] *= base.initial_cash
+
+        peak = np.maximum.accumulate(equity, axis=0)
+        intra_trade = equity[:-1] * trough[order] / peak[:-1] - 1
+        drawdown = np.minimum(_max_drawdown(equity), intra_trade.min(axis=0))
+
+        parts.append({
+            "Final Value": equity[-1].copy(),
+            "Max Drawdown": drawdown,
+            "Win Rate": _win_rate(growth[order]),
+        })
+    return _collect(parts)
+
+
+def cost_scenarios(backtester, n_scenarios=10_000, fee_spread=0.5, slippage=0.0005, seed=None,
+                   batch_size=None):
+    """
+    以相同的進出場時點, 在隨機的交易成本下重新計算淨值路徑。
+
+    每個情境的手續費率在 transaction_fee × [1 - fee_spread, 1 + fee_spread] 間均勻抽樣；
+    每筆買入 / 賣出另外各自抽樣 [0, 2 × slippage] 的滑價 (買價變高、賣價變低)。
+    fee_spread=0 且 slippage=0 時每個情境都與原本的回測相同。
+
+    Args:
+        backtester (Backtester): 已執行過 run() 的回測器.
+        n_scenarios (int, optional): 情境數.
+        fee_spread (float, optional): 手續費率的相對變動範圍.
+        slippage (float, optional): 平均滑價比例 (0.0005 = 5 bps).
+        seed (int, optional): 亂數種子.
+        batch_size (int, optional): 每批同時計算的情境數.
+
+    Returns:
+        dict: {Final Value, Max Drawdown, Win Rate: 長度 n_scenarios 的 np.ndarray}.
+    """
+    base = _BaseRun(backtester)
+    rng = np.random.default_rng(seed)
+    close, held = base.close, base.held
+    n_trades = len(base.entry_idx)
+    buy_price = close[base.entry_idx][:, None]
+    sell_price = close[base.exit_idx][:, None]
+
+    # 每根 K 棒對應的交易 (持倉中) 與已完成的賣出次數 (空手時的現金)
+    bars = np.arange(len(close))
+    trade_at = np.searchsorted(base.entry_idx, bars, side='right') - 1
+    cash_at = np.searchsorted(base.exit_idx, bars, side='right')
+    held_bars = np.flatnonzero(held)
+    flat_bars = np.flatnonzero(~held)
+
+    parts = []
+    for size in _batches(n_scenarios, len(close), batch_size):
+        fee = base.transaction_fee * rng.uniform(1 - fee_spread, 1 + fee_spread, size=size)
+        keep = 1 - fee
+        buy_slip = rng.uniform(0, 2 * slippage, size=(n_trades, size))
+        sell_slip = rng.uniform(0, 2 * slippage, size=(n_trades, size))
+
+        # 每筆交易買到的股數 (每 1 元現金) 與賣出後的現金倍數
+        units = keep / (buy_price * (1 + buy_slip))
+        cash = np.empty((n_trades + 1, size))
+        cash[0] = base.initial_cash
+        np.cumprod(units * sell_price * (1 - sell_slip) * keep, axis=0, out=cash[1:])
+        cash[1:] *= base.initial_cash
+
+        equity = np.empty((len(close), size))
+        k = trade_at[held_bars]
+        equity[held_bars] = cash[k] * units[k] * close[held_bars, None]
+        equity[flat_bars] = cash[cash_at[flat_bars]]
+
+        before = np.vstack([np.full((1, size), base.initial_cash), equity[:-1]])
+        growth = equity[base.exit_idx] / before[base.entry_idx]
+        parts.append({
+            "Final Value": equity[-1].copy(),
+            "Max Drawdown": _max_drawdown(equity),
+            "Win Rate": _win_rate(growth),
+        })
+    return _collect(parts)
+
+
+def confidence_intervals(scenarios, confidence=0.95):
+    """
+    情境結果的分布摘要。
+
+    Args:
+        scenarios (dict): bootstrap_returns / shuffle_trades / cost_scenarios 的回傳值.
+        confidence (float, optional): 信賴水準, 0.95 代表取 2.5% 與 97.5% 分位數.
+
+    Returns:
+        pd.DataFrame: index 為指標, 欄位 mean, std, lower, median, upper.
+    """
+    tail = (1 - confidence) / 2
+    rows = {}
+    for key, values in scenarios.items():
+        lower, median, upper = np.quantile(values, [tail, 0.5, 1 - tail])
+        rows[key] = {'mean': values.mean(), 'std': values.std(), 'lower': lower, 'median': median, 'upper': upper}
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('metric')
+
+
+def analyze(backtester, strategy_func=None, n_scenarios=10_000, confidence=0.95, seed=None,
+            block_size=20, fee_spread=0.5, slippage=0.0005, **kwargs):
+    """
+    執行全部三種情境並回傳信賴區間表。
+
+    Args:
+        backtester (Backtester): 回測器; 未傳入 strategy_func 時須已執行過 run().
+        strategy_func (callable, optional): 指定時先執行 backtester.run(strategy_func, **kwargs).
+        n_scenarios (int, optional): 每種情境的數量.
+        confidence (float, optional): 信賴水準.
+        seed (int, optional): 亂數種子.
+        block_size, fee_spread, slippage: 見 bootstrap_returns / cost_scenarios.
+        **kwargs: 策略參數.
+
+    Returns:
+        pd.DataFrame: index 為 (scenario, metric), 欄位 actual (實際回測) 與 confidence_intervals 的各欄.
+    """
+    if strategy_func is not None:
+        backtester.run(strategy_func, **kwargs)
+    actual = _BaseRun(backtester).actual()
+
+    seeds = np.random.SeedSequence(seed).spawn(3)
+    results = {
+        'bootstrap_returns': bootstrap_returns(backtester, n_scenarios, block_size, seed=seeds[0]),
+        'shuffle_trades': shuffle_trades(backtester, n_scenarios, seed=seeds[1]),
+        'cost_scenarios': cost_scenarios(backtester, n_scenarios, fee_spread, slippage, seed=seeds[2]),
+    }
+    frames = {}
+    for name, scenarios in results.items():
+        frame = confidence_intervals(scenarios, confidence)
+        frame.insert(0, 'actual', [actual[key] for key in frame.index])
+        frames[name] = frame
+    return pd.concat(frames, names=['scenario'])
@@ -0,0 +1,380 @@
+"""
+參數的適應性搜尋: successive halving 提早淘汰明顯不好的參數，取代窮舉整個網格。
+
+每一輪先以最近一小段歷史評估所有候選參數，保留排名前 1/eta 的組合 (該輪的第一層前緣整層保留)，
+再以 eta 倍長的歷史評估存活者，直到最後一輪使用完整歷史。候選參數可以是
+整個網格 ('grid')、隨機抽樣 ('random')，或依已評估結果調整抽樣分布的 'bayes' (TPE 風格)。
+排名可以同時考慮多個指標 (例如 Total Return 與 Max Drawdown)，以 Pareto 前緣分層排序;
+淘汰輪中同一層前緣再依擁擠距離排序, 沒有交易的組合排在最後。
+
+    table = search.search(data, strategies.rsi_strategy,
+                          {'period': range(5, 51), 'oversold': range(20, 46, 5), 'overbought': range(55, 81, 5)},
+                          objectives=['Total Return', 'Max Drawdown'])
+    table.attrs['search_log']    # 每一輪評估 / 淘汰的組合數
+"""
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+
+from stock_analyse_toolbox import optimizer
+
+logger = logging.getLogger(__name__)
+
+SAMPLERS = ('grid', 'random', 'bayes')
+
+# 越小越好的指標; 其他指標 (含負值的 Max Drawdown) 都是越大越好
+_MINIMIZE = {'Max Drawdown Duration'}
+
+# 計算 Pareto 支配關係時每批比較的列數 (限制 N × 列數 × 指標數 的暫存陣列大小)
+_DOMINANCE_CHUNK = 512
+
+
+def _objective_spec(objectives):
+    """回傳 [(指標, 是否越大越好)]"""
+    if isinstance(objectives, str):
+        objectives = [objectives]
+    if isinstance(objectives, dict):
+        return [(key, direction == 'max') for key, direction in objectives.items()]
+    return [(key, key not in _MINIMIZE) for key in objectives]
+
+
+def _dominates(a, b):
+    """a 的每一列是否支配 b 的每一列: shape (len(a), len(b))"""
+    ge = (a[:, None, :] >= b[None, :, :]).all(axis=2)
+    gt = (a[:, None, :] > b[None, :, :]).any(axis=2)
+    return ge & gt
+
+
+def _oriented(values, maximize):
+    """統一成越大越好, NaN 視為最差"""
+    values = np.asarray(values, dtype=float).reshape(len(values), -1)
+    v = np.where(np.asarray(maximize), values, -values)
+    return np.where(np.isnan(v), -np.inf, v)
+
+
+def pareto_rank(values, maximize):
+    """
+    多目標排名: 依 Pareto 前緣分層 (0 = 沒有被任何一組支配)，同一層內依第一個指標排序。
+
+    Args:
+        values (np.ndarray): shape (N, 指標數), 第一欄為主要指標.
+        maximize (list[bool]): 每個指標是否越大越好.
+
+    Returns:
+        (order, front): 由好到壞的索引, 以及每一組所在的前緣層數.
+    """
+    v = _oriented(values, maximize)
+    n = len(v)
+    if v.shape[1] == 1:
+        order = np.lexsort((np.arange(n), -v[:, 0]))
+        front = np.empty(n, dtype=int)
+        _, front[order] = np.unique(-v[order, 0], return_inverse=True)
+        return order, front
+
+    # 每一組被幾組支配; 逐層移除目前的前緣並扣掉它們造成的支配數
+    dominated_by = np.zeros(n, dtype=int)
+    for lo in range(0, n, _DOMINANCE_CHUNK):
+        dominated_by += _dominates(v[lo:lo + _DOMINANCE_CHUNK], v).sum(axis=0)
+    front = np.full(n, -1)
+    level = 0
+    current = np.flatnonzero(dominated_by == 0)
+    while len(current):
+        front[current] = level
+        for lo in range(0, len(current), _DOMINANCE_CHUNK):
+            dominated_by -= _dominates(v[current[lo:lo + _DOMINANCE_CHUNK]], v).sum(axis=0)
+        dominated_by[current] = -1
+        current = np.flatnonzero(dominated_by == 0)
+        level += 1
+    order = np.lexsort((np.arange(n), -v[:, 0], front))
+    return order, front
+
+
+def crowding_distance(values, maximize, front):
+    """
+    NSGA-II 的擁擠距離: 同一層前緣內, 每一組在各指標上與左右相鄰組合的距離 (以該層的範圍正規化) 總和,
+    各指標的兩端為 inf。距離越大, 代表該組所在的前緣區段越稀疏。
+    """
+    v = _oriented(values, maximize)
+    distance = np.zeros(len(v))
+    for level in np.unique(front):
+        members = np.flatnonzero(front == level)
+        for column in v[members].T:
+            order = np.argsort(column, kind='stable')
+            column, ends = column[order], members[order]
+            distance[ends[[0, -1]]] = np.inf
+            if len(ends) <= 2 or not np.isfinite(column[[0, -1]]).all():
+                continue
+            span = column[-1] - column[0]
+            if span > 0:
+                distance[ends[1:-1]] += (column[2:] - column[:-2]) / span
+    return distance
+
+
+def _rank(stats, spec):
+    values = np.column_stack([np.asarray(stats[key], dtype=float) for key, _ in spec])
+    return pareto_rank(values, [maximize for _, maximize in spec])
+
+
+def _prune_order(stats, spec):
+    """
+    淘汰輪 (只用了部分歷史) 的排名。
+
+    沒有交易的組合排在最後: 短區間內它們的 Total Return 與 Max Drawdown 都是 0, 在多目標下不會被支配,
+    若照 Pareto 前緣排序會擠掉真正有交易的組合。多個指標時同一層前緣內依擁擠距離 (大到小) 排序,
+    保留分散在整條前緣上的組合; 完整歷史的最終排名才以 pareto_rank 為準。
+
+    Returns:
+        (order, front): 由好到壞的索引, 以及每列所在的前緣層數 (沒有交易的組合為 -1).
+    """
+    values = np.column_stack([np.asarray(stats[key], dtype=float) for key, _ in spec])
+    # 沒有交易的組合視為最差 (NaN), 自成最後一層前緣, 也不會支配任何有交易的組合
+    values[np.asarray(stats['Total Trades']) == 0] = np.nan
+    maximize = [maximize for _, maximize in spec]
+    _, front = pareto_rank(values, maximize)
+    primary = _oriented(values[:, :1], maximize[:1])[:, 0]
+    crowding = crowding_distance(values, maximize, front) if len(spec) > 1 else np.zeros(len(values))
+    order = np.lexsort((np.arange(len(values)), -primary, -crowding, front))
+    front[np.isnan(values).any(axis=1)] = -1
+    return order, front
+
+
+# --- 候選參數 ---
+
+def _param_values(strategy_func, param_grid):
+    """每個參數的候選值 (未指定的參數只有預設值), 順序與 expand_grid 相同"""
+    defaults = optimizer.expand_grid(strategy_func, {})[0]
+    values = {name: [value] for name, value in defaults.items()}
+    values.update({name: list(np.atleast_1d(v)) for name, v in param_grid.items()})
+    return values
+
+
+def _combo(values, choice):
+    return {name: _as_python(values[name][i]) for name, i in zip(values, choice)}
+
+
+def _as_python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def sample_params(strategy_func, param_grid, n_samples, seed=None, weights=None, exclude=()):
+    """
+    由參數網格隨機抽出最多 n_samples 組不重複的參數 (不展開整個網格)。
+
+    Args:
+        weights (dict, optional): {參數名稱: 各候選值的抽樣權重}, 預設為均勻分布.
+        exclude (iterable, optional): 不要再抽到的參數組合 (以 tuple(sorted(combo.items())) 表示).
+    """
+    rng = np.random.default_rng(seed)
+    values = _param_values(strategy_func, param_grid)
+    sizes = [len(v) for v in values.values()]
+    total = math.prod(sizes)
+    seen = set(exclude)
+    n_samples = min(n_samples, total - len(seen))
+
+    combos = []
+    for _ in range(100):
+        if len(combos) >= n_samples:
+            break
+        draws = np.column_stack([
+            rng.choice(size, size=2 * n_samples, p=None if weights is None or name not in weights
+                       else np.asarray(weights[name]) / np.sum(weights[name]))
+            for name, size in zip(values, sizes)
+        ])
+        for choice in draws:
+            combo = _combo(values, choice)
+            key = tuple(sorted(combo.items()))
+            if key not in seen:
+                seen.add(key)
+                combos.append(combo)
+                if len(combos) >= n_samples:
+                    break
+    return combos
+
+
+def _tpe_weights(strategy_func, param_grid, evaluated, order, pruned, gamma):
+    """
+    TPE 風格的抽樣權重: 各候選值在「好」的組合 (完整歷史排名前 gamma 比例) 與「壞」的組合
+    (其餘存活者與所有被淘汰者) 中出現的頻率比, 加 1 平滑, 讓抽樣集中在表現好的區域但不會完全排除其他值。
+
+    Args:
+        evaluated (list[dict]): 以完整歷史評估過的組合.
+        order (np.ndarray): evaluated 由好到壞的索引.
+        pruned (list[dict]): 被 successive halving 淘汰的組合.
+    """
+    values = _param_values(strategy_func, param_grid)
+    n_good = max(1, int(math.ceil(gamma * len(order))))
+    good = [evaluated[i] for i in order[:n_good]]
+    bad = [evaluated[i] for i in order[n_good:]] + list(pruned)
+
+    weights = {}
+    for name, candidates in values.items():
+        index = {_as_python(v): i for i, v in enumerate(candidates)}
+        counts = np.ones((2, len(candidates)))
+        for row, combos in enumerate((good, bad)):
+            for combo in combos:
+                counts[row, index[combo[name]]] += 1
+        weights[name] = (counts[0] / counts[0].sum()) / (counts[1] / counts[1].sum())
+    return weights
+
+
+# --- successive halving ---
+
+def successive_halving(data, strategy_func, combos, objectives='Total Return', eta=3, min_bars=None,
+                       top_k=10, initial_cash=100000, transaction_fee=0.001425, batch_size=1024):
+    """
+    對給定的參數組合做 successive halving。
+
+    Args:
+        data (pd.DataFrame): OHLCV 資料 (欄位須已攤平).
+        strategy_func (callable): 策略函式.
+        combos (list[dict]): 候選參數.
+        objectives (str | list | dict): 排名依據的統計欄位; dict 為 {欄位: 'max' / 'min'}.
+        eta (int, optional): 每輪保留 1/eta 的候選, 歷史長度乘以 eta.
+        min_bars (int, optional): 第一輪最少的 K 棒數, 預設約為完整歷史的 1/eta (至少 250 根),
+                                  也就是只有一輪淘汰; 更短的區間內排名與完整歷史的相關性很低,
+                                  容易淘汰掉最後的最佳組合. 各輪的 K 棒數由完整歷史依序除以 eta,
+                                  最後一輪剛好是完整歷史.
+        top_k (int, optional): 每輪至少保留的組合數 (也是最後以完整歷史評估的最少組合數);
+                               該輪第一層前緣上有交易的組合不論數量都會保留.
+        initial_cash, transaction_fee, batch_size: 同 optimizer.optimize.
+
+    Returns:
+        (stats, survivors, log): 最後存活者在完整歷史上的統計, 存活者在 combos 中的索引, 每一輪的紀錄.
+    """
+    spec = _objective_spec(objectives)
+    n = len(data)
+    if min_bars is None:
+        min_bars = max(n // eta, 250)
+    # 由完整歷史往回推各輪的長度, 避免倒數第二輪只比完整歷史短一點 (多花一輪幾乎完整的評估)
+    schedule = [n]
+    while schedule[-1] // eta >= min_bars:
+        schedule.append(schedule[-1] // eta)
+    schedule = schedule[::-1]
+    candidates = np.arange(len(combos))
+    log = []
+
+    for bars in schedule:
+        if len(candidates) <= top_k:
+            bars = n  # 剩下的組合不多, 直接以完整歷史評估
+        window = data.iloc[n - bars:]
+        stats = optimizer.evaluate(window, strategy_func, [combos[i] for i in candidates],
+                                   initial_cash, transaction_fee, batch_size)
+        if bars >= n:
+            log.append({'round': len(log), 'bars': bars, 'evaluated': len(candidates),
+                        'kept': len(candidates), 'pruned': 0})
+            return stats, candidates, log
+
+        order, front = _prune_order(stats, spec)
+        keep = np.zeros(len(candidates), dtype=bool)
+        keep[order[:max(top_k, int(math.ceil(len(candidates) / eta)))]] = True
+        # 只看部分歷史時第一層前緣內的排序 (擁擠距離) 沒有意義, 整層保留
+        keep |= front == 0
+        n_keep = int(keep.sum())
+        log.append({'round': len(log), 'bars': bars, 'evaluated': len(candidates),
+                    'kept': n_keep, 'pruned': len(candidates) - n_keep})
+        logger.info("round %d: %d bars, evaluated %d, pruned %d",
+                    len(log) - 1, bars, len(candidates), len(candidates) - n_keep)
+        candidates = candidates[keep]
+
+
+def search(data, strategy_func, param_grid, sampler='grid', n_samples=None, objectives='Total Return',
+           eta=3, min_bars=None, top_k=10, n_iterations=4, gamma=0.25, seed=None,
+           initial_cash=100000, transaction_fee=0.001425, batch_size=1024):
+    """
+    適應性參數搜尋 (optimizer.optimize 的替代方案)。
+
+    Args:
+        data (pd.DataFrame): OHLCV 資料.
+        strategy_func (callable): 策略函式.
+        param_grid (dict): {參數名稱: 候選值列表}.
+        sampler (str, optional): 'grid' (整個網格), 'random' (抽 n_samples 組),
+                                 'bayes' (分 n_iterations 批抽樣, 之後的批次依已評估結果調整抽樣分布).
+        n_samples (int, optional): 'random' / 'bayes' 的總抽樣數, 預設為網格大小的 1/4.
+        objectives (str | list | dict, optional): 排名依據; 多個指標時以 Pareto 前緣排序.
+        eta, min_bars, top_k: 見 successive_halving.
+        n_iterations (int, optional): 'bayes' 的批次數.
+        gamma (float, optional): 'bayes' 中視為「好」的組合比例.
+        seed (int, optional): 亂數種子.
+        initial_cash, transaction_fee, batch_size: 同 optimizer.optimize.
+
+    Returns:
+        pd.DataFrame: 以完整歷史評估過的組合 (參數欄位 + 所有統計 + 'Pareto Front')，由好到壞排序。
+                      attrs['search_log'] 為每一輪的紀錄, attrs['evaluations'] 為評估量的摘要.
+    """
+    if sampler not in SAMPLERS:
+        raise ValueError(f"sampler must be one of {SAMPLERS}, got {sampler!r}")
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy(deep=False)
+        data.columns = [col[0] for col in data.columns]
+
+    spec = _objective_spec(objectives)
+    grid_size = math.prod(len(v) for v in _param_values(strategy_func, param_grid).values())
+    if n_samples is None:
+        n_samples = max(top_k, grid_size // 4)
+    halving = dict(objectives=objectives, eta=eta, min_bars=min_bars, top_k=top_k, initial_cash=initial_cash,
+                   transaction_fee=transaction_fee, batch_size=batch_size)
+
+    rng = np.random.default_rng(seed)
+    evaluated, pruned, stats_parts, combos_seen, search_log = [], [], [], [], []
+    if sampler == 'grid':
+        batches = [optimizer.expand_grid(strategy_func, param_grid)]
+        grid_size = len(batches[0])  # expand_grid 已去除重複的組合
+    elif sampler == 'random':
+        batches = [sample_params(strategy_func, param_grid, n_samples, seed=rng)]
+    else:
+        batches = None
+
+    iteration = 0
+    while True:
+        if batches is not None:
+            if iteration >= len(batches):
+                break
+            combos = batches[iteration]
+        else:
+            if iteration >= n_iterations:
+                break
+            per_batch = int(math.ceil(n_samples / n_iterations))
+            weights = None
+            if evaluated:
+                order, _ = _rank(pd.DataFrame(stats_parts).to_dict('list'), spec)
+                weights = _tpe_weights(strategy_func, param_grid, evaluated, order, pruned, gamma)
+            exclude = [tuple(sorted(c.items())) for c in combos_seen]
+            combos = sample_params(strategy_func, param_grid, per_batch, seed=rng, weights=weights,
+                                   exclude=exclude)
+            if not combos:
+                break
+        combos_seen.extend(combos)
+
+        stats, survivors, log = successive_halving(data, strategy_func, combos, **halving)
+        for entry in log:
+            entry['iteration'] = iteration
+        search_log.extend(log)
+        evaluated.extend(combos[i] for i in survivors)
+        pruned.extend(np.delete(np.asarray(combos, dtype=object), survivors))
+        stats_parts.extend(dict(zip(stats, row)) for row in zip(*stats.values()))
+        iteration += 1
+
+    stats = pd.DataFrame(stats_parts)
+    order, front = _rank(stats.to_dict('list'), spec)
+    table = pd.concat([pd.DataFrame(evaluated), stats], axis=1)
+    table['Pareto Front'] = front
+    table = table.iloc[order].reset_index(drop=True)
+
+    log = pd.DataFrame(search_log)
+    bar_evaluations = int((log['bars'] * log['evaluated']).sum())
+    full_grid = grid_size * len(data)
+    table.attrs['search_log'] = search_log
+    table.attrs['evaluations'] = {
+        'candidates': len(combos_seen),
+        'grid_size': grid_size,
+        'pruned': int(log['pruned'].sum()),
+        'bar_evaluations': bar_evaluations,
+        'full_grid_bar_evaluations': full_grid,
+        'fraction_of_full_grid': bar_evaluations / full_grid,
+    }
+    logger.info("searched %d of %d combinations, pruned %d, %.1f%% of full-grid bar evaluations",
+                len(combos_seen), grid_size, table.attrs['evaluations']['pruned'],
+                100 * bar_evaluations / full_grid)
+    return table
@@ -0,0 +1,449 @@
+"""
+常駐的本機回測服務 (HTTP / JSON, 只使用標準函式庫)。
+
+一般的分析流程每次都要啟動新的 Python 程序、重新 import pandas / mplfinance、重新讀取資料。
+服務模式只載入一次: OHLCV 與指標留在記憶體 (indicators.default_cache)，回測結果存在 ResultCache，
+一組常駐的 worker thread 從有上限的佇列取出請求執行；佇列滿時立即回應 503 (backpressure)，
+不會無限制地堆積請求。
+
+    python -m stock_analyse_toolbox.service --data-root data --port 8765
+
+    curl -X POST localhost:8765/backtest -d '{"ticker": "NVDA", "strategy": "rsi_strategy", "params": {"period": 21}}'
+    curl -X POST localhost:8765/sweep -d '{"ticker": "NVDA", "strategy": "rsi_strategy", "grid": {"period": [7, 14, 21]}}'
+    curl -X POST localhost:8765/chart -d '{"ticker": "NVDA", "strategy": "rsi_strategy", "indicators": ["RSI"]}'
+    curl localhost:8765/metrics
+
+請求類型: backtest / sweep / chart (POST), datasets / metrics / health (GET)。
+每個回應都附上 queue_ms (排隊時間) 與 latency_ms (總處理時間)，/metrics 提供各類型的延遲分位數。
+"""
+import argparse
+import collections
+import hashlib
+import http.server
+import json
+import math
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from stock_analyse_toolbox import optimizer, result_cache, search, strategies
+from stock_analyse_toolbox.back_tester import Backtester
+
+REQUEST_KINDS = ('backtest', 'sweep', 'chart')
+
+# /metrics 中每種請求保留的最近延遲筆數
+_LATENCY_WINDOW = 1000
+
+
+class ServiceBusy(Exception):
+    """佇列已滿, 請稍後重試 (HTTP 503)"""
+
+
+class RequestError(Exception):
+    """請求內容錯誤 (HTTP 400)"""
+
+
+def _strategy(name):
+    """只允許 strategies 模組中的策略函式 (不會 import 任意模組)"""
+    func = getattr(strategies, name, None) if isinstance(name, str) and not name.startswith('_') else None
+    if func is None or not name.endswith('_strategy'):
+        raise RequestError(f"unknown strategy {name!r}")
+    return func
+
+
+def _jsonable(value):
+    """numpy / pandas 的值轉成 JSON 可表示的型別 (NaN / inf 轉為 None)"""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return _jsonable(value.tolist())
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class _LatencyStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rejected = 0
+        self.recent = collections.deque(maxlen=_LATENCY_WINDOW)  # (queue_ms, latency_ms)
+
+    def summary(self):
+        summary = {'count': self.count, 'errors': self.errors, 'rejected': self.rejected}
+        if self.recent:
+            queue_ms, latency_ms = np.array(self.recent).T
+            summary.update({
+                'latency_ms_mean': float(latency_ms.mean()),
+                'latency_ms_p50': float(np.percentile(latency_ms, 50)),
+                'latency_ms_p95': float(np.percentile(latency_ms, 95)),
+                'latency_ms_max': float(latency_ms.max()),
+                'queue_ms_mean': float(queue_ms.mean()),
+            })
+        return summary
+
+
+class BacktestService:
+    """
+    服務本體 (不含 HTTP): 資料集、結果快取與常駐的 worker pool。
+    可以直接在程式中使用 submit() / call()，或由 serve() 包成 HTTP 服務。
+    """
+
+    def __init__(self, store=None, workers=4, queue_size=64, cache=None, start='2000-01-01', end=None,
+                 interval='1d'):
+        """
+        Args:
+            store (data_store.OHLCVStore, optional): 讀取尚未載入的 ticker 時使用的本機資料庫.
+            workers (int, optional): worker thread 數.
+            queue_size (int, optional): 排隊中請求的上限, 超過時 submit 丟出 ServiceBusy.
+            cache (result_cache.ResultCache, optional): 回測結果快取, 預設為只用記憶體的快取.
+            start, end, interval: 由 store 載入資料時的區間與頻率.
+        """
+        self.store = store
+        self.cache = cache or result_cache.ResultCache(root=None)
+        self.load_range = dict(start=start, end=end, interval=interval)
+        self._datasets = {}
+        self._data_lock = threading.Lock()
+        self._local = threading.local()  # 每個 worker 各自的 Backtester (run() 會修改回測器的狀態)
+        self._chart_lock = threading.Lock()  # matplotlib 不是 thread-safe, 繪圖一次一張
+        self._charts = {}
+        self._chart_owners = {}  # 圖檔路徑 -> 最後寫入它的 chart_key
+
+        self._metrics = {kind: _LatencyStats() for kind in REQUEST_KINDS}
+        self._metrics_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._workers = [threading.Thread(target=self._worker, name=f'backtest-worker-{i}', daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    # --- 資料 ---
+
+    def add_data(self, ticker, data):
+        """放入 (或取代) 一檔股票的 OHLCV"""
+        if isinstance(data.columns, pd.MultiIndex):
+            data = data.copy(deep=False)
+            data.columns = [col[0] for col in data.columns]
+        with self._data_lock:
+            self._datasets[ticker] = data
+
+    def data(self, ticker):
+        with self._data_lock:
+            data = self._datasets.get(ticker)
+        if data is None:
+            if self.store is None:
+                raise RequestError(f"unknown ticker {ticker!r}")
+            data = self.store.load(ticker, **self.load_range)
+            if data.empty:
+                raise RequestError(f"no data for {ticker!r}")
+            self.add_data(ticker, data)
+        return data
+
+    def datasets(self):
+        with self._data_lock:
+            return {ticker: {'bars': len(data), 'start': data.index[0], 'end': data.index[-1]}
+                    for ticker, data in self._datasets.items() if len(data)}
+
+    def _backtester(self, ticker, initial_cash, transaction_fee):
+        data = self.data(ticker)
+        backtesters = self._local.__dict__.setdefault('backtesters', {})
+        key = (ticker, initial_cash, transaction_fee)
+        source, bt = backtesters.get(key, (None, None))
+        if source is not data:  # 第一次使用或 add_data 取代了資料
+            # 資料在記憶體中共用, 不需要複製
+            bt = Backtester(data, initial_cash=initial_cash, transaction_fee=transaction_fee,
+                            engine='vectorized', copy=False)
+            backtesters[key] = (data, bt)
+        return bt
+
+    # --- 請求 ---
+
+    def submit(self, kind, request):
+        """
+        放入佇列, 回傳 concurrent.futures.Future (結果為 dict)。佇列已滿時丟出 ServiceBusy.
+        """
+        if kind not in REQUEST_KINDS:
+            raise RequestError(f"unknown request kind {kind!r}")
+        future = Future()
+        try:
+            self._queue.put_nowait((kind, dict(request), future, time.perf_counter()))
+        except queue.Full:
+            with self._metrics_lock:
+                self._metrics[kind].rejected += 1
+            raise ServiceBusy(f"queue is full ({self._queue.maxsize} pending requests)") from None
+        return future
+
+    def call(self, kind, request, timeout=None):
+        """submit 並等待結果"""
+        return self.submit(kind, request).result(timeout)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            kind, request, future, queued_at = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            try:
+                result = getattr(self, f'_handle_{kind}')(request)
+            except Exception as exc:
+                with self._metrics_lock:
+                    self._metrics[kind].errors += 1
+                future.set_exception(exc)
+                continue
+            finished = time.perf_counter()
+            timing = {'queue_ms': (started - queued_at) * 1e3, 'latency_ms': (finished - queued_at) * 1e3}
+            with self._metrics_lock:
+                stats = self._metrics[kind]
+                stats.count += 1
+                stats.recent.append((timing['queue_ms'], timing['latency_ms']))
+            result.update(timing)
+            future.set_result(result)
+
+    def _common(self, request):
+        try:
+            ticker = request['ticker']
+            strategy_func = _strategy(request.get('strategy', 'rsi_strategy'))
+        except KeyError as exc:
+            raise RequestError(f"missing field {exc.args[0]!r}") from None
+        initial_cash = float(request.get('initial_cash', 100000))
+        transaction_fee = float(request.get('transaction_fee', 0.001425))
+        return ticker, strategy_func, initial_cash, transaction_fee
+
+    def _handle_backtest(self, request):
+        """{ticker, strategy, params, initial_cash, transaction_fee, equity (bool)}"""
+        ticker, strategy_func, initial_cash, transaction_fee = self._common(request)
+        bt = self._backtester(ticker, initial_cash, transaction_fee)
+        params = request.get('params', {})
+        if request.get('equity'):
+            stats, arrays = self.cache.run(bt, strategy_func, arrays=True, **params)
+            return {'stats': stats, 'equity': arrays['Portfolio']}
+        return {'stats': self.cache.run(bt, strategy_func, **params)}
+
+    def _handle_sweep(self, request):
+        """{ticker, strategy, grid, method ('grid' / 'halving'), sampler, objectives, sort_by, top}"""
+        ticker, strategy_func, initial_cash, transaction_fee = self._common(request)
+        data = self.data(ticker)
+        grid = request.get('grid')
+        if not isinstance(grid, dict) or not grid:
+            raise RequestError("sweep needs a non-empty 'grid' object")
+        sort_by = request.get('sort_by', 'Total Return')
+        method = request.get('method', 'grid')
+        if method == 'grid':
+            table = optimizer.optimize(data, strategy_func, grid, initial_cash, transaction_fee, sort_by=sort_by)
+            evaluations = {'candidates': len(table)}
+        elif method == 'halving':
+            table = search.search(data, strategy_func, grid, sampler=request.get('sampler', 'grid'),
+                                  objectives=request.get('objectives', sort_by), initial_cash=initial_cash,
+                                  transaction_fee=transaction_fee)
+            evaluations = table.attrs['evaluations']
+        else:
+            raise RequestError(f"unknown sweep method {method!r}")
+        top = int(request.get('top', 10))
+        return {'results': table.head(top).to_dict('records'), 'evaluations': evaluations}
+
+    def _handle_chart(self, request):
+        """{ticker, strategy, params, indicators, save_suffix} -> 圖檔路徑"""
+        ticker, strategy_func, initial_cash, transaction_fee = self._common(request)
+        params = request.get('params', {})
+        chart_indicators = list(request.get('indicators', []))
+        xaxis_freq = request.get('xaxis_freq', 'auto')
+        bt = self._backtester(ticker, initial_cash, transaction_fee)
+        name, key = self.cache.key(bt, strategy_func, params)
+        # 預設檔名包含回測與圖表設定的雜湊, 不同參數的圖不會寫到同一個檔案
+        chart_hash = hashlib.blake2b(json.dumps([key, chart_indicators, xaxis_freq]).encode(),
+                                     digest_size=16).hexdigest()
+        save_suffix = request.get('save_suffix', f'_{strategy_func.__name__}_{chart_hash[:12]}')
+        chart_key = (chart_hash, save_suffix)
+
+        with self._chart_lock:
+            path = self._charts.get(chart_key)
+            # 指定相同 save_suffix 的其他請求可能已覆寫這個檔案
+            if path is not None and os.path.exists(path) and self._chart_owners.get(path) == chart_key:
+                return {'path': path, 'cached': True}
+
+            import matplotlib
+            matplotlib.use('Agg')  # 服務沒有顯示環境
+            from stock_analyse_toolbox import k_line_plot
+
+            result = bt.run(strategy_func, **params)
+            path = k_line_plot.plot_ohlc(result, ticker=ticker, xaxis_freq=xaxis_freq,
+                                         save_suffix=save_suffix, strategy_indicators=chart_indicators, **params)
+            self._charts[chart_key] = path
+            self._chart_owners[path] = chart_key
+        return {'path': path, 'cached': False}
+
+    # --- 狀態 ---
+
+    def metrics(self):
+        with self._metrics_lock:
+            summary = {kind: stats.summary() for kind, stats in self._metrics.items()}
+        return {
+            'requests': summary,
+            'queue': {'pending': self._queue.qsize(), 'maxsize': self._queue.maxsize,
+                      'workers': len(self._workers)},
+            'result_cache': self.cache.stats(),
+        }
+
+    def close(self):
+        """停止所有 worker (等待執行中的請求完成)"""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    service = None  # serve() 建立子類別時設定
+    timeout_s = None
+
+    def log_message(self, format, *args):
+        pass  # 延遲統計由 /metrics 提供, 不逐筆輸出
+
+    def _send(self, status, body, headers=()):
+        payload = json.dumps(_jsonable(body)).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        path = self.path.strip('/')
+        if path == 'metrics':
+            self._send(200, self.service.metrics())
+        elif path == 'datasets':
+            self._send(200, self.service.datasets())
+        elif path == 'health':
+            self._send(200, {'status': 'ok'})
+        else:
+            self._send(404, {'error': f'unknown path /{path}'})
+
+    def do_POST(self):
+        kind = self.path.strip('/')
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise RequestError("request body must be a JSON object")
+            result = self.service.call(kind, request, timeout=self.timeout_s)
+        except ServiceBusy as exc:
+            self._send(503, {'error': str(exc)}, headers=[('Retry-After', '1')])
+        except (RequestError, json.JSONDecodeError, TypeError, ValueError) as exc:
+            self._send(404 if kind not in REQUEST_KINDS else 400, {'error': str(exc)})
+        except Exception as exc:
+            self._send(500, {'error': f'{type(exc).__name__}: {exc}'})
+        else:
+            self._send(200, result)
+
+
+class _HTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # socketserver 預設的 listen backlog 只有 5, 突發的連線會被直接重設;
+    # 放寬後由 service 的佇列決定是否回應 503
+    request_queue_size = 256
+
+
+def serve(service, host='127.0.0.1', port=8765, request_timeout=300):
+    """
+    建立 HTTP 伺服器 (每個連線一個 thread, 實際計算交給 service 的 worker pool)。
+    回傳 ThreadingHTTPServer; 以 server.serve_forever() 執行, server.shutdown() 停止。
+    port=0 時自動選擇可用的 port (server.server_address[1]).
+    """
+    handler = type('Handler', (_Handler,), {'service': service, 'timeout_s': request_timeout})
+    return _HTTPServer((host, port), handler)
+
+
+class Client:
+    """服務的簡易 client (標準函式庫 urllib)"""
+
+    def __init__(self, url='http://127.0.0.1:8765', timeout=300):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path, body=None):
+        data = None if body is None else json.dumps(_jsonable(body)).encode()
+        request = urllib.request.Request(f'{self.url}/{path}', data=data,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as exc:
+            if exc.code == 503:
+                raise ServiceBusy(json.loads(exc.read()).get('error')) from None
+            raise
+
+    def backtest(self, ticker, strategy='rsi_strategy', **request):
+        return self._request('backtest', dict(request, ticker=ticker, strategy=strategy))
+
+    def sweep(self, ticker, grid, strategy='rsi_strategy', **request):
+        return self._request('sweep', dict(request, ticker=ticker, strategy=strategy, grid=grid))
+
+    def chart(self, ticker, strategy='rsi_strategy', **request):
+        return self._request('chart', dict(request, ticker=ticker, strategy=strategy))
+
+    def metrics(self):
+        return self._request('metrics')
+
+    def datasets(self):
+        return self._request('datasets')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='stock_analyse_toolbox 的常駐回測服務')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--data-root', default='data', help='OHLCVStore 資料夾')
+    parser.add_argument('--start', default='2000-01-01')
+    parser.add_argument('--end')
+    parser.add_argument('--interval', default='1d')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--cache-root', help='指定時回測結果也寫入磁碟快取')
+    parser.add_argument('--preload', nargs='*', default=[], help='啟動時先載入的 ticker')
+    args = parser.parse_args(argv)
+
+    from stock_analyse_toolbox.data_store import OHLCVStore
+    store = OHLCVStore(args.data_root)
+    cache = result_cache.ResultCache(root=args.cache_root)
+    service = BacktestService(store, workers=args.workers, queue_size=args.queue_size, cache=cache,
+                              start=args.start, end=args.end, interval=args.interval)
+    for ticker in args.preload:
+        service.data(ticker)
+
+    server = serve(service, args.host, args.port)
+    print(f"Serving backtests on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
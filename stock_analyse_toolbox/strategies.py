@@ -1,22 +1,79 @@
 import pandas as pd
 import numpy as np 
-import ta
+
+from stock_analyse_toolbox import indicators, profiling
+
+# 策略函式不會修改傳入的 data: 回傳狀態訊號 (int8 Series)，
+# 計算出的指標放在 signals.attrs['indicators'] ({欄名: Series})，由 Backtester.run 加入結果供繪圖使用。
+
+
+def _flatten(data):
+    """攤平 yfinance 的 MultiIndex 欄位 (淺層複本, 不複製數值也不修改呼叫端的 data)"""
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy(deep=False)
+        data.columns = [col[0] for col in data.columns]
+    return data
+
+
+def _previous(values):
+    """前一根 K 棒的值 (第一根為 NaN)"""
+    prev = np.empty_like(values)
+    prev[:1] = np.nan
+    prev[1:] = values[:-1]
+    return prev
+
+
+def _with_indicators(state, index, columns):
+    signals = pd.Series(state, index=index)
+    signals.attrs['indicators'] = columns
+    return signals
+
 
 def moving_average_strategy(data, short=10, long=30):
     if not isinstance(data.index, pd.DatetimeIndex):
         raise ValueError("Data index must be DatetimeIndex")
-    if isinstance(data.columns, pd.MultiIndex):
-        data.copy()
-        data.columns = [col[0] for col in data.columns]
+    data = _flatten(data)
     
-    short_ma = data['Close'].rolling(short).mean()
-    long_ma = data['Close'].rolling(long).mean()
+    with profiling.stage('indicator'):
+        short_ma = data['Close'].rolling(short).mean().to_numpy()
+        long_ma = data['Close'].rolling(long).mean().to_numpy()
 
-    signals = pd.Series(0, index=data.index, dtype=int)
-    signals.loc[short_ma > long_ma] = 1
-    signals.loc[short_ma < long_ma] = -1
-    signals = signals.fillna(0).astype(int) # 處理 NaN
-    return signals
+    with profiling.stage('signal'):
+        # 短均線在上為 1、在下為 -1, 相等或尚無均線 (NaN) 為 0
+        signals = np.nan_to_num(np.sign(short_ma - long_ma)).astype(np.int8)
+    return pd.Series(signals, index=data.index)
+
+
+def events_to_state(buy_condition, sell_condition, initial=0):
+    """
+    將買賣「事件」轉換為 Backtester 使用的「狀態」訊號 (1 = 持有, -1 = 空手, 0 = 尚無訊號)。
+    同一根 K 棒同時成立時以賣出為準；0 的部分沿用前一個狀態 (forward-fill)。
+
+    支援 1-D 或 2-D (bars × N) 的 np.ndarray，一次處理 N 組參數。
+    分段處理時以 initial 傳入上一段最後的狀態。
+    """
+    buy_condition = np.asarray(buy_condition, dtype=bool)
+    sell_condition = np.asarray(sell_condition, dtype=bool)
+    # 直接以 int8 建立事件陣列 (後寫入的賣出覆蓋買入)
+    events = np.zeros(np.broadcast_shapes(buy_condition.shape, sell_condition.shape), dtype=np.int8)
+    events[np.broadcast_to(buy_condition, events.shape)] = 1
+    events[np.broadcast_to(sell_condition, events.shape)] = -1
+
+    n = events.shape[0]
+    if events.ndim == 1:
+        # 1-D: 每個事件的狀態持續到下一個事件, 只需要事件位置大小的暫存陣列
+        idx = np.flatnonzero(events)
+        state = np.full(n, initial, dtype=np.int8)
+        if len(idx):
+            state[idx[0]:] = np.repeat(events[idx], np.diff(np.append(idx, n)))
+        return state
+
+    index_dtype = np.int32 if n < 2 ** 31 else np.int64
+    positions = np.arange(n, dtype=index_dtype).reshape((n,) + (1,) * (events.ndim - 1))
+    last = np.where(events != 0, positions, index_dtype(-1))
+    np.maximum.accumulate(last, axis=0, out=last)
+    state = np.take_along_axis(events, np.maximum(last, 0), axis=0)
+    return np.where(last >= 0, state, np.int8(initial)).astype(np.int8, copy=False)
 
 
 def rsi_strategy(data, period=14, overbought=70, oversold=30):
@@ -26,51 +83,31 @@ def rsi_strategy(data, period=14, overbought=70, oversold=30):
     1: 買入/持有 (RSI 向上穿越 oversold)
     -1: 賣出/空手 (RSI 向下穿越 overbought)
     """
-    if isinstance(data.columns, pd.MultiIndex):
-        data = data.copy()
-        data.columns = [col[0] for col in data.columns]
+    data = _flatten(data)
     
     # --- 1. 使用 Wilder's EWM 計算標準 RSI ---
-    delta = data['Close'].diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
-    
-    # 使用 ewm (Exponential Moving Average) 
-    # com=period-1 等同於 Wilder's smoothing (alpha = 1/period)
-    avg_gain = gain.ewm(com=period - 1, min_periods=period).mean()
-    avg_loss = loss.ewm(com=period - 1, min_periods=period).mean()
-
-    # 處理 avg_loss 為 0 的情況
-    rs = avg_gain / avg_loss
-    # 將 inf 替換為 NaN (如果 avg_loss 是 0)，然後用 100 填充 (代表 avg_loss 為 0, 強勢)
-    rs = rs.replace([np.inf, -np.inf], np.nan).fillna(100)
-    
-    rsi = 100 - (100 / (1 + rs))
-    data['RSI'] = rsi.fillna(50) # 將開頭的 NaN 填為 50 (中性)
+    with profiling.stage('indicator'):
+        rsi = indicators.rsi(data['Close'], period)
 
-    # --- 2. 產生「穿越」訊號 (向量化版本) ---
-    signals = pd.Series(0, index=data.index, dtype=int)
-    
-    # 昨天的 RSI
-    rsi_prev = data['RSI'].shift(1)
+    with profiling.stage('signal'):
+        # --- 2. 產生「穿越」訊號 (向量化版本) ---
+        rsi_now = rsi.to_numpy()
     
-    # 條件 1: 買入 (向上穿越超賣線)
-    buy_condition = (rsi_prev <= oversold) & (data['RSI'] > oversold)
+        # 昨天的 RSI
+        rsi_prev = _previous(rsi_now)
     
-    # 條件 2: 賣出 (向下穿越超買線)
-    sell_condition = (rsi_prev >= overbought) & (data['RSI'] < overbought)
-
-    # --- 3. 填入 Backtester 用的訊號 ---
-    # 你的 Backtester 是「狀態機」 (Signal 1 = 持有, Signal -1 = 空手)
-    # 我們需要將「事件」轉換為「狀態」
-    signals[buy_condition] = 1
-    signals[sell_condition] = -1
+        # 條件 1: 買入 (向上穿越超賣線)
+        buy_condition = (rsi_prev <= oversold) & (rsi_now > oversold)
     
-    # 讓訊號 "持續" 下去，直到下一個相反訊號出現
-    # 使用 ffill (forward-fill) 來填充 0 的部分
-    signals = signals.replace(0, np.nan).ffill().fillna(0).astype(int)
+        # 條件 2: 賣出 (向下穿越超買線)
+        sell_condition = (rsi_prev >= overbought) & (rsi_now < overbought)
 
-    return signals
+        # --- 3. 填入 Backtester 用的訊號 ---
+        # 你的 Backtester 是「狀態機」 (Signal 1 = 持有, Signal -1 = 空手)
+        # 我們需要將「事件」轉換為「狀態」, 讓訊號 "持續" 下去，直到下一個相反訊號出現
+        signals = events_to_state(buy_condition, sell_condition)
+
+    return _with_indicators(signals, data.index, {'RSI': rsi})
 
 def kd_strategy(data, period=14, smooth_window=3, oversold=20, overbought=80):
     """
@@ -81,45 +118,70 @@ def kd_strategy(data, period=14, smooth_window=3, oversold=20, overbought=80):
     
     (可選: 增加超買超賣區過濾)
     """
-    if isinstance(data.columns, pd.MultiIndex):
-        data = data.copy()
-        data.columns = [col[0] for col in data.columns]
+    data = _flatten(data)
     
     # 1. 計算 KD 指標
-    stoch = ta.momentum.StochasticOscillator(
-        high=data['High'], 
-        low=data['Low'], 
-        close=data['Close'], 
-        window=period, 
-        smooth_window=smooth_window
-    )
-    data['%K'] = stoch.stoch()
-    data['%D'] = stoch.stoch_signal()
-
-    # 2. 產生「K/D 交叉」訊號 (向量化版本)
-    signals = pd.Series(0, index=data.index, dtype=int)
-    
-    # 昨天的 %K 和 %D
-    k_prev = data['%K'].shift(1)
-    d_prev = data['%D'].shift(1)
+    with profiling.stage('indicator'):
+        k, d = indicators.stochastic(data['High'], data['Low'], data['Close'], period, smooth_window)
+
+    with profiling.stage('signal'):
+        # 2. 產生「K/D 交叉」訊號 (向量化版本)
+        k_now, d_now = k.to_numpy(), d.to_numpy()
     
-    # 條件 1: 買入 (黃金交叉: K 向上穿越 D)
-    # (昨天 K <= D) 且 (今天 K > D)
-    # (可選過濾: 並且 K 最好在超賣區附近, e.g., K < 50)
-    buy_condition = (k_prev <= d_prev) & (data['%K'] > data['%D'])
-                     # & (data['%K'] < 50) # <-- 這是一個可選的過濾器
+        # 昨天的 %K 和 %D
+        k_prev = _previous(k_now)
+        d_prev = _previous(d_now)
     
-    # 條件 2: 賣出 (死亡交叉: K 向下穿越 D)
-    # (昨天 K >= D) 且 (今天 K < D)
-    # (可選過濾: 並且 K 最好在超買區附近, e.g., K > 50)
-    sell_condition = (k_prev >= d_prev) & (data['%K'] < data['%D'])
-                     # & (data['%K'] > 50) # <-- 這是一個可選的過濾器
-
-    # 3. 填入 Backtester 用的「狀態」訊號
-    signals[buy_condition] = 1
-    signals[sell_condition] = -1
+        # 條件 1: 買入 (黃金交叉: K 向上穿越 D)
+        # (昨天 K <= D) 且 (今天 K > D)
+        # (可選過濾: 並且 K 最好在超賣區附近, e.g., K < 50)
+        buy_condition = (k_prev <= d_prev) & (k_now > d_now)
+                         # & (k_now < 50) # <-- 這是一個可選的過濾器
     
-    # 讓訊號 "持續" 下去
-    signals = signals.replace(0, np.nan).ffill().fillna(0).astype(int)
+        # 條件 2: 賣出 (死亡交叉: K 向下穿越 D)
+        # (昨天 K >= D) 且 (今天 K < D)
+        # (可選過濾: 並且 K 最好在超買區附近, e.g., K > 50)
+        sell_condition = (k_prev >= d_prev) & (k_now < d_now)
+                         # & (k_now > 50) # <-- 這是一個可選的過濾器
+
+        # 3. 填入 Backtester 用的「狀態」訊號 (讓訊號 "持續" 下去)
+        signals = events_to_state(buy_condition, sell_condition)
+
+    return _with_indicators(signals, data.index, {'%K': k, '%D': d})
+
+
+def multi_timeframe_strategy(data, pyramid=None, timeframe='1d', trend_period=14, trend_threshold=50,
+                             period=14, smooth_window=3):
+    """
+    多週期策略: 大週期 (預設日線) 的 RSI 當作趨勢過濾，data 本身週期 (例如分鐘線) 的 KD 交叉進出場。
+    訊號：
+    1: 買入/持有 (%K 向上穿越 %D, 且最後一根已完成的大週期 RSI > trend_threshold)
+    -1: 賣出/空手 (%K 向下穿越 %D, 或大週期 RSI 不高於 trend_threshold)
+
+    Args:
+        pyramid (pyramid.BarPyramid, optional): 已建立好的多週期資料, 大週期直接對齊查表不重新 resample;
+                                                省略時由 data 建立.
+        timeframe (str, optional): 趨勢過濾的週期 ('1h', '1d' ...).
+    """
+    data = _flatten(data)
+    if pyramid is None:
+        # 只有這個策略用得到, 不讓 import strategies 連帶載入 pyramid
+        from stock_analyse_toolbox.pyramid import BarPyramid
+        pyramid = BarPyramid(data, [timeframe])
+
+    with profiling.stage('indicator'):
+        k, d = indicators.stochastic(data['High'], data['Low'], data['Close'], period, smooth_window)
+        trend = indicators.rsi(pyramid[timeframe]['Close'], trend_period)
+        # 每根 K 棒只看得到已完成的大週期 K 棒
+        trend_now = pyramid.align(trend, timeframe, data.index)
+
+    with profiling.stage('signal'):
+        k_now, d_now = k.to_numpy(), d.to_numpy()
+        k_prev, d_prev = _previous(k_now), _previous(d_now)
+
+        buy_condition = (k_prev <= d_prev) & (k_now > d_now) & (trend_now > trend_threshold)
+        sell_condition = ((k_prev >= d_prev) & (k_now < d_now)) | (trend_now <= trend_threshold)
+        signals = events_to_state(buy_condition, sell_condition)
 
-    return signals
\ No newline at end of file
+    trend_column = pd.Series(trend_now, index=data.index)
+    return _with_indicators(signals, data.index, {'%K': k, '%D': d, f'RSI_{timeframe}': trend_column})
@@ -0,0 +1,226 @@
+import math
+from collections import deque
+
+import pandas as pd
+
+from stock_analyse_toolbox import metrics
+from stock_analyse_toolbox.back_tester import summary_stats
+from stock_analyse_toolbox.trade_log import TradeLog
+
+
+class WilderRSI:
+    """
+    逐根更新的 RSI，與 indicators.rsi (pandas ewm, adjust=True) 的計算完全相同，每根 O(1)。
+    """
+
+    def __init__(self, period=14):
+        self.period = period
+        self._old_wt_factor = 1 - 1 / period  # com = period - 1
+        self._prev_close = math.nan
+        self._nobs = 0
+        self._old_wt = 1.0
+        self._avg_gain = math.nan
+        self._avg_loss = math.nan
+        self.value = math.nan
+
+    def _ewm(self, weighted, value):
+        # 與 pandas ewm (adjust=True) 相同的遞迴式
+        if weighted != weighted:
+            return value
+        if weighted != value:
+            weighted = (self._old_wt * weighted + value) / (self._old_wt + 1)
+        return weighted
+
+    def update(self, close):
+        delta = close - self._prev_close
+        self._prev_close = close
+
+        if delta == delta:  # 第一根沒有 delta
+            gain = max(delta, 0.0)
+            loss = -min(delta, 0.0)
+            if self._nobs > 0:
+                self._old_wt *= self._old_wt_factor
+            self._avg_gain = self._ewm(self._avg_gain, gain)
+            self._avg_loss = self._ewm(self._avg_loss, loss)
+            if self._nobs > 0:
+                self._old_wt += 1
+            self._nobs += 1
+
+        # 資料不足 / avg_loss 為 0 時 rs 視為 100 (與 batch 版相同)
+        rs = 100.0
+        if self._nobs >= self.period and self._avg_loss != 0:
+            rs = self._avg_gain / self._avg_loss
+            if rs != rs or math.isinf(rs):
+                rs = 100.0
+        self.value = 100 - (100 / (1 + rs))
+        return self.value
+
+
+class RollingExtreme:
+    """單調佇列維護滑動視窗的最大 (或最小) 值，每根攤銷 O(1)"""
+
+    def __init__(self, window, mode='max'):
+        self.window = window
+        self._better = (lambda a, b: a >= b) if mode == 'max' else (lambda a, b: a <= b)
+        self._queue = deque()  # (index, value)
+        self._count = 0
+
+    def update(self, value):
+        while self._queue and self._better(value, self._queue[-1][1]):
+            self._queue.pop()
+        self._queue.append((self._count, value))
+        self._count += 1
+        if self._queue[0][0] <= self._count - 1 - self.window:
+            self._queue.popleft()
+        return self._queue[0][1] if self._count >= self.window else math.nan
+
+
+class Stochastic:
+    """
+    逐根更新的 KD 指標，與 ta.momentum.StochasticOscillator 相同 (%D 為 %K 的簡單平均)。
+    """
+
+    def __init__(self, period=14, smooth_window=3):
+        self._highest = RollingExtreme(period, 'max')
+        self._lowest = RollingExtreme(period, 'min')
+        self._recent_k = deque(maxlen=smooth_window)
+        self.smooth_window = smooth_window
+        self.k = math.nan
+        self.d = math.nan
+
+    def update(self, high, low, close):
+        highest = self._highest.update(high)
+        lowest = self._lowest.update(low)
+        try:
+            self.k = 100 * (close - lowest) / (highest - lowest)
+        except ZeroDivisionError:
+            self.k = math.nan if close == lowest else math.copysign(math.inf, close - lowest)
+
+        self._recent_k.append(self.k)
+        if len(self._recent_k) == self.smooth_window and not any(k != k for k in self._recent_k):
+            self.d = sum(self._recent_k) / self.smooth_window
+        else:
+            self.d = math.nan
+        return self.k, self.d
+
+
+class StreamingBacktester:
+    """
+    逐根 K 棒即時回測: 每呼叫一次 on_bar() 就以常數時間更新指標、訊號、部位、現金與交易紀錄。
+
+    同樣的 K 棒餵完後，結果與 batch 版 rsi_strategy / kd_strategy + Backtester.run 相同。
+    """
+
+    STRATEGIES = ('rsi', 'kd')
+
+    def __init__(self, strategy='rsi', initial_cash=100000, transaction_fee=0.001425, **params):
+        """
+        Args:
+            strategy (str): 'rsi' (對應 rsi_strategy) 或 'kd' (對應 kd_strategy).
+            initial_cash (float, optional): 初始資金.
+            transaction_fee (float, optional): 手續費率.
+            **params: 策略參數, 與 batch 版策略函式相同
+                      (rsi: period, overbought, oversold; kd: period, smooth_window).
+        """
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"strategy must be one of {self.STRATEGIES}, got {strategy!r}")
+        self.strategy = strategy
+        self.initial_cash = initial_cash
+        self.transaction_fee = transaction_fee
+
+        if strategy == 'rsi':
+            self.period = params.get('period', 14)
+            self.overbought = params.get('overbought', 70)
+            self.oversold = params.get('oversold', 30)
+            self._rsi = WilderRSI(self.period)
+            self._prev_rsi = math.nan
+        else:
+            self._stoch = Stochastic(params.get('period', 14), params.get('smooth_window', 3))
+            self._prev_k = math.nan
+            self._prev_d = math.nan
+
+        # 部位與帳戶狀態 (與 Backtester.run 的迴圈相同)
+        self.state = 0
+        self.position = 0
+        self.cash = initial_cash
+        self.buy_price = 0.0
+        self.entry_idx = 0
+        self.trades = TradeLog()
+
+        self.index = []
+        self.closes = []
+        self.signals = []
+        self.portfolio = []
+        self.indicators = {}
+
+    def _signal(self, high, low, close):
+        if self.strategy == 'rsi':
+            rsi = self._rsi.update(close)
+            buy = self._prev_rsi <= self.oversold and rsi > self.oversold
+            sell = self._prev_rsi >= self.overbought and rsi < self.overbought
+            self._prev_rsi = rsi
+            self.indicators = {'RSI': rsi}
+        else:
+            k, d = self._stoch.update(high, low, close)
+            buy = self._prev_k <= self._prev_d and k > d
+            sell = self._prev_k >= self._prev_d and k < d
+            self._prev_k, self._prev_d = k, d
+            self.indicators = {'%K': k, '%D': d}
+
+        # 事件轉為狀態: 賣出優先, 沒有事件則沿用前一個狀態
+        if sell:
+            self.state = -1
+        elif buy:
+            self.state = 1
+        return self.state
+
+    def on_bar(self, open, high, low, close, volume, timestamp=None):
+        """
+        餵入一根新的 K 棒，回傳該根的訊號 (1 / -1 / 0)。
+        """
+        high, low, close = float(high), float(low), float(close)
+        signal = self._signal(high, low, close)
+        price = close
+
+        if signal == 1 and self.position == 0:  # Buy
+            self.position = (self.cash / price) * (1 - self.transaction_fee)
+            self.cash = 0
+            self.buy_price = price
+            self.entry_idx = len(self.portfolio)
+
+        elif signal == -1 and self.position > 0:  # Sell
+            self.cash = (self.position * price) * (1 - self.transaction_fee)
+            self.position = 0
+            if self.buy_price > 0:
+                self.trades.append(self.entry_idx, len(self.portfolio), self.buy_price, price)
+                self.buy_price = 0.0
+
+        self.index.append(timestamp if timestamp is not None else len(self.index))
+        self.closes.append(close)
+        self.signals.append(signal)
+        self.portfolio.append(self.cash + self.position * price)
+        return signal
+
+    def closed_trades(self):
+        """
+        目前為止的交易紀錄；仍持倉時以最新收盤價加上一筆強制平倉 (與 Backtester.run 期末處理相同)。
+        不會改變內部狀態，之後仍可繼續 on_bar()。
+        """
+        trades = self.trades.copy()
+        if self.position > 0 and self.buy_price > 0:
+            trades.append(self.entry_idx, len(self.portfolio) - 1, self.buy_price, self.closes[-1])
+        return trades
+
+    def get_summary_stats(self):
+        if not self.portfolio:
+            raise Exception("請先餵入至少一根 K 棒才能取得摘要。")
+        periods_per_year = metrics.span_periods_per_year(self.index[0], self.index[-1], len(self.index))
+        return summary_stats(self.portfolio, self.closes, self.closed_trades(), periods_per_year)
+
+    def results(self):
+        """目前為止的 Close / Signal / Portfolio (DataFrame)"""
+        return pd.DataFrame({
+            'Close': self.closes,
+            'Signal': self.signals,
+            'Portfolio': self.portfolio,
+        }, index=self.index)
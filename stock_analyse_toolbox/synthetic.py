@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from stock_analyse_toolbox.data_store import COLUMNS
+
+# 'B' (交易日) 能表示的最大長度; 更長的資料改用分鐘線以免超出 datetime64[ns] 的範圍
+_MAX_DAILY_BARS = 25_000
+
+# 日線報酬率的預設標準差; 盤中 K 棒依時間長度的平方根縮小 (一個交易日 6.5 小時)
+_DAILY_VOLATILITY = 0.02
+_TRADING_SECONDS = 6.5 * 3600
+
+
+def _default_volatility(freq):
+    try:
+        seconds = pd.Timedelta(pd.tseries.frequencies.to_offset(freq)).total_seconds()
+    except ValueError:  # 'B', 'W' 等沒有固定長度的頻率
+        return _DAILY_VOLATILITY
+    return _DAILY_VOLATILITY * min(1.0, np.sqrt(seconds / _TRADING_SECONDS))
+
+
+def make_ohlcv(n_bars, seed=0, start='2000-01-03', freq='auto', start_price=100.0,
+               volatility=None, ticker=None):
+    """
+    產生可重現的模擬 OHLCV (不需要網路)，欄位順序與 yfinance 下載攤平後相同。
+
+    收盤價為幾何隨機漫步；開盤價帶有跳空，最高 / 最低價由開收盤價向外延伸，
+    成交量為對數常態且與當根漲跌幅大小正相關。相同參數永遠得到相同資料。
+
+    Args:
+        n_bars (int): K 棒數.
+        seed (int, optional): 亂數種子.
+        start (str, optional): 第一根 K 棒的時間.
+        freq (str, optional): K 棒頻率 ('B', 'h', 'min' ...).
+                              'auto': 不超過 25,000 根時用交易日, 否則用分鐘線.
+        start_price (float, optional): 起始價格.
+        volatility (float, optional): 每根 K 棒報酬率的標準差, 預設依 freq 換算 (日線 2%).
+        ticker (str, optional): 指定時回傳與 yfinance 相同的 MultiIndex 欄位 (Price, Ticker).
+
+    Returns:
+        pd.DataFrame: Close / High / Low / Open / Volume.
+    """
+    rng = np.random.default_rng(seed)
+    if freq == 'auto':
+        freq = 'B' if n_bars <= _MAX_DAILY_BARS else 'min'
+    if volatility is None:
+        volatility = _default_volatility(freq)
+
+    returns = rng.normal(0, volatility, n_bars)
+    close = start_price * np.exp(np.cumsum(returns))
+
+    gap = rng.normal(0, volatility * 0.25, n_bars)
+    open_ = np.empty(n_bars)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+    open_ *= np.exp(gap)
+
+    body_high = np.maximum(open_, close)
+    body_low = np.minimum(open_, close)
+    high = body_high * np.exp(np.abs(rng.normal(0, volatility * 0.5, n_bars)))
+    low = body_low * np.exp(-np.abs(rng.normal(0, volatility * 0.5, n_bars)))
+
+    move = np.abs(returns) / volatility
+    volume = np.round(rng.lognormal(13, 0.4, n_bars) * (1 + move))
+
+    index = pd.date_range(start, periods=n_bars, freq=freq, name='Date')
+    data = pd.DataFrame(np.column_stack([close, high, low, open_, volume]), index=index, columns=COLUMNS)
+    if ticker is not None:
+        data.columns = pd.MultiIndex.from_product([COLUMNS, [ticker]], names=['Price', 'Ticker'])
+    return data
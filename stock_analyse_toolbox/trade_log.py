@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+TRADE_DTYPE = np.dtype([
+    ('entry_idx', np.int64),     # 買入那根 K 棒的位置
+    ('exit_idx', np.int64),      # 賣出 (或期末強制平倉) 那根 K 棒的位置
+    ('buy_price', np.float64),
+    ('sell_price', np.float64),
+    ('pnl_pct', np.float64),
+    ('holding_bars', np.int64),  # exit_idx - entry_idx
+])
+
+
+class TradeLog:
+    """
+    逐筆交易紀錄, 以 structured array (TRADE_DTYPE) 欄式儲存。
+
+    - trades['pnl_pct'] 等欄位名稱回傳 np.ndarray (不複製), 統計可直接向量化計算
+    - trades[i] 與 for t in trades 仍回傳 dict, 與舊版 list[dict] 的用法相容
+    - append 以倍增方式預先配置容量, 逐筆加入的攤銷成本為 O(1)
+    """
+
+    def __init__(self, capacity=16):
+        self._data = np.empty(capacity, dtype=TRADE_DTYPE)
+        self._size = 0
+
+    @classmethod
+    def from_arrays(cls, entry_idx, exit_idx, buy_price, sell_price):
+        """
+        由等長的陣列一次建立 (買入價不大於 0 的交易會被略過, 與迴圈版相同)。
+        """
+        buy_price = np.asarray(buy_price, dtype=float)
+        keep = buy_price > 0
+        log = cls(capacity=int(keep.sum()))
+        log._fill(np.asarray(entry_idx)[keep], np.asarray(exit_idx)[keep],
+                  buy_price[keep], np.asarray(sell_price, dtype=float)[keep])
+        return log
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=TRADE_DTYPE)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+
+    def _fill(self, entry_idx, exit_idx, buy_price, sell_price):
+        n = len(buy_price)
+        self._reserve(n)
+        rows = self._data[self._size:self._size + n]
+        rows['entry_idx'] = entry_idx
+        rows['exit_idx'] = exit_idx
+        rows['buy_price'] = buy_price
+        rows['sell_price'] = sell_price
+        rows['pnl_pct'] = (rows['sell_price'] - rows['buy_price']) / rows['buy_price']
+        rows['holding_bars'] = rows['exit_idx'] - rows['entry_idx']
+        self._size += n
+
+    def append(self, entry_idx, exit_idx, buy_price, sell_price):
+        """加入一筆交易 (pnl_pct 與 holding_bars 自動計算)"""
+        self._reserve(1)
+        self._data[self._size] = (entry_idx, exit_idx, buy_price, sell_price,
+                                  (sell_price - buy_price) / buy_price, exit_idx - entry_idx)
+        self._size += 1
+
+    def extend(self, other):
+        """接上另一個 TradeLog 的所有交易"""
+        records = other.records
+        self._reserve(len(records))
+        self._data[self._size:self._size + len(records)] = records
+        self._size += len(records)
+
+    def copy(self):
+        log = TradeLog(capacity=self._size)
+        log.extend(self)
+        return log
+
+    @property
+    def records(self):
+        """目前所有交易的 structured array (view, 不複製)"""
+        return self._data[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.records[key]
+        if isinstance(key, slice):
+            log = TradeLog(capacity=0)
+            log._data = self.records[key].copy()
+            log._size = len(log._data)
+            return log
+        return _as_dict(self.records[key])
+
+    def __iter__(self):
+        for row in self.records:
+            yield _as_dict(row)
+
+    def __eq__(self, other):
+        if isinstance(other, TradeLog):
+            return len(self) == len(other) and bool((self.records == other.records).all())
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TradeLog({self._size} trades)"
+
+    def to_list(self):
+        return list(self)
+
+    def to_frame(self, index=None):
+        """
+        轉成 DataFrame; 傳入 K 棒的 index 時另外加上 entry_date / exit_date 欄位。
+        """
+        frame = pd.DataFrame(self.records)
+        if index is not None:
+            frame.insert(0, 'entry_date', index[frame['entry_idx'].to_numpy()])
+            frame.insert(1, 'exit_date', index[frame['exit_idx'].to_numpy()])
+        return frame
+
+
+def _as_dict(row):
+    return {name: row[name].item() for name in TRADE_DTYPE.names}
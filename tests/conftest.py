@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 專案沒有安裝成套件, 與 benchmarks 相同直接把專案根目錄加入路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
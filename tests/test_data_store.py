@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_analyse_toolbox.data_store import COLUMNS, OHLCVStore
+
+
+class StubFetcher:
+    """以交易日產生固定內容的資料 (Close = 距 2000-01-01 的天數), 並記錄每次請求的區間"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, ticker, start, end, interval):
+        self.calls.append((pd.Timestamp(start), pd.Timestamp(end)))
+        return bars(start, end)
+
+
+def bars(start, end, offset=0.0):
+    index = pd.bdate_range(start, end, inclusive='left', name='Date')
+    value = (index - pd.Timestamp('2000-01-01')).days.to_numpy(dtype=float) + offset
+    return pd.DataFrame({'Close': value, 'High': value + 1, 'Low': value - 1, 'Open': value,
+                         'Volume': 1000.0}, index=index)[COLUMNS]
+
+
+def assert_same_bars(actual, expected):
+    np.testing.assert_array_equal(actual.index.as_unit('ns').asi8, expected.index.as_unit('ns').asi8)
+    np.testing.assert_array_equal(actual.to_numpy(), expected.to_numpy())
+
+
+@pytest.fixture
+def store(tmp_path):
+    return OHLCVStore(str(tmp_path / 'data'), fetcher=StubFetcher())
+
+
+def test_update_fetches_only_the_missing_ranges(store):
+    store.update('AAA', '2020-03-01', '2020-06-01')
+    store.update('AAA', '2020-01-01', '2020-09-01')
+
+    assert store.fetcher.calls == [
+        (pd.Timestamp('2020-03-01'), pd.Timestamp('2020-06-01')),
+        (pd.Timestamp('2020-01-01'), pd.Timestamp('2020-03-01')),
+        (pd.Timestamp('2020-06-01'), pd.Timestamp('2020-09-01')),
+    ]
+    assert_same_bars(store.load('AAA', '2020-01-01', '2020-09-01'), bars('2020-01-01', '2020-09-01'))
+
+    assert store.update('AAA', '2020-02-01', '2020-08-01') == 0
+    assert len(store.fetcher.calls) == 3
+
+
+def test_covered_range_without_bars_loads_empty(store):
+    # 2020-01-04 / 05 是週末, 區間內沒有任何 K 棒
+    assert store.update('AAA', '2020-01-04', '2020-01-06') == 0
+    assert store.missing_ranges('AAA', '2020-01-04', '2020-01-06') == []
+    loaded = store.load('AAA', '2020-01-04', '2020-01-06')
+    assert loaded.empty and list(loaded.columns) == COLUMNS
+
+
+def test_tail_append_writes_into_spare_capacity(store):
+    store.append('AAA', bars('2020-01-01', '2020-07-01'))
+    path = store.path('AAA')
+    inode = os.stat(path).st_ino
+
+    added = store.append('AAA', bars('2020-07-01', '2020-08-01'))
+
+    assert added == len(bars('2020-07-01', '2020-08-01'))
+    assert os.stat(path).st_ino == inode  # 接在最後面: 原地寫入預留空間
+    assert_same_bars(store.load('AAA'), bars('2020-01-01', '2020-08-01'))
+
+
+def test_tail_overwrite_replaces_the_file(store):
+    store.append('AAA', bars('2020-01-01', '2020-07-01'))
+    path = store.path('AAA')
+    inode = os.stat(path).st_ino
+
+    # 重抓最後一週 (數值不同) 並多接一週: 會覆蓋既有 K 棒, 先寫暫存檔再置換
+    refetched = bars('2020-06-24', '2020-07-08', offset=0.5)
+    added = store.append('AAA', refetched)
+
+    assert added == len(bars('2020-07-01', '2020-07-08'))
+    assert os.stat(path).st_ino != inode
+    assert not any(name.endswith('.tmp.npy') for name in os.listdir(store.root))
+    expected = pd.concat([bars('2020-01-01', '2020-06-24'), refetched])
+    assert_same_bars(store.load('AAA'), expected)
+
+
+def test_out_of_order_append_rewrites_sorted(store):
+    store.append('AAA', bars('2020-03-01', '2020-04-01'))
+    store.append('AAA', bars('2020-01-01', '2020-02-01'))
+    expected = pd.concat([bars('2020-01-01', '2020-02-01'), bars('2020-03-01', '2020-04-01')])
+    assert_same_bars(store.load('AAA'), expected)
+    assert store.count('AAA') == len(expected)
@@ -0,0 +1,59 @@
+import pandas as pd
+
+from stock_analyse_toolbox import ingest
+from stock_analyse_toolbox.data_store import OHLCVStore
+
+START, END = '2020-01-01', '2020-04-01'
+
+
+def run(tickers, provider, **kwargs):
+    kwargs.setdefault('backoff', 0)
+    return ingest.ingest(tickers, START, END, provider=provider, seed=0, **kwargs)
+
+
+def test_transient_failures_are_retried():
+    provider = ingest.FakeProvider(latency=0, failures={'AAA': 2})
+    report = run(['AAA', 'BBB'], provider, retries=3)
+
+    assert report.counts() == {'ok': 2, 'empty': 0, 'failed': 0}
+    assert report.results['AAA']['attempts'] == 3
+    assert report.results['BBB']['attempts'] == 1
+    assert provider.calls == {'AAA': 3, 'BBB': 1}
+    assert len(report.data['AAA']) == len(pd.bdate_range(START, END, inclusive='left'))
+
+
+def test_gives_up_after_retries():
+    provider = ingest.FakeProvider(latency=0, failures={'AAA': 10})
+    report = run(['AAA', 'BBB'], provider, retries=2)
+
+    assert report.failed == ['AAA']
+    assert report.results['AAA']['attempts'] == 3
+    assert 'ConnectionError' in report.results['AAA']['error']
+    assert set(report.data) == {'BBB'}
+
+
+def test_non_retryable_errors_are_not_retried():
+    provider = ingest.FakeProvider(latency=0, missing=['ZZZ'])
+    report = run(['ZZZ'], provider, retries=3)
+
+    assert report.failed == ['ZZZ']
+    assert provider.calls == {'ZZZ': 1}
+
+
+def test_max_workers_limits_requests_in_flight():
+    provider = ingest.FakeProvider(latency=0.05)
+    tickers = [f'T{i:02d}' for i in range(12)]
+    report = run(tickers, provider, max_workers=3)
+
+    assert report.counts()['ok'] == len(tickers)
+    assert 1 < provider.max_in_flight <= 3
+
+
+def test_store_only_fetches_missing_ranges(tmp_path):
+    store = OHLCVStore(str(tmp_path / 'data'))
+    provider = ingest.FakeProvider(latency=0)
+    first = run(['AAA'], provider, store=store)
+    second = run(['AAA'], provider, store=store)
+
+    assert provider.calls == {'AAA': 1}
+    pd.testing.assert_frame_equal(second.data['AAA'], first.data['AAA'])